@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
 
+from authentication.backends import user_cache
 from authentication.models import CustomUser
 
 
@@ -28,13 +30,21 @@ class CustomUserAdmin(UserAdmin):
 
     actions = ["make_active", "make_inactive"]
 
+    @staticmethod
+    def _set_active(queryset, is_active: bool) -> None:
+        user_ids = list(queryset.values_list("pk", flat=True))
+        queryset.update(is_active=is_active)
+        # `update()` bypasses `post_save`, so the cached users are dropped explicitly, once the change is visible to
+        # the requests which would cache them again
+        transaction.on_commit(lambda: user_cache.invalidate(*user_ids))
+
     def make_active(self, request, queryset):
-        queryset.update(is_active=True)
+        self._set_active(queryset, True)
 
     make_active.short_description = "Mark selected users as active"
 
     def make_inactive(self, request, queryset):
-        queryset.update(is_active=False)
+        self._set_active(queryset, False)
 
     make_inactive.short_description = "Mark selected users as inactive"
 
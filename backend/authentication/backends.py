@@ -0,0 +1,61 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+__all__ = ["CachedModelBackend", "user_cache"]
+
+
+class UserCache:
+    """
+    Short-lived per-process cache of authenticated users keyed by primary key.
+
+    Entries are invalidated locally on user save, delete and logout. Other worker processes only notice such changes
+    after the TTL passes, which is why it should stay in the range of seconds.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+        # every request gets its own instance so that mutations never leak between requests
+        return copy.copy(user)
+
+    def set(self, user_id, user) -> None:
+        with self._lock:
+            self._entries[str(user_id)] = (copy.copy(user), time.monotonic() + self.ttl)
+
+    def invalidate(self, *user_ids) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                user_cache.set(user_id, user)
+        return user
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.backends import user_cache
+from authentication.models import CustomUser
+
+
+class CachedSessionTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+
+    def setUp(self):
+        user_cache.clear()
+        is_logged_in = self.client.login(email="mock@email.com", password="password")
+        assert is_logged_in, "User login failed"
+
+    def verify_session(self):
+        response = self.client.get(reverse("verify_session"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["data"]
+
+    def test_verify_session_without_queries(self):
+        self.assertTrue(self.verify_session())
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.verify_session())
+
+    def test_logout_invalidates_cached_user(self):
+        self.verify_session()
+        self.client.post(reverse("logout"))
+
+        self.assertIsNone(user_cache.get(self.user.pk))
+        self.assertFalse(self.verify_session())
+
+    def test_deactivation_invalidates_cached_user(self):
+        self.verify_session()
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertFalse(self.verify_session())
+
+    def test_password_change_invalidates_session(self):
+        self.verify_session()
+        self.user.set_password("new password")
+        self.user.save()
+
+        self.assertFalse(self.verify_session())
+
+    def test_admin_deactivation_invalidates_cached_user_after_the_update(self):
+        self.verify_session()
+        admin = CustomUser.objects.create_superuser("admin@email.com", "password")
+        admin_client = self.client_class()
+        admin_client.force_login(admin)
+
+        def invalidate(*user_ids):
+            # a request in between must not find the user active anymore
+            self.assertFalse(CustomUser.objects.get(pk=self.user.pk).is_active)
+            invalidate_cache(*user_ids)
+
+        invalidate_cache = user_cache.invalidate
+        with mock.patch.object(user_cache, "invalidate", side_effect=invalidate) as invalidated:
+            with self.captureOnCommitCallbacks(execute=True):
+                admin_client.post(
+                    reverse("admin:authentication_customuser_changelist"),
+                    {"action": "make_inactive", "_selected_action": [self.user.pk]},
+                )
+
+        invalidated.assert_called_once_with(self.user.pk)
+        self.assertFalse(self.verify_session())
@@ -6,6 +6,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view
 
 from authentication.models import CustomUser
+from src.utils.replicas import replica_reads
 
 
 @api_view(["GET"])
@@ -72,6 +73,7 @@ def register_view(request):
     return JsonResponse({"data": "User created successfully"}, status=status.HTTP_201_CREATED)
 
 
+@replica_reads
 @api_view(["GET"])
 def verify_session(request):
     session_cookie = request.COOKIES.get("sessionid")
@@ -0,0 +1,71 @@
+import os
+from importlib.util import find_spec
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+import server
+from src.utils import health
+
+
+class HealthEndpointTests(TestCase):
+    def tearDown(self):
+        health._draining.clear()
+        health.mark_ready()
+
+    def test_healthz(self):
+        response = self.client.get(reverse("healthz"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok"})
+
+    def test_readyz(self):
+        response = self.client.get(reverse("readyz"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ready"})
+
+    def test_readyz_while_starting(self):
+        health.mark_starting()
+
+        response = self.client.get(reverse("readyz"))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {"status": "starting"})
+
+    def test_readyz_while_draining(self):
+        health.mark_draining()
+
+        response = self.client.get(reverse("readyz"))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {"status": "draining"})
+        # liveness is unaffected, in-flight requests are still being served
+        self.assertEqual(self.client.get(reverse("healthz")).status_code, 200)
+
+    def test_warm_up(self):
+        self.assertEqual(set(health.warm_up()), {"llm_client", "urls", "database"})
+
+
+class ServerTests(SimpleTestCase):
+    def test_defaults(self):
+        with mock.patch.dict(os.environ, {"SERVER_WORKERS": "4"}):
+            args = server.parse_args([])
+
+        self.assertEqual(args.workers, 4)
+        self.assertEqual(args.max_requests, 0)
+        self.assertFalse(args.reload)
+
+    def test_missing_uvloop(self):
+        if find_spec("uvloop") is not None:
+            self.skipTest("uvloop is installed")
+        with self.assertRaises(SystemExit), mock.patch("sys.stderr"):
+            server.parse_args(["--loop", "uvloop"])
+
+    def test_read_rss_bytes(self):
+        rss = server.read_rss_bytes(os.getpid())
+        if rss is None:
+            self.skipTest("/proc is not available")
+        self.assertGreater(rss, 0)
+        self.assertIsNone(server.read_rss_bytes(-1))
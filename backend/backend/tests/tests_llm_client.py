@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from src.libs import get_openai
+
+
+class LLMClientTests(SimpleTestCase):
+    def test_urlconf_does_not_load_the_client(self):
+        code = (
+            "import sys, django; django.setup(); "
+            "from django.urls import get_resolver; get_resolver().reverse_dict; "
+            "print('openai' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "backend.settings"},
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+        self.assertEqual(output.strip(), "False")
+
+    def test_client_is_configured_from_the_settings(self):
+        self.addCleanup(get_openai.cache_clear)
+        get_openai.cache_clear()
+
+        with override_settings(OPENAI_API_TYPE="open_ai", OPENAI_API_BASE="http://llm.local/v1", OPENAI_API_KEY="key"):
+            openai = get_openai()
+
+        self.assertEqual((openai.api_type, openai.api_base, openai.api_key), ("open_ai", "http://llm.local/v1", "key"))
+        self.assertIs(get_openai(), openai)
@@ -1,20 +1,44 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
+from django.db import connections
 from django.http import JsonResponse
 from django.urls import include, path
+from django.views.decorators.cache import never_cache
 from rest_framework.decorators import api_view
 
+from src.utils import health
+
 
 @api_view(["GET"])
 def root_view(request):
     return JsonResponse({"message": "App works!"})
 
 
+@never_cache
+async def healthz(request):
+    return JsonResponse({"status": "ok"})
+
+
+@never_cache
+def readyz(request):
+    if health.is_draining():
+        return JsonResponse({"status": "draining"}, status=503)
+    if not health.is_ready():
+        return JsonResponse({"status": "starting"}, status=503)
+    try:
+        connections["default"].ensure_connection()
+    except Exception as e:
+        return JsonResponse({"status": "database unavailable", "detail": str(e)}, status=503)
+    return JsonResponse({"status": "ready"})
+
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("chat/", include("chat.urls")),
     path("gpt/", include("gpt.urls")),
     path("auth/", include("authentication.urls")),
+    path("healthz/", healthz, name="healthz"),
+    path("readyz/", readyz, name="readyz"),
     path("", root_view),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,49 @@
+"""
+Standalone benchmarks, run from the backend directory with e.g. ``python -m benchmarks.message_storage``.
+
+Every benchmark works on a throwaway test database, the development database is never touched.
+"""
+
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import django
+
+__all__ = ["setup_django", "temporary_database", "timed"]
+
+
+def setup_django() -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    django.setup()
+
+
+@contextmanager
+def temporary_database(name: Optional[str] = None):
+    """
+    Runs the block on a new test database, in memory unless a file ``name`` is given (SQLite serializes the writes of
+    concurrent connections to a file database, instead of failing them as a shared in-memory database does).
+    """
+    from django.db import connection
+
+    if name is not None:
+        connection.settings_dict["TEST"]["NAME"] = name
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timed(fn, repeat: int = 20) -> dict[str, float]:
+    """
+    Calls ``fn`` ``repeat`` times and returns the median and best wall time in milliseconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started_at) * 1000)
+    return {"median_ms": statistics.median(durations), "best_ms": min(durations)}
@@ -0,0 +1,121 @@
+"""
+Concurrent request throughput of the sync chat views against ``chat.async_views`` under uvicorn.
+
+Both variants are served in-process from the same throwaway database, the client keeps ``--concurrency`` requests in
+flight until ``--requests`` have completed per endpoint.
+
+Usage: ``python -m benchmarks.async_views [--requests 200] [--concurrency 32] [--conversations 20]``
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from benchmarks import setup_django, temporary_database
+
+HOST, PORT = "127.0.0.1", 8765
+
+
+def serve_in_thread():
+    import uvicorn
+
+    server = uvicorn.Server(
+        uvicorn.Config("backend.asgi:application", host=HOST, port=PORT, lifespan="off", log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def use_views(views_module) -> None:
+    from django.urls import clear_url_caches
+
+    from chat import urls
+
+    urls.urlpatterns[:] = urls.build_urlpatterns(views_module)
+    clear_url_caches()
+
+
+async def load(paths: list[str], session_id: str, total: int, concurrency: int) -> dict[str, float]:
+    import aiohttp
+
+    latencies = []
+    remaining = iter(range(total))
+
+    async def user(session):
+        for idx in remaining:
+            started_at = time.perf_counter()
+            async with session.get(f"http://{HOST}:{PORT}{paths[idx % len(paths)]}", allow_redirects=False) as response:
+                await response.read()
+                assert response.status == 200, response.status
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+    async with aiohttp.ClientSession(headers={"Cookie": f"sessionid={session_id}"}) as session:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(user(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {"rps": total / elapsed, "p50_ms": quantiles[49], "p95_ms": quantiles[94]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and variant.")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--conversations", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.test import Client
+
+    from authentication.models import CustomUser
+    from chat import async_views, views
+    from chat.models import Conversation, Message, Role, Version
+
+    with temporary_database():
+        user = CustomUser.objects.create(email="benchmark@email.com", is_active=True)
+        roles = [Role.objects.create(name="user"), Role.objects.create(name="assistant")]
+        conversation_ids = []
+        for idx in range(args.conversations):
+            conversation = Conversation.objects.create(user=user, title=f"Conversation {idx}")
+            version = Version.objects.create(conversation=conversation)
+            Message.objects.bulk_create(
+                Message(version=version, role=roles[n % 2], content=f"Message {n} of conversation {idx}")
+                for n in range(10)
+            )
+            conversation.active_version = version
+            conversation.save()
+            conversation_ids.append(conversation.pk)
+
+        client = Client()
+        client.force_login(user)
+        session_id = client.cookies["sessionid"].value
+
+        endpoints = {
+            "list": ["/chat/conversations/"],
+            "detail": [f"/chat/conversation_branched/{pk}/" for pk in conversation_ids],
+        }
+        server, thread = serve_in_thread()
+        try:
+            for name, views_module in (("sync", views), ("async", async_views)):
+                use_views(views_module)
+                for endpoint, paths in endpoints.items():
+                    asyncio.run(load(paths, session_id, args.concurrency, args.concurrency))  # warm-up
+                    result = asyncio.run(load(paths, session_id, args.requests, args.concurrency))
+                    print(
+                        f"{name:>5} {endpoint:>6}: {result['rps']:.0f} req/s, "
+                        f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms"
+                    )
+        finally:
+            server.should_exit = True
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Local stand-in for the chat completions API, streaming canned answers at a configurable pace.
+
+It answers the Azure (``/openai/deployments/<engine>/chat/completions``) and OpenAI (``/v1/.../chat/completions``)
+paths the ``openai`` client uses, so the backend talks to it through its real client code. ``benchmarks.load_test``
+starts it in-process, to load test a separately started server run it on its own and point the server at it:
+
+``python -m benchmarks.fake_llm --port 8766`` and start the server with ``OPENAI_API_TYPE=open_ai``,
+``OPENAI_API_BASE=http://127.0.0.1:8766/v1`` and any ``OPENAI_API_KEY``.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+HOST, PORT = "127.0.0.1", 8766
+
+WORDS = (
+    "Sure, here is a short explanation. The answer depends on the details of your setup, so let us go through the "
+    "usual cases one by one. First, check the configuration. Then, measure before you change anything."
+).split()
+
+
+@dataclass
+class Pace:
+    """
+    Timing of a fake answer: the delay before the first token, between tokens, and the number of tokens.
+    """
+
+    first_token: float = 0.3
+    token_interval: float = 0.02
+    tokens: int = 60
+
+
+def answer_tokens(tokens: int) -> list[str]:
+    return [f"{WORDS[idx % len(WORDS)]} " for idx in range(tokens)]
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> bytes:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n".encode()
+
+
+def make_app(pace: Pace):
+    from aiohttp import web
+
+    async def chat_completions(request):
+        if not request.path.endswith("/chat/completions"):
+            raise web.HTTPNotFound()
+        body = await request.json()
+        # Azure requests name the engine in the path instead
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        tokens = answer_tokens(pace.tokens)
+        await asyncio.sleep(pace.first_token)
+
+        if not body.get("stream"):
+            await asyncio.sleep(pace.token_interval * len(tokens))
+            content = "".join(tokens).strip()
+            return web.json_response(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                    ],
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            await response.write(_chunk(completion_id, model, {"role": "assistant"}))
+            for idx, token in enumerate(tokens):
+                if idx:
+                    await asyncio.sleep(pace.token_interval)
+                await response.write(_chunk(completion_id, model, {"content": token}))
+            await response.write(_chunk(completion_id, model, {}, finish_reason="stop"))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # the backend stopped reading, e.g. its client went away
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_post("/{path:.*}", chat_completions)
+    return app
+
+
+def serve_in_thread(pace: Pace, host: str = HOST, port: int = PORT) -> threading.Thread:
+    """
+    Serves the fake API from a daemon thread with its own event loop, returns once it accepts connections.
+    """
+    from aiohttp import web
+
+    started = threading.Event()
+
+    async def serve():
+        runner = web.AppRunner(make_app(pace))
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        started.set()
+        await asyncio.Event().wait()
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+    thread.start()
+    started.wait()
+    return thread
+
+
+def use_fake_llm(host: str = HOST, port: int = PORT) -> None:
+    """
+    Points the ``openai`` client of this process at the fake API.
+    """
+    from src.libs import get_openai
+
+    openai = get_openai()
+    openai.api_type = "open_ai"
+    openai.api_base = f"http://{host}:{port}/v1"
+    openai.api_version = None
+    openai.api_key = "fake"
+
+
+def main() -> None:
+    from aiohttp import web
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Delay before the first token.")
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between tokens.")
+    parser.add_argument("--tokens", type=int, default=60, help="Tokens per answer.")
+    args = parser.parse_args()
+
+    pace = Pace(args.first_token_ms / 1000, args.token_ms / 1000, args.tokens)
+    web.run_app(make_app(pace), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+End-to-end load test of one backend node with chatting users.
+
+Every virtual user registers and logs in, then runs chat sessions until the step ends: it creates a conversation,
+streams the answers from ``/gpt/conversation/`` and saves them, edits its last question (``add_version``), switches
+back to the first version and reloads the conversation list and the active path, with a random think time between
+requests. Steps run one after the other with the given numbers of concurrent users. Each step reports the p50/p95/p99
+latency per endpoint (answers also with the time to their first byte), the throughput and the error rate.
+
+By default the server (uvicorn with ``backend.asgi``, sync or async chat views per ``CHAT_ASYNC_VIEWS``) and the fake
+LLM of ``benchmarks.fake_llm`` run in this process on a throwaway SQLite file. With ``--url`` an already running server
+is tested instead, which must have its roles created and be pointed at ``python -m benchmarks.fake_llm``. New users
+are inactive until an admin activates them, the test activates the users it registers through the ORM, so run it with
+the environment of the server to reach its database.
+
+The in-process server uses SQLite like the default settings, which takes one writer at a time: with many users some
+writes fail with "database is locked" and show up as errors, as they would in such a deployment.
+
+Usage: ``python -m benchmarks.load_test [--users 10,50] [--duration 30] [--think-time 1] [--url URL] [--json FILE]``
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+
+from benchmarks import setup_django, temporary_database
+
+QUESTIONS = [
+    "How do I reverse a list in Python?",
+    "What is the difference between a process and a thread?",
+    "Can you explain database indexes with an example?",
+    "Write a haiku about load testing.",
+    "Why is my SQL query slow?",
+]
+
+
+class RequestFailed(Exception):
+    pass
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Counter = field(default_factory=Counter)
+    # the first failure of every endpoint
+    failures: dict[str, str] = field(default_factory=dict)
+    sessions: int = 0
+
+    def record(self, endpoint: str, started_at: float, ok: bool) -> None:
+        if ok:
+            self.latencies[endpoint].append((time.perf_counter() - started_at) * 1000)
+        else:
+            self.errors[endpoint] += 1
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Returns the nearest-rank percentile of the values.
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)] if ordered else float("nan")
+
+
+def activate_user(email: str) -> None:
+    from authentication.models import CustomUser
+
+    # not cached by the server before its first login
+    CustomUser.objects.filter(email=email).update(is_active=True)
+
+
+class VirtualUser:
+    """
+    One chatting user with its own session and CSRF cookies.
+
+    Cookies are kept by hand, the backend marks them ``Secure`` and a cookie jar would not send them over plain HTTP.
+    """
+
+    def __init__(self, session, base_url: str, stats: Stats, think_time: float, turns: int, rng: random.Random):
+        self.session = session
+        self.base_url = base_url
+        self.stats = stats
+        self.think_time = think_time
+        self.turns = turns
+        self.rng = rng
+        self.cookies = {}
+
+    async def request(self, endpoint: str, method: str, path: str, data=None, stream: bool = False) -> bytes:
+        import aiohttp
+
+        headers = {"Cookie": "; ".join(f"{name}={value}" for name, value in self.cookies.items())}
+        if "csrftoken" in self.cookies:
+            headers["X-CSRFToken"] = self.cookies["csrftoken"]
+        started_at = time.perf_counter()
+        try:
+            async with self.session.request(
+                method, self.base_url + path, json=data, headers=headers, allow_redirects=False
+            ) as response:
+                if stream:
+                    chunks = [await response.content.readany()]
+                    self.stats.record(f"{endpoint} (first byte)", started_at, response.status < 400)
+                    async for chunk in response.content.iter_any():
+                        chunks.append(chunk)
+                    body = b"".join(chunks)
+                else:
+                    body = await response.read()
+                for name, morsel in response.cookies.items():
+                    self.cookies[name] = morsel.value
+                ok = response.status < 400
+                text = body.decode(errors="replace")
+                # the title of debug error pages names the exception
+                title = re.search(r"<title>(.*?)</title>", text, re.DOTALL)
+                failure = f"{response.status} {' '.join((title.group(1) if title else text).split())[:200]}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            ok, body, failure = False, b"", repr(e)
+        self.stats.record(endpoint, started_at, ok)
+        if not ok:
+            self.stats.failures.setdefault(endpoint, failure)
+            raise RequestFailed(endpoint)
+        return body
+
+    async def request_json(self, endpoint: str, method: str, path: str, data=None) -> dict:
+        body = await self.request(endpoint, method, path, data)
+        return json.loads(body) if body else {}
+
+    async def think(self) -> None:
+        if self.think_time:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+
+    async def log_in(self) -> None:
+        credentials = {"email": f"load-{uuid.uuid4().hex}@email.com", "password": "load-test-password"}
+        await self.request("register", "POST", "/auth/register/", credentials)
+        await sync_to_async(activate_user)(credentials["email"])
+        await self.request("login", "POST", "/auth/login/", credentials)
+        await self.request("csrf_token", "GET", "/auth/csrf_token/")
+
+    async def answer(self, history: list[dict]) -> str:
+        await self.think()
+        body = await self.request(
+            "gpt_conversation", "POST", "/gpt/conversation/", {"conversation": history, "model": "gpt35"}, stream=True
+        )
+        return body.decode()
+
+    async def add_message(self, conversation_id: str, role: str, content: str) -> str:
+        await self.think()
+        data = await self.request_json(
+            "conversation_add_message",
+            "POST",
+            f"/chat/conversations/{conversation_id}/add_message/",
+            {"role": role, "content": content},
+        )
+        return data["message"]["id"]
+
+    async def chat_session(self) -> None:
+        question = self.rng.choice(QUESTIONS)
+        conversation = await self.request_json(
+            "add_conversation",
+            "POST",
+            "/chat/conversations/add/",
+            {"title": question[:50], "messages": [{"role": "user", "content": question}]},
+        )
+        conversation_id, first_version_id = conversation["id"], conversation["active_version"]
+        history = [{"role": "user", "content": question}]
+        question_id = conversation["versions"][0]["messages"][0]["id"]
+
+        for turn in range(self.turns):
+            if turn:
+                question = self.rng.choice(QUESTIONS)
+                question_id = await self.add_message(conversation_id, "user", question)
+                history.append({"role": "user", "content": question})
+            answer = await self.answer(history)
+            await self.add_message(conversation_id, "assistant", answer)
+            history.append({"role": "assistant", "content": answer})
+
+        # edit the last question: a new version branched at it, answered anew
+        await self.think()
+        await self.request_json(
+            "conversation_add_version",
+            "POST",
+            f"/chat/conversations/{conversation_id}/add_version/",
+            {"root_message_id": question_id},
+        )
+        edited = f"{question} Please keep it short."
+        await self.add_message(conversation_id, "user", edited)
+        answer = await self.answer([*history[:-2], {"role": "user", "content": edited}])
+        await self.add_message(conversation_id, "assistant", answer)
+
+        await self.think()
+        await self.request(
+            "conversation_switch_version",
+            "PUT",
+            f"/chat/conversations/{conversation_id}/switch_version/{first_version_id}/",
+        )
+        await self.think()
+        await self.request("get_conversations", "GET", "/chat/conversations/")
+        await self.think()
+        await self.request("get_conversation_active_path", "GET", f"/chat/conversations/{conversation_id}/active_path/")
+        self.stats.sessions += 1
+
+    async def run(self, start_delay: float, deadline: float) -> None:
+        await asyncio.sleep(start_delay)
+        try:
+            await self.log_in()
+        except RequestFailed:
+            return
+        while time.monotonic() < deadline:
+            try:
+                await asyncio.wait_for(self.chat_session(), timeout=max(deadline - time.monotonic(), 0.001))
+            except RequestFailed:
+                await self.think()
+            except asyncio.TimeoutError:
+                # the session still running at the end of the step is cut off
+                break
+
+
+async def run_step(base_url: str, users: int, args: argparse.Namespace) -> dict:
+    import aiohttp
+
+    stats = Stats()
+    rng = random.Random(args.seed)
+    started_at = time.monotonic()
+    deadline = started_at + args.ramp_up + args.duration
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=timeout, cookie_jar=aiohttp.DummyCookieJar()
+    ) as session:
+        virtual_users = [
+            VirtualUser(session, base_url, stats, args.think_time, args.turns, random.Random(rng.random()))
+            for _ in range(users)
+        ]
+        await asyncio.gather(
+            *(user.run(idx * args.ramp_up / users, deadline) for idx, user in enumerate(virtual_users))
+        )
+    elapsed = time.monotonic() - started_at
+
+    requests = sum(len(values) for name, values in stats.latencies.items() if not name.endswith("(first byte)"))
+    errors = sum(count for name, count in stats.errors.items() if not name.endswith("(first byte)"))
+    return {
+        "users": users,
+        "elapsed_s": elapsed,
+        "sessions": stats.sessions,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "error_rate": errors / max(requests + errors, 1),
+        "failures": stats.failures,
+        "endpoints": {
+            name: {
+                "count": len(stats.latencies[name]),
+                "errors": stats.errors[name],
+                "p50_ms": percentile(stats.latencies[name], 50),
+                "p95_ms": percentile(stats.latencies[name], 95),
+                "p99_ms": percentile(stats.latencies[name], 99),
+            }
+            for name in sorted({*stats.latencies, *stats.errors})
+        },
+    }
+
+
+def print_step(result: dict) -> None:
+    print(
+        f"\n{result['users']} users, {result['elapsed_s']:.0f}s: {result['requests']} requests, "
+        f"{result['throughput_rps']:.1f} req/s, {result['sessions']} sessions, "
+        f"{result['error_rate']:.1%} errors"
+    )
+    print(f"  {'endpoint':<42} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, endpoint in result["endpoints"].items():
+        print(
+            f"  {name:<42} {endpoint['count']:>6} {endpoint['errors']:>6} {endpoint['p50_ms']:>8.1f} "
+            f"{endpoint['p95_ms']:>8.1f} {endpoint['p99_ms']:>8.1f}"
+        )
+    for name, failure in result["failures"].items():
+        print(f"  first {name} failure: {failure}")
+
+
+def run_steps(base_url: str, args: argparse.Namespace) -> list[dict]:
+    results = []
+    for users in args.users:
+        result = asyncio.run(run_step(base_url, users, args))
+        print_step(result)
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--users",
+        type=lambda value: [int(users) for users in value.split(",")],
+        default=[10, 50],
+        help="Comma separated numbers of concurrent users, one step each.",
+    )
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per step after the ramp-up.")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which the users of a step start.")
+    parser.add_argument("--think-time", type=float, default=1, help="Mean seconds between requests of a user.")
+    parser.add_argument("--turns", type=int, default=2, help="Questions per conversation before the edit.")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds after which a request counts as failed.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", default=None, help="Base URL of a running server instead of the in-process one.")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Fake LLM delay before the first token.")
+    parser.add_argument("--token-ms", type=float, default=20, help="Fake LLM delay between tokens.")
+    parser.add_argument("--tokens", type=int, default=60, help="Fake LLM tokens per answer.")
+    parser.add_argument("--json", default=None, help="File to write the results to.")
+    args = parser.parse_args()
+
+    setup_django()
+    if args.url is not None:
+        results = run_steps(args.url.rstrip("/"), args)
+    else:
+        from django.core.management import call_command
+        from django.db import connection
+
+        from benchmarks import fake_llm
+        from benchmarks.async_views import HOST, PORT, serve_in_thread
+
+        # the connections of the server threads wait for the write lock instead of failing at once
+        connection.settings_dict["OPTIONS"]["timeout"] = 30
+        with tempfile.TemporaryDirectory() as directory, temporary_database(os.path.join(directory, "load.sqlite3")):
+            with connection.cursor() as cursor:
+                # readers do not block the writer
+                cursor.execute("PRAGMA journal_mode=WAL")
+            call_command("create_roles", stdout=io.StringIO())
+            fake_llm.serve_in_thread(fake_llm.Pace(args.first_token_ms / 1000, args.token_ms / 1000, args.tokens))
+            fake_llm.use_fake_llm()
+            server, thread = serve_in_thread()
+            try:
+                results = run_steps(f"http://{HOST}:{PORT}", args)
+            finally:
+                server.should_exit = True
+                thread.join()
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"steps": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Storage saved by cold message compression against the read latency of a compressed conversation.
+
+Usage: ``python -m benchmarks.message_storage [--conversations 20] [--messages 50]``
+"""
+
+import argparse
+import random
+from datetime import timedelta
+from io import StringIO
+
+from benchmarks import setup_django, temporary_database, timed
+
+WORDS = (
+    "the model answer code python django request response database query index version message branch stream "
+    "token cache latency throughput example function return value list dict string error retry user assistant"
+).split()
+
+
+def make_answer(rng: random.Random) -> str:
+    paragraphs = []
+    for _ in range(rng.randint(2, 8)):
+        sentences = [" ".join(rng.choices(WORDS, k=rng.randint(6, 18))).capitalize() + "." for _ in range(5)]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def stored_bytes() -> int:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB)) + COALESCE(LENGTH(compressed_content), 0)), 0) "
+            "FROM chat_messagecontent"
+        )
+        return cursor.fetchone()[0]
+
+
+def read_conversation(conversation_id) -> None:
+    from chat.models import Conversation
+    from chat.serializers import ConversationSerializer
+
+    ConversationSerializer(Conversation.objects.get(pk=conversation_id)).data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50, help="Messages per conversation.")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from authentication.models import CustomUser
+    from chat.models import Conversation, Message, MessageContent, Role, Version
+    from chat.utils.compression import AVAILABLE_CODECS
+
+    with temporary_database():
+        rng = random.Random(0)
+        user = CustomUser.objects.create(email="benchmark@email.com")
+        roles = [Role.objects.create(name="user"), Role.objects.create(name="assistant")]
+        for _ in range(args.conversations):
+            conversation = Conversation.objects.create(user=user)
+            version = Version.objects.create(conversation=conversation)
+            Message.objects.bulk_create(
+                Message(version=version, role=roles[idx % 2], content=make_answer(rng)) for idx in range(args.messages)
+            )
+            conversation.active_version = version
+            conversation.save()
+        Conversation.objects.update(modified_at=timezone.now() - timedelta(days=365))
+        conversation_id = Conversation.objects.values_list("pk", flat=True).first()
+
+        hot_bytes = stored_bytes()
+        hot_read = timed(lambda: read_conversation(conversation_id))
+        print(f"hot: {hot_bytes} bytes, read {hot_read['median_ms']:.2f} ms (best {hot_read['best_ms']:.2f} ms)")
+
+        for codec in AVAILABLE_CODECS:
+            # restore plain storage from the previous codec run
+            for body in MessageContent.objects.all():
+                MessageContent.objects.filter(pk=body.pk).update(content=body.text, compressed_content=None)
+            call_command("compress_cold_messages", days=30, codec=codec, stdout=StringIO())
+
+            cold_bytes = stored_bytes()
+            cold_read = timed(lambda: read_conversation(conversation_id))
+            print(
+                f"{codec}: {cold_bytes} bytes ({100 * (1 - cold_bytes / hot_bytes):.1f}% saved), "
+                f"read {cold_read['median_ms']:.2f} ms (best {cold_read['best_ms']:.2f} ms, "
+                f"{cold_read['median_ms'] - hot_read['median_ms']:+.2f} ms)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Serialization time of a large conversation with ``ConversationSerializer`` against ``serialize_conversations``.
+
+The DRF serializer is measured as the sync views used it, loading the related rows lazily, and with every relation
+prefetched as the async views did, which leaves only the serialization itself.
+
+Usage: ``python -m benchmarks.serialization [--versions 20] [--messages 100] [--repeat 10]``
+"""
+
+import argparse
+
+from benchmarks import setup_django, temporary_database, timed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--versions", type=int, default=20, help="Versions branched off the first version.")
+    parser.add_argument("--messages", type=int, default=100, help="Messages per version.")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db.models import Prefetch
+
+    from authentication.models import CustomUser
+    from chat.models import Conversation, Message, Role, Version
+    from chat.serializers import ConversationSerializer
+    from chat.utils.read_serializers import serialize_conversations
+
+    with temporary_database():
+        user = CustomUser.objects.create(email="benchmark@email.com", is_active=True)
+        roles = [Role.objects.create(name="user"), Role.objects.create(name="assistant")]
+        conversation = Conversation.objects.create(user=user, title="Large")
+        root = Version.objects.create(conversation=conversation)
+        root_messages = Message.objects.bulk_create(
+            Message(version=root, role=roles[n % 2], content=f"Message {n} of the first version")
+            for n in range(args.messages)
+        )
+        for idx in range(args.versions):
+            version = Version.objects.create(
+                conversation=conversation, parent_version=root, root_message=root_messages[idx % args.messages]
+            )
+            Message.objects.bulk_create(
+                Message(version=version, role=roles[n % 2], content=f"Message {n} of version {idx}")
+                for n in range(args.messages)
+            )
+        conversation.active_version = root
+        conversation.save()
+
+        conversations = Conversation.objects.filter(pk=conversation.pk)
+        prefetched = conversations.select_related("active_version").prefetch_related(
+            Prefetch(
+                "versions",
+                queryset=Version.objects.select_related("root_message").prefetch_related(
+                    Prefetch("messages", queryset=Message.objects.select_related("role"))
+                ),
+            )
+        )
+        prefetched_list = list(prefetched)
+
+        results = {
+            "DRF, lazy queries": timed(lambda: ConversationSerializer(conversations, many=True).data, args.repeat),
+            "DRF, prefetched": timed(lambda: ConversationSerializer(prefetched.all(), many=True).data, args.repeat),
+            "DRF, serialization only": timed(
+                lambda: ConversationSerializer(prefetched_list, many=True).data, args.repeat
+            ),
+            "values, with queries": timed(lambda: serialize_conversations(conversations), args.repeat),
+        }
+        messages = (args.versions + 1) * args.messages
+        print(f"{args.versions + 1} versions, {messages} messages")
+        baseline = results["values, with queries"]["median_ms"]
+        for name, result in results.items():
+            print(
+                f"{name:>24}: median {result['median_ms']:8.1f} ms, best {result['best_ms']:8.1f} ms "
+                f"({result['median_ms'] / baseline:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Startup time of a fresh process: ``django.setup()``, the first request (which loads the URLconf and builds the
+middleware chain) and, separately, importing and configuring the LLM client, which the first GPT request pays.
+
+Every run is a new interpreter, so nothing is cached between runs; the process time is measured from the outside and
+includes the interpreter startup.
+
+Usage: ``python -m benchmarks.startup [--runs 10]``
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure() -> dict:
+    timings = {}
+
+    started_at = time.perf_counter()
+    from benchmarks import setup_django
+
+    setup_django()
+    timings["django_setup_ms"] = (time.perf_counter() - started_at) * 1000
+
+    from django.test import Client
+
+    started_at = time.perf_counter()
+    # `ALLOWED_HOSTS` is empty in development, which allows localhost
+    response = Client(HTTP_HOST="localhost").get("/chat/")
+    assert response.status_code == 200, response.status_code
+    timings["first_request_ms"] = (time.perf_counter() - started_at) * 1000
+    timings["llm_client_loaded"] = "openai" in sys.modules
+
+    from src.libs import get_openai
+
+    started_at = time.perf_counter()
+    get_openai()
+    timings["llm_client_ms"] = (time.perf_counter() - started_at) * 1000
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure()))
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        started_at = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"], capture_output=True, text=True, check=True
+        ).stdout
+        run = json.loads(output.splitlines()[-1])
+        run["process_ms"] = (time.perf_counter() - started_at) * 1000
+        runs.append(run)
+
+    for name in ("django_setup_ms", "first_request_ms", "llm_client_ms", "process_ms"):
+        durations = [run[name] for run in runs]
+        print(f"{name[:-3]:>14}: median {statistics.median(durations):7.1f} ms, best {min(durations):7.1f} ms")
+    print(f"LLM client loaded by the first request: {any(run['llm_client_loaded'] for run in runs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+CPU spent per streamed KB of a GPT answer made of tiny deltas, raw against several coalescing policies.
+
+The answer is written to a socket, as a WSGI server does, and through Django's ASGI handler to a no-op ``send``.
+
+Usage: ``python -m benchmarks.streaming [--kilobytes 256] [--repeat 5]``
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import threading
+import time
+
+from benchmarks import setup_django
+
+POLICIES = {
+    "raw": {"max_bytes": 0, "max_delay": 0},
+    "64 B": {"max_bytes": 64, "max_delay": 0.05},
+    "256 B": {"max_bytes": 256, "max_delay": 0.05},
+    "256 B + sentence": {"max_bytes": 256, "max_delay": 0.05, "flush_on_sentence": True},
+    "1 KB": {"max_bytes": 1024, "max_delay": 0.05},
+}
+
+
+def make_deltas(kilobytes: int, rng: random.Random) -> list[str]:
+    """
+    Splits a generated answer into deltas of 1 to 3 characters, the size the upstream streams.
+    """
+    words = "the model answer code stream token latency request response python. Django query!".split()
+    text = " ".join(rng.choices(words, k=kilobytes * 1024 // 6))[: kilobytes * 1024]
+    deltas = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 3)
+        deltas.append(text[position : position + size])  # noqa: E203
+        position += size
+    return deltas
+
+
+def cpu_time(fn) -> float:
+    started_at = time.process_time()
+    fn()
+    return time.process_time() - started_at
+
+
+def stream_wsgi(deltas: list[str], policy: dict) -> None:
+    from django.http import StreamingHttpResponse
+
+    from src.utils.streaming import coalesce_chunks
+
+    response = StreamingHttpResponse(coalesce_chunks(iter(deltas), **policy), content_type="text/html")
+    writer, reader = socket.socketpair()
+
+    def drain():
+        while reader.recv(65536):
+            pass
+
+    drainer = threading.Thread(target=drain)
+    drainer.start()
+    try:
+        for chunk in response:
+            writer.sendall(chunk)
+    finally:
+        writer.close()
+        drainer.join()
+        reader.close()
+
+
+def stream_asgi(deltas: list[str], policy: dict) -> None:
+    from django.core.handlers.asgi import ASGIHandler
+    from django.http import StreamingHttpResponse
+
+    from src.utils.streaming import AsyncChunkIterator, coalesce_chunks
+
+    chunks = AsyncChunkIterator(coalesce_chunks(iter(deltas), **policy), thread_sensitive=False)
+    response = StreamingHttpResponse(chunks, content_type="text/html")
+
+    async def send(message):
+        pass
+
+    asyncio.run(ASGIHandler().send_response(response, send))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--kilobytes", type=int, default=256, help="Size of the streamed answer.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from src.utils.streaming import coalesce_chunks
+
+    deltas = make_deltas(args.kilobytes, random.Random(0))
+    streamed_kb = sum(len(delta.encode()) for delta in deltas) / 1024
+    print(f"{len(deltas)} deltas, {streamed_kb:.0f} KB")
+    print(f"{'policy':<18} {'writes':>8} {'WSGI µs/KB':>12} {'ASGI µs/KB':>12}")
+    for name, policy in POLICIES.items():
+        writes = sum(1 for _ in coalesce_chunks(iter(deltas), **policy))
+        results = []
+        for stream in (stream_wsgi, stream_asgi):
+            seconds = statistics.median(cpu_time(lambda: stream(deltas, policy)) for _ in range(args.repeat))
+            results.append(seconds * 1e6 / streamed_kb)
+        print(f"{name:<18} {writes:>8} {results[0]:>12.1f} {results[1]:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,136 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Count, F, QuerySet
 from django.utils import timezone
-from nested_admin.nested import NestedModelAdmin, NestedStackedInline, NestedTabularInline
+from django.utils.html import format_html
+from nested_admin.formsets import NestedInlineFormSet
+from nested_admin.nested import NestedModelAdmin, NestedTabularInline
 
 from chat.models import Conversation, Message, Role, Version
+from chat.utils.purge import purge_conversations
+from chat.utils.sharding import ShardedPaginator, merge_shards, shard_querysets
+
+
+class ShardedChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        # a single page (or "show all") is taken from the queryset instead of the paginator
+        if isinstance(self.result_list, QuerySet):
+            self.result_list = merge_shards(self.queryset, self.result_count)
+
+
+class ShardFormFieldsMixin:
+    """
+    Looks up the chat objects of the form fields on the shard of the edited object, see ``ShardedAdminMixin``.
+    """
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        shard = getattr(request, "_chat_shard", None)
+        if shard is not None and db_field.related_model._meta.app_label == "chat":
+            kwargs.setdefault("using", shard)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class ShardedAdminMixin(ShardFormFieldsMixin):
+    """
+    Shows the chat objects of all shards: the change list is one list merged from the shards, objects are looked up on
+    every shard and edited on theirs, and actions run on the shard of the selected objects.
+    """
+
+    def get_changelist(self, request, **kwargs):
+        return ShardedChangeList if len(settings.CHAT_SHARDS) > 1 else super().get_changelist(request, **kwargs)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if len(settings.CHAT_SHARDS) == 1:
+            return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        return ShardedPaginator(queryset, per_page, orphans, allow_empty_first_page)
+
+    def get_list_display(self, request):
+        list_display = super().get_list_display(request)
+        return [*list_display, "shard"] if len(settings.CHAT_SHARDS) > 1 else list_display
+
+    def get_object(self, request, object_id, from_field=None):
+        queryset = self.get_queryset(request)
+        model = queryset.model
+        field = model._meta.pk if from_field is None else model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+        except (ValidationError, ValueError):
+            return None
+        for shard_queryset in shard_querysets(queryset):
+            obj = shard_queryset.filter(**{field.name: object_id}).first()
+            if obj is not None:
+                request._chat_shard = obj._state.db
+                return obj
+        return None
+
+    def response_action(self, request, queryset):
+        if len(settings.CHAT_SHARDS) == 1:
+            return super().response_action(request, queryset)
+        if request.POST.get("select_across") == "1":
+            self.message_user(request, "Actions cannot select across shards, select the objects.", messages.WARNING)
+            return None
+        selected = request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)
+        shards = [
+            shard_queryset.db
+            for shard_queryset in shard_querysets(queryset)
+            if selected and shard_queryset.filter(pk__in=selected).exists()
+        ]
+        if len(shards) > 1:
+            self.message_user(
+                request,
+                f"The selected objects are on the shards {', '.join(shards)}, select one shard at a time.",
+                messages.WARNING,
+            )
+            return None
+        return super().response_action(request, queryset.using(shards[0]) if shards else queryset)
+
+    def shard(self, obj):
+        return obj._state.db
 
 
 class RoleAdmin(NestedModelAdmin):
     list_display = ["id", "name"]
 
 
-class MessageAdmin(NestedModelAdmin):
+class MessageAdminForm(forms.ModelForm):
+    """
+    Edits the text of a message in place of its content reference.
+    """
+
+    content = forms.CharField(widget=forms.Textarea)
+
+    class Meta:
+        model = Message
+        exclude = ["body"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.body_id is not None:
+            self.initial.setdefault("content", self.instance.content)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if "content" in cleaned_data:
+            self.instance.content = cleaned_data["content"]
+        return cleaned_data
+
+
+class MessageAdmin(ShardedAdminMixin, NestedModelAdmin):
+    form = MessageAdminForm
     list_display = ["display_desc", "role", "id", "created_at", "version"]
+    list_select_related = ["body", "role", "version__conversation", "version__root_message"]
+    raw_id_fields = ["version"]
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # the changelist skips `list_select_related` when the default manager already joins the content
+        return super().get_queryset(request).select_related(*self.list_select_related)
 
     def display_desc(self, obj):
         return obj.content[:20] + "..."
@@ -18,15 +138,119 @@ class MessageAdmin(NestedModelAdmin):
     display_desc.short_description = "content"
 
 
-class MessageInline(NestedTabularInline):
+class PaginatedInlineFormSet(NestedInlineFormSet):
+    page_slice = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the related objects are on the shard of the edited object
+        if self.instance._state.db is not None:
+            self.queryset = self.queryset.using(self.instance._state.db)
+
+    def get_queryset(self):
+        if not hasattr(self, "_page_queryset"):
+            queryset = super().get_queryset()
+            if self.is_bound:
+                # the submitted forms name their objects, only those are loaded to be updated
+                queryset = queryset.filter(pk__in=self._submitted_pks())
+            elif self.page_slice is not None:
+                queryset = queryset[slice(*self.page_slice)]
+            self._page_queryset = queryset
+        return self._page_queryset
+
+    def _submitted_pks(self) -> list:
+        pk_field = self.model._meta.pk
+        pks = []
+        for idx in range(self.initial_form_count()):
+            try:
+                pk = pk_field.to_python(self.data.get(f"{self.add_prefix(idx)}-{pk_field.name}"))
+            except ValidationError:
+                continue
+            if pk is not None:
+                pks.append(pk)
+        return pks
+
+
+class PaginatedInlineMixin:
+    """
+    Renders only one page of related objects on the change page, with page links in the inline heading.
+    """
+
+    formset = PaginatedInlineFormSet
+    per_page = 50
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        if obj is None:
+            return formset
+
+        page_param = f"{self.opts.model_name}_page"
+        queryset = self.get_queryset(request).using(obj._state.db).filter(**{formset.fk.name: obj})
+        page = Paginator(queryset, self.per_page).get_page(request.GET.get(page_param))
+        self.title = self._get_page_title(request, page, page_param)
+
+        return type(formset.__name__, (formset,), {"page_slice": (max(page.start_index() - 1, 0), page.end_index())})
+
+    def _get_page_title(self, request, page, page_param):
+        def page_link(number, label):
+            params = request.GET.copy()
+            params[page_param] = number
+            return format_html('<a href="?{}">{}</a>', params.urlencode(), label)
+
+        title = format_html(
+            "{} (page {} of {}, {} total)",
+            self.opts.verbose_name_plural.capitalize(),
+            page.number,
+            page.paginator.num_pages,
+            page.paginator.count,
+        )
+        if page.has_previous():
+            title = format_html("{} {}", title, page_link(page.previous_page_number(), "previous"))
+        if page.has_next():
+            title = format_html("{} {}", title, page_link(page.next_page_number(), "next"))
+        return title
+
+
+class MessageInline(ShardFormFieldsMixin, PaginatedInlineMixin, NestedTabularInline):
     model = Message
+    form = MessageAdminForm
     extra = 2  # number of extra forms to display
+    readonly_fields = ["created_at"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("role")
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == "role":
+            # evaluate the roles once per request instead of once per rendered form
+            if not hasattr(request, "_role_choices"):
+                request._role_choices = list(formfield.choices)
+            formfield.choices = request._role_choices
+        return formfield
+
+
+class VersionInline(ShardFormFieldsMixin, PaginatedInlineMixin, NestedTabularInline):
+    """
+    Lists the versions of a conversation without their messages, which are edited on the version change page.
+    """
 
-class VersionInline(NestedStackedInline):
     model = Version
-    extra = 1
-    inlines = [MessageInline]
+    fk_name = "conversation"
+    extra = 0
+    fields = ["parent_version", "root_message", "message_count"]
+    readonly_fields = ["message_count"]
+    raw_id_fields = ["parent_version", "root_message"]
+    ordering = [F("root_message__created_at").asc(nulls_first=True)]
+    show_change_link = True
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("root_message").annotate(_message_count=Count("messages"))
+
+    def message_count(self, obj):
+        return getattr(obj, "_message_count", None)
+
+    message_count.short_description = "Number of messages"
 
 
 class DeletedListFilter(admin.SimpleListFilter):
@@ -48,12 +272,31 @@ class DeletedListFilter(admin.SimpleListFilter):
         return queryset
 
 
-class ConversationAdmin(NestedModelAdmin):
+class ConversationAdmin(ShardedAdminMixin, NestedModelAdmin):
     actions = ["undelete_selected", "soft_delete_selected"]
     inlines = [VersionInline]
-    list_display = ("title", "id", "created_at", "modified_at", "deleted_at", "version_count", "is_deleted", "user")
+    list_display = (
+        "title",
+        "id",
+        "created_at",
+        "modified_at",
+        "deleted_at",
+        "version_count",
+        "message_count",
+        "is_deleted",
+        "user",
+    )
     list_filter = (DeletedListFilter,)
+    # no join at all, users are on the default database only and a join would drop the conversations on the other
+    # shards, they are prefetched instead
+    list_select_related = ()
     ordering = ("-modified_at",)
+    raw_id_fields = ("active_version", "user")
+    readonly_fields = ("version_count", "message_count", "last_message_preview")
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related("user")
 
     def undelete_selected(self, request, queryset):
         queryset.update(deleted_at=None)
@@ -74,6 +317,34 @@ class ConversationAdmin(NestedModelAdmin):
                 choices[idx] = new_choice
         return choices
 
+    def get_deleted_objects(self, objs, request):
+        """
+        Summarizes the hard delete confirmation with counts instead of listing every version and message.
+        """
+        conversation_ids = [obj.pk for obj in objs]
+        using = objs[0]._state.db if conversation_ids else None
+        model_count = {
+            Conversation._meta.verbose_name_plural: len(conversation_ids),
+            Version._meta.verbose_name_plural: Version.objects.using(using)
+            .filter(conversation_id__in=conversation_ids)
+            .count(),
+            Message._meta.verbose_name_plural: Message.objects.using(using)
+            .filter(version__conversation_id__in=conversation_ids)
+            .count(),
+        }
+        perms_needed = {
+            model._meta.verbose_name
+            for model in (Version, Message)
+            if not request.user.has_perm(f"{model._meta.app_label}.delete_{model._meta.model_name}")
+        }
+        return [str(obj) for obj in objs], model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        purge_conversations([obj.pk], using=obj._state.db)
+
+    def delete_queryset(self, request, queryset):
+        purge_conversations(list(queryset.values_list("pk", flat=True)), using=queryset.db)
+
     def is_deleted(self, obj):
         return obj.deleted_at is not None
 
@@ -81,9 +352,18 @@ class ConversationAdmin(NestedModelAdmin):
     is_deleted.short_description = "Deleted?"
 
 
-class VersionAdmin(NestedModelAdmin):
+class VersionAdmin(ShardedAdminMixin, NestedModelAdmin):
     inlines = [MessageInline]
     list_display = ("id", "conversation", "parent_version", "root_message")
+    list_select_related = (
+        "conversation",
+        "root_message__body",
+        "root_message__role",
+        "parent_version__conversation",
+        "parent_version__root_message",
+    )
+    raw_id_fields = ("conversation", "parent_version", "root_message")
+    show_full_result_count = False
 
 
 admin.site.register(Role, RoleAdmin)
@@ -0,0 +1,350 @@
+"""
+Coroutine implementations of the chat views for the ASGI server, with the same URLs, payloads and status codes as
+``chat.views``. Enabled with the ``CHAT_ASYNC_VIEWS`` setting.
+
+Reads go through the async ORM and prefetch everything the serializers touch, so serialization runs on the event loop
+without lazy queries. Serializer validation which looks up related rows, nested serializer updates and the
+``values_list()`` based conversation reads of ``serialize_conversations`` run in a single ``sync_to_async`` call each.
+"""
+
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+from rest_framework import status
+
+from chat.models import Conversation, Message, Version
+from chat.serializers import ConversationSerializer, MessageSerializer, TitleSerializer, VersionSerializer
+from chat.tasks import purge_conversation
+from chat.utils.active_path import make_active_path, resolve_path_version, sibling_versions_queryset
+from chat.utils.branching import make_branched_conversation
+from chat.utils.read_serializers import serialize_conversations
+from chat.views import export_conversations  # noqa: F401, streamed through `adapt_streaming_content` already
+from src.utils.async_views import ApiResponse, async_login_required, parse_request_data
+from src.utils.replicas import replica_reads
+
+
+def _with_version_relations(versions):
+    return versions.select_related("conversation__active_version", "root_message").prefetch_related(
+        Prefetch("messages", queryset=Message.objects.select_related("role"))
+    )
+
+
+def _with_conversation_relations(conversations):
+    return conversations.select_related("active_version").prefetch_related(
+        Prefetch(
+            "versions",
+            queryset=Version.objects.select_related("root_message").prefetch_related(
+                Prefetch("messages", queryset=Message.objects.select_related("role"))
+            ),
+        )
+    )
+
+
+def _parse_data(request):
+    try:
+        return parse_request_data(request), None
+    except ValueError as e:
+        return None, ApiResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+async def _validate(serializer) -> bool:
+    # related fields are resolved with sync queries during validation
+    return await sync_to_async(serializer.is_valid)()
+
+
+async def _create_message(serializer, version):
+    serializer.instance = await Message.objects.next_to(version).acreate(version=version, **serializer.validated_data)
+    return serializer.data
+
+
+async def _list_conversations(user):
+    conversations = (
+        Conversation.objects.for_user(user).filter(user=user, deleted_at__isnull=True).order_by("-modified_at")
+    )
+    return await sync_to_async(serialize_conversations)(conversations)
+
+
+@require_http_methods(["GET"])
+async def chat_root_view(request):
+    return ApiResponse({"message": "Chat works!"}, status=status.HTTP_200_OK)
+
+
+@replica_reads
+@async_login_required
+@require_http_methods(["GET"])
+async def get_conversations(request):
+    conversations_data = await _list_conversations(await request.auser())
+    return ApiResponse(conversations_data, status=status.HTTP_200_OK)
+
+
+@replica_reads
+@async_login_required
+@require_http_methods(["GET"])
+async def get_conversations_branched(request):
+    conversations_data = await _list_conversations(await request.auser())
+    for conversation_data in conversations_data:
+        make_branched_conversation(conversation_data)
+
+    return ApiResponse(conversations_data, status=status.HTTP_200_OK)
+
+
+@replica_reads
+@async_login_required
+@require_http_methods(["GET"])
+async def get_conversation_branched(request, pk):
+    user = await request.auser()
+    conversations_data = await sync_to_async(serialize_conversations)(
+        Conversation.objects.for_user(user).filter(user=user, pk=pk, deleted_at__isnull=True)
+    )
+    if not conversations_data:
+        return ApiResponse({"detail": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    conversation_data = conversations_data[0]
+    make_branched_conversation(conversation_data)
+
+    return ApiResponse(conversation_data, status=status.HTTP_200_OK)
+
+
+@replica_reads
+@async_login_required
+@require_http_methods(["GET"])
+async def get_conversation_active_path(request, pk):
+    try:
+        user = await request.auser()
+        conversation = await Conversation.objects.for_user(user).aget(user=user, pk=pk, deleted_at__isnull=True)
+    except Conversation.DoesNotExist:
+        return ApiResponse({"detail": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        version = await sync_to_async(resolve_path_version)(conversation, request.GET.get("version_id"))
+    except Version.DoesNotExist:
+        return ApiResponse({"detail": "Version not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    version_rows = [row async for row in sibling_versions_queryset(version)] if version is not None else []
+    messages = [
+        message async for message in Message.objects.for_user(user).filter(version=version).select_related("role")
+    ]
+    return ApiResponse(make_active_path(conversation, version, version_rows, messages), status=status.HTTP_200_OK)
+
+
+@async_login_required
+@require_http_methods(["POST"])
+async def add_conversation(request):
+    data, error_response = _parse_data(request)
+    if error_response is not None:
+        return error_response
+
+    try:
+        user = await request.auser()
+        conversation = await Conversation.objects.for_user(user).acreate(
+            title=data.get("title", "Mock title"), user=user
+        )
+        version = await Version.objects.for_user(user).acreate(conversation=conversation)
+
+        for message_data in data.get("messages", []):
+            message_serializer = MessageSerializer(data=message_data)
+            if not await _validate(message_serializer):
+                return ApiResponse(message_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            await _create_message(message_serializer, version)
+
+        conversation.active_version = version
+        await conversation.asave()
+
+        conversation = await _with_conversation_relations(Conversation.objects.for_user(user)).aget(pk=conversation.pk)
+        return ApiResponse(ConversationSerializer(conversation).data, status=status.HTTP_201_CREATED)
+    except Exception as e:
+        return ApiResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _update_conversation(conversation, data):
+    serializer = ConversationSerializer(conversation, data=data)
+    if serializer.is_valid():
+        serializer.save()
+        return ApiResponse(serializer.data)
+    return ApiResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@replica_reads
+@async_login_required
+@require_http_methods(["GET", "PUT", "DELETE"])
+async def conversation_manage(request, pk):
+    user = await request.auser()
+    conversations = Conversation.objects.for_user(user).filter(user=user, pk=pk, deleted_at__isnull=True)
+    if request.method == "GET":
+        conversations_data = await sync_to_async(serialize_conversations)(conversations)
+        if not conversations_data:
+            return ApiResponse(status=status.HTTP_404_NOT_FOUND)
+        return ApiResponse(conversations_data[0])
+
+    try:
+        conversation = await conversations.aget()
+    except Conversation.DoesNotExist:
+        return ApiResponse(status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == "PUT":
+        data, error_response = _parse_data(request)
+        if error_response is not None:
+            return error_response
+        # nested versions and messages are updated one by one by the serializer
+        return await sync_to_async(_update_conversation)(conversation, data)
+
+    elif request.method == "DELETE":
+        # hidden at once, the versions and messages are deleted in the background
+        conversation.deleted_at = timezone.now()
+        await conversation.asave(update_fields=["deleted_at"])
+        await sync_to_async(purge_conversation.enqueue)(conversation.pk, user.pk)
+        return ApiResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+@async_login_required
+@require_http_methods(["PUT"])
+async def conversation_change_title(request, pk):
+    try:
+        user = await request.auser()
+        conversation = await Conversation.objects.for_user(user).aget(user=user, pk=pk)
+    except Conversation.DoesNotExist:
+        return ApiResponse(status=status.HTTP_404_NOT_FOUND)
+
+    data, error_response = _parse_data(request)
+    if error_response is not None:
+        return error_response
+    serializer = TitleSerializer(data=data)
+
+    if serializer.is_valid():
+        conversation.title = serializer.data.get("title")
+        await conversation.asave()
+        return ApiResponse(status=status.HTTP_204_NO_CONTENT)
+
+    return ApiResponse({"detail": "Title not provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@async_login_required
+@require_http_methods(["PUT"])
+async def conversation_soft_delete(request, pk):
+    try:
+        user = await request.auser()
+        conversation = await Conversation.objects.for_user(user).aget(user=user, pk=pk)
+    except Conversation.DoesNotExist:
+        return ApiResponse(status=status.HTTP_404_NOT_FOUND)
+
+    conversation.deleted_at = timezone.now()
+    await conversation.asave()
+    return ApiResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+@async_login_required
+@require_http_methods(["POST"])
+async def conversation_add_message(request, pk):
+    try:
+        user = await request.auser()
+        conversation = await Conversation.objects.for_user(user).select_related("active_version").aget(user=user, pk=pk)
+        version = conversation.active_version
+    except Conversation.DoesNotExist:
+        return ApiResponse(status=status.HTTP_404_NOT_FOUND)
+
+    if version is None:
+        return ApiResponse(
+            {"detail": "Active version not set for this conversation."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    data, error_response = _parse_data(request)
+    if error_response is not None:
+        return error_response
+    serializer = MessageSerializer(data=data)
+    if await _validate(serializer):
+        version.conversation = conversation
+        return ApiResponse(
+            {
+                "message": await _create_message(serializer, version),
+                "conversation_id": conversation.id,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+    return ApiResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@async_login_required
+@require_http_methods(["POST"])
+async def conversation_add_version(request, pk):
+    data, error_response = _parse_data(request)
+    if error_response is not None:
+        return error_response
+
+    try:
+        user = await request.auser()
+        conversation = await Conversation.objects.for_user(user).aget(user=user, pk=pk)
+        version_id = conversation.active_version_id
+        root_message = (
+            await Message.objects.for_user(user).select_related("version").aget(pk=data.get("root_message_id"))
+        )
+    except Conversation.DoesNotExist:
+        return ApiResponse(status=status.HTTP_404_NOT_FOUND)
+    except Message.DoesNotExist:
+        return ApiResponse({"detail": "Root message not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    # Check if root message belongs to the same conversation
+    if root_message.version.conversation_id != conversation.pk:
+        return ApiResponse({"detail": "Root message not part of the conversation"}, status=status.HTTP_400_BAD_REQUEST)
+
+    new_version = await Version.objects.for_user(user).acreate(
+        conversation=conversation, parent_version=root_message.version, root_message=root_message
+    )
+
+    # Copy messages before root_message to new_version, sharing the stored contents of the originals
+    messages_before_root = Message.objects.for_user(user).filter(
+        version_id=version_id, created_at__lt=root_message.created_at
+    )
+    new_messages = [
+        Message(body_id=body_id, role_id=role_id, version=new_version)
+        async for body_id, role_id in messages_before_root.values_list("body_id", "role_id")
+    ]
+    await Message.objects.for_user(user).abulk_create(new_messages)
+
+    # Set the new version as the current version
+    conversation.active_version = new_version
+    await conversation.asave()
+
+    new_version = await _with_version_relations(Version.objects.for_user(user)).aget(pk=new_version.pk)
+    return ApiResponse(VersionSerializer(new_version).data, status=status.HTTP_201_CREATED)
+
+
+@async_login_required
+@require_http_methods(["PUT"])
+async def conversation_switch_version(request, pk, version_id):
+    try:
+        user = await request.auser()
+        conversation = await Conversation.objects.for_user(user).aget(pk=pk)
+        version = await Version.objects.for_user(user).aget(pk=version_id, conversation=conversation)
+    except Conversation.DoesNotExist:
+        return ApiResponse({"detail": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Version.DoesNotExist:
+        return ApiResponse({"detail": "Version not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    conversation.active_version = version
+    await conversation.asave()
+
+    return ApiResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+@async_login_required
+@require_http_methods(["POST"])
+async def version_add_message(request, pk):
+    try:
+        version = await Version.objects.for_user(await request.auser()).select_related("conversation").aget(pk=pk)
+    except Version.DoesNotExist:
+        return ApiResponse(status=status.HTTP_404_NOT_FOUND)
+
+    data, error_response = _parse_data(request)
+    if error_response is not None:
+        return error_response
+    serializer = MessageSerializer(data=data)
+    if await _validate(serializer):
+        return ApiResponse(
+            {
+                "message": await _create_message(serializer, version),
+                "version_id": version.id,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+    return ApiResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import OuterRef, Subquery
+
+from chat.models import Conversation, Message, MessageContent
+from src.libs import openai
+from src.utils.gpt import get_gpt_title, get_gpt_titles
+from src.utils.rate_limit import RateLimiter
+
+DEFAULT_TITLE = Conversation._meta.get_field("title").default
+TITLE_MAX_LENGTH = Conversation._meta.get_field("title").max_length
+RETRIED_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.Timeout,
+)
+
+
+def _first_message_body(role: str) -> Subquery:
+    messages = Message.objects.filter(version=OuterRef("active_version"), role__name=role).order_by("created_at")
+    return Subquery(messages.values("body")[:1])
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates titles for conversations which still have the default title, packing several conversations into "
+        "one GPT request. Progress is checkpointed, so an interrupted run continues where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent GPT requests.")
+        parser.add_argument("--pack-size", type=int, default=10, help="Conversations titled by one GPT request.")
+        parser.add_argument("--rpm", type=float, default=60, help="GPT requests allowed per minute.")
+        parser.add_argument("--max-retries", type=int, default=5, help="Retries of a rate limited or failed request.")
+        parser.add_argument("--retry-delay", type=float, default=1.0, help="Initial backoff in seconds, doubled.")
+        parser.add_argument("--limit", type=int, default=None, help="Maximum number of conversations to title.")
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="File recording the progress (default: backfill_titles.checkpoint.json, with the database alias for "
+            "other databases than default).",
+        )
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="Database (chat shard) whose conversations are titled."
+        )
+        parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options["checkpoint"] is None:
+            suffix = "" if options["database"] == DEFAULT_DB_ALIAS else f".{options['database']}"
+            options["checkpoint"] = f"backfill_titles{suffix}.checkpoint.json"
+        self.limiter = RateLimiter(options["rpm"], period=60.0, burst=options["workers"])
+        checkpoint = {} if options["restart"] else self._load_checkpoint()
+        cursor = checkpoint.get("cursor")
+        totals = {"titled": checkpoint.get("titled", 0), "failed": checkpoint.get("failed", 0)}
+        if cursor:
+            self.stdout.write(f"Resuming after conversation {cursor}")
+
+        chunk_size = options["workers"] * options["pack_size"]
+        remaining = options["limit"]
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while remaining is None or remaining > 0:
+                conversations = self._fetch(cursor, chunk_size if remaining is None else min(chunk_size, remaining))
+                if not conversations:
+                    break
+                cursor = str(conversations[-1].pk)
+
+                packs = []
+                for start in range(0, len(conversations), options["pack_size"]):
+                    end = start + options["pack_size"]
+                    packs.append(conversations[start:end])
+                titled = []
+                for pack, titles in zip(packs, pool.map(self._generate_titles, packs)):
+                    for conversation, title in zip(pack, titles):
+                        if title:
+                            conversation.title = title
+                            titled.append(conversation)
+                titled = self._save(titled)
+
+                totals["titled"] += len(titled)
+                totals["failed"] += len(conversations) - len(titled)
+                if remaining is not None:
+                    remaining -= len(conversations)
+                self._save_checkpoint({"cursor": cursor, **totals})
+                self.stdout.write(
+                    f"Titled {len(titled)} of {len(conversations)} conversations "
+                    f"({totals['titled']} titled, {totals['failed']} failed in total)"
+                )
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully titled {totals['titled']} conversations in {elapsed:.2f}s, {totals['failed']} failed"
+            )
+        )
+
+    def _fetch(self, cursor: Optional[str], limit: int) -> list[Conversation]:
+        """
+        Returns the next untitled conversations having a question and an answer, with both texts attached.
+        """
+        candidates = (
+            Conversation.objects.using(self.options["database"])
+            .filter(title=DEFAULT_TITLE, deleted_at__isnull=True)
+            .annotate(question_body=_first_message_body("user"), answer_body=_first_message_body("assistant"))
+            .filter(question_body__isnull=False, answer_body__isnull=False)
+            .only("pk", "title")
+            .order_by("pk")
+        )
+        if cursor:
+            candidates = candidates.filter(pk__gt=cursor)
+        conversations = list(candidates[:limit])
+
+        bodies = MessageContent.objects.using(self.options["database"]).in_bulk(
+            {c.question_body for c in conversations} | {c.answer_body for c in conversations}
+        )
+        for conversation in conversations:
+            conversation.question = bodies[conversation.question_body].text
+            conversation.answer = bodies[conversation.answer_body].text
+        return conversations
+
+    def _generate_titles(self, conversations: list[Conversation]) -> list[Optional[str]]:
+        """
+        Titles a pack of conversations with one request, falling back to one request per conversation if the packed
+        answer cannot be used. Conversations which could not be titled get None.
+        """
+        if len(conversations) > 1:
+            try:
+                titles = self._call(get_gpt_titles, [(c.question, c.answer) for c in conversations])
+                return [self._clean(title) for title in titles]
+            except ValueError:
+                pass
+            except Exception as e:
+                self.stderr.write(f"Packed title request failed: {e}")
+                return [None] * len(conversations)
+
+        titles = []
+        for conversation in conversations:
+            try:
+                titles.append(self._clean(self._call(get_gpt_title, conversation.question, conversation.answer)))
+            except Exception as e:
+                self.stderr.write(f"Title request for conversation {conversation.pk} failed: {e}")
+                titles.append(None)
+        return titles
+
+    def _call(self, func, *args):
+        delay = self.options["retry_delay"]
+        for attempt in range(self.options["max_retries"] + 1):
+            self.limiter.acquire()
+            try:
+                return func(*args)
+            except RETRIED_ERRORS:
+                if attempt == self.options["max_retries"]:
+                    raise
+                # slows down every worker, not only the one which hit the limit
+                self.limiter.penalize(delay)
+                delay *= 2
+
+    @staticmethod
+    def _clean(title) -> Optional[str]:
+        title = str(title).strip()[:TITLE_MAX_LENGTH].strip()
+        return title if title and title != DEFAULT_TITLE else None
+
+    def _save(self, conversations: list[Conversation]) -> list[Conversation]:
+        database = self.options["database"]
+        # users may have renamed a conversation while its title was generated
+        still_untitled = set(
+            Conversation.objects.using(database)
+            .filter(pk__in=[c.pk for c in conversations], title=DEFAULT_TITLE)
+            .values_list("pk", flat=True)
+        )
+        conversations = [c for c in conversations if c.pk in still_untitled]
+        # bulk_update leaves `modified_at` alone, backfilled titles do not reorder the conversation list
+        Conversation.objects.using(database).bulk_update(conversations, ["title"], batch_size=500)
+        return conversations
+
+    def _load_checkpoint(self) -> dict:
+        try:
+            with open(self.options["checkpoint"]) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_checkpoint(self, checkpoint: dict) -> None:
+        path = self.options["checkpoint"]
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(f"{path}.tmp", path)
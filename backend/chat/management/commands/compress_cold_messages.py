@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from chat.models import MessageContent
+from chat.utils.compression import AVAILABLE_CODECS, DEFAULT_CODEC, compress_content
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves message contents to cold storage once every conversation using them has been inactive for the given "
+        "number of days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Days since the last conversation activity.")
+        parser.add_argument("--codec", choices=AVAILABLE_CODECS, default=DEFAULT_CODEC, help="Compression codec.")
+        parser.add_argument("--min-bytes", type=int, default=256, help="Smaller messages are kept uncompressed.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Contents compressed per transaction.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        candidates = (
+            MessageContent.objects.filter(compressed_content__isnull=True)
+            .exclude(content="")
+            # shared contents stay hot as long as any conversation using them is
+            .exclude(messages__version__conversation__modified_at__gte=cutoff)
+            .order_by("pk")
+            .only("pk", "content")
+        )
+
+        compressed_count, raw_bytes, stored_bytes = 0, 0, 0
+        started_at = time.monotonic()
+        for alias in settings.CHAT_SHARDS:
+            last_pk = None
+            while True:
+                batch_queryset = candidates.using(alias)
+                if last_pk is not None:
+                    batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+                batch = list(batch_queryset[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                updated = []
+                for body in batch:
+                    size = len(body.content.encode())
+                    if size < options["min_bytes"]:
+                        continue
+                    blob = compress_content(body.content, codec=options["codec"])
+                    if len(blob) >= size:
+                        continue
+                    body.compressed_content = blob
+                    body.content = ""
+                    updated.append(body)
+                    raw_bytes += size
+                    stored_bytes += len(blob)
+
+                with transaction.atomic(using=alias):
+                    MessageContent.objects.using(alias).bulk_update(updated, ["content", "compressed_content"])
+                compressed_count += len(updated)
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully compressed {compressed_count} message contents with {options['codec']} "
+                f"in {elapsed:.2f}s, {raw_bytes} bytes stored as {stored_bytes} bytes"
+            )
+        )
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
 from chat.models import Role
@@ -5,6 +6,9 @@ from chat.models import Role
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
-        Role.objects.get_or_create(name="user")
-        Role.objects.get_or_create(name="assistant")
+        roles = [Role.objects.get_or_create(name="user")[0], Role.objects.get_or_create(name="assistant")[0]]
+        # the messages on every shard refer to the roles by the ids they have on the default database
+        for alias in settings.CHAT_SHARDS[1:]:
+            for role in roles:
+                Role.objects.using(alias).update_or_create(pk=role.pk, defaults={"name": role.name})
         self.stdout.write(self.style.SUCCESS("Successfully created roles"))
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import CustomUser
+from chat.utils.export import gzip_chunks, iter_conversation_export
+
+
+class Command(BaseCommand):
+    help = "Streams the conversation history of a user as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Email of the user whose conversations are exported.")
+        parser.add_argument("--output", default="-", help="Output file path, `-` for stdout.")
+        parser.add_argument("--gzip", action="store_true", help="Gzip-compress the output.")
+        parser.add_argument("--include-deleted", action="store_true", help="Export soft-deleted conversations too.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched from the database at once.")
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options["email"])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User {options['email']} does not exist")
+
+        chunks = iter_conversation_export(
+            user, include_deleted=options["include_deleted"], chunk_size=options["chunk_size"]
+        )
+        if options["gzip"]:
+            chunks = gzip_chunks(chunks)
+        else:
+            chunks = (chunk.encode() for chunk in chunks)
+
+        if options["output"] == "-":
+            self._write(sys.stdout.buffer, chunks)
+        else:
+            with open(options["output"], "wb") as f:
+                self._write(f, chunks)
+            self.stderr.write(
+                self.style.SUCCESS(f"Successfully exported conversations of {user} to {options['output']}")
+            )
+
+    @staticmethod
+    def _write(f, chunks):
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
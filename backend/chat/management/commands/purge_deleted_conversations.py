@@ -0,0 +1,65 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.models import Conversation
+from chat.utils.purge import purge_conversations
+
+
+class Command(BaseCommand):
+    help = "Hard-deletes conversations which were soft-deleted more than the given number of days ago."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Minimum age of the soft delete in days.")
+        parser.add_argument("--batch-size", type=int, default=100, help="Conversations deleted per transaction.")
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many conversations would go.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        candidates = Conversation.objects.filter(deleted_at__lt=cutoff)
+
+        if options["dry_run"]:
+            count = sum(candidates.using(alias).count() for alias in settings.CHAT_SHARDS)
+            self.stdout.write(f"{count} conversations soft-deleted before {cutoff} would be purged")
+            return
+
+        totals = {"conversations": 0, "versions": 0, "messages": 0}
+        started_at = time.monotonic()
+        for alias in settings.CHAT_SHARDS:
+            while True:
+                batch_ids = list(
+                    candidates.using(alias).order_by("deleted_at").values_list("pk", flat=True)[:batch_size]
+                )
+                if not batch_ids:
+                    break
+
+                batch_started_at = time.monotonic()
+                counts = purge_conversations(batch_ids, using=alias)
+                for key, value in counts.items():
+                    totals[key] += value
+
+                batch_rows = sum(counts.values())
+                batch_elapsed = time.monotonic() - batch_started_at
+                self.stdout.write(
+                    f"Purged {counts['conversations']} conversations, {counts['versions']} versions, "
+                    f"{counts['messages']} messages from {alias} in {batch_elapsed:.2f}s "
+                    f"({batch_rows / max(batch_elapsed, 1e-6):.0f} rows/s, "
+                    f"{totals['conversations']} conversations total)"
+                )
+
+                if options["sleep"]:
+                    time.sleep(options["sleep"])
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully purged {totals['conversations']} conversations, {totals['versions']} versions and "
+                f"{totals['messages']} messages in {elapsed:.2f}s "
+                f"({totals['conversations'] / max(elapsed, 1e-6):.1f} conversations/s)"
+            )
+        )
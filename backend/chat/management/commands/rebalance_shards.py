@@ -0,0 +1,58 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chat.models import Conversation
+from chat.utils.rebalance import move_conversations
+from chat.utils.sharding import shard_for_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the conversations of every user which are not on the shard the user id hashes to, e.g. after shards "
+        "were added to CHAT_SHARDS. Run it right after deploying the new shards, the moved users cannot see their "
+        "conversations until they are moved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Conversations moved per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many conversations would move.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        totals = Counter()
+        started_at = time.monotonic()
+        for source in settings.CHAT_SHARDS:
+            conversations = Conversation.objects.using(source)
+            user_ids = conversations.order_by("user_id").values_list("user_id", flat=True).distinct()
+            for user_id in list(user_ids):
+                target = shard_for_user(user_id)
+                if target == source:
+                    continue
+                user_conversations = conversations.filter(user_id=user_id)
+
+                if options["dry_run"]:
+                    count = user_conversations.count()
+                    totals["conversations"] += count
+                    self.stdout.write(f"{count} conversations of user {user_id} would move from {source} to {target}")
+                    continue
+
+                while True:
+                    batch_ids = list(user_conversations.order_by("pk").values_list("pk", flat=True)[:batch_size])
+                    if not batch_ids:
+                        break
+                    totals.update(move_conversations(batch_ids, source, target))
+                self.stdout.write(f"Moved the conversations of user {user_id} from {source} to {target}")
+
+        if options["dry_run"]:
+            self.stdout.write(f"{totals['conversations']} conversations would move")
+            return
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully moved {totals['conversations']} conversations, {totals['versions']} versions and "
+                f"{totals['messages']} messages in {elapsed:.2f}s"
+            )
+        )
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chat.models import Conversation
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the denormalized message count, version count and last message preview of every conversation, "
+        "repairing counters which drifted, e.g. after rows were changed outside of the ORM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Conversations recomputed per query.")
+        parser.add_argument("--user", type=int, default=None, help="Only recount the conversations of this user id.")
+
+    def handle(self, *args, **options):
+        conversations = Conversation.objects.all()
+        if options["user"] is not None:
+            conversations = conversations.filter(user_id=options["user"])
+
+        started_at = time.monotonic()
+        updated = sum(
+            conversations.using(alias).recount(batch_size=options["batch_size"]) for alias in settings.CHAT_SHARDS
+        )
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(self.style.SUCCESS(f"Successfully repaired {updated} conversations in {elapsed:.2f}s"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-19 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="compressed_content",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
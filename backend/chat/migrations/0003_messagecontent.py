@@ -0,0 +1,30 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0002_message_compressed_content"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageContent",
+            fields=[
+                ("hash", models.CharField(editable=False, max_length=64, primary_key=True, serialize=False)),
+                ("content", models.TextField(blank=True)),
+                ("compressed_content", models.BinaryField(blank=True, null=True)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="body",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="messages",
+                to="chat.messagecontent",
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from chat.utils.compression import decompress_content
+from chat.utils.content import content_hash
+
+BATCH_SIZE = 1000
+
+
+def deduplicate_contents(apps, schema_editor):
+    Message = apps.get_model("chat", "Message")
+    MessageContent = apps.get_model("chat", "MessageContent")
+    db_alias = schema_editor.connection.alias
+
+    messages = Message.objects.using(db_alias).filter(body__isnull=True).order_by("pk")
+    last_pk = None
+    while True:
+        batch_queryset = messages if last_pk is None else messages.filter(pk__gt=last_pk)
+        batch = list(batch_queryset.only("pk", "content", "compressed_content")[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        contents = {}
+        for message in batch:
+            if message.compressed_content is not None:
+                # cold messages stay compressed, the hash is always taken over the plain text
+                message.body_id = content_hash(decompress_content(message.compressed_content))
+                contents.setdefault(message.body_id, ("", message.compressed_content))
+            else:
+                message.body_id = content_hash(message.content)
+                contents.setdefault(message.body_id, (message.content, None))
+        MessageContent.objects.using(db_alias).bulk_create(
+            [
+                MessageContent(hash=key, content=content, compressed_content=compressed_content)
+                for key, (content, compressed_content) in contents.items()
+            ],
+            ignore_conflicts=True,
+        )
+        Message.objects.using(db_alias).bulk_update(batch, ["body"])
+
+    references = Message.objects.filter(body=OuterRef("pk")).order_by().values("body").annotate(count=Count("pk"))
+    MessageContent.objects.using(db_alias).update(ref_count=Coalesce(Subquery(references.values("count")), 0))
+
+
+def restore_contents(apps, schema_editor):
+    Message = apps.get_model("chat", "Message")
+    MessageContent = apps.get_model("chat", "MessageContent")
+    db_alias = schema_editor.connection.alias
+
+    bodies = MessageContent.objects.filter(pk=OuterRef("body"))
+    Message.objects.using(db_alias).update(
+        content=Subquery(bodies.values("content")),
+        compressed_content=Subquery(bodies.values("compressed_content")),
+        body=None,
+    )
+    MessageContent.objects.using(db_alias).all().delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0003_messagecontent"),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_contents, restore_contents),
+    ]
@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0004_deduplicate_message_content"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="message",
+            name="compressed_content",
+        ),
+        migrations.RemoveField(
+            model_name="message",
+            name="content",
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="body",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, related_name="messages", to="chat.messagecontent"
+            ),
+        ),
+    ]
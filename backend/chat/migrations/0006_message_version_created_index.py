@@ -0,0 +1,16 @@
+# Generated by Django 5.0.2 on 2026-10-19 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0005_remove_message_content"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["version", "created_at"], name="chat_message_version_created"),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.0.2 on 2026-10-19 10:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from chat.utils.version_tree import compute_version_tree
+
+
+def backfill_version_tree(apps, schema_editor):
+    Conversation = apps.get_model("chat", "Conversation")
+    Message = apps.get_model("chat", "Message")
+    Version = apps.get_model("chat", "Version")
+    db_alias = schema_editor.connection.alias
+
+    shared_messages = (
+        Message.objects.filter(version=OuterRef("parent_version"), created_at__lt=OuterRef("root_message__created_at"))
+        .order_by()
+        .values("version")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    for conversation_id in Conversation.objects.using(db_alias).values_list("pk", flat=True).iterator():
+        versions = list(
+            Version.objects.using(db_alias)
+            .filter(conversation_id=conversation_id)
+            .annotate(parent_branch_index=Coalesce(Subquery(shared_messages), 0))
+        )
+        tree = compute_version_tree(
+            {"id": v.pk, "parent_version_id": v.parent_version_id, "branch_index": v.parent_branch_index}
+            for v in versions
+        )
+        for version in versions:
+            for name, value in tree[version.pk].items():
+                setattr(version, name, value)
+        Version.objects.using(db_alias).bulk_update(
+            versions, ["depth", "path", "branch_index", "prefix_version"], batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0006_message_version_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="version",
+            name="branch_index",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="version",
+            name="depth",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="version",
+            name="path",
+            field=models.TextField(default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="version",
+            name="prefix_version",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="chat.version",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="version",
+            index=models.Index(fields=["conversation", "path"], name="chat_version_conv_path"),
+        ),
+        migrations.AddIndex(
+            model_name="version",
+            index=models.Index(fields=["prefix_version", "branch_index"], name="chat_version_prefix_branch"),
+        ),
+        migrations.RunPython(backfill_version_tree, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.2 on 2026-10-19 10:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from chat.utils.compression import decompress_content
+from chat.utils.content import message_preview
+
+
+def backfill_conversation_stats(apps, schema_editor):
+    Conversation = apps.get_model("chat", "Conversation")
+    Message = apps.get_model("chat", "Message")
+    MessageContent = apps.get_model("chat", "MessageContent")
+    Version = apps.get_model("chat", "Version")
+    db_alias = schema_editor.connection.alias
+
+    active_messages = Message.objects.filter(version=OuterRef("active_version")).order_by()
+    versions = Version.objects.filter(conversation=OuterRef("pk")).order_by()
+    conversations = list(
+        Conversation.objects.using(db_alias).annotate(
+            counted_messages=Coalesce(
+                Subquery(active_messages.values("version").annotate(count=Count("pk")).values("count")), 0
+            ),
+            counted_versions=Coalesce(
+                Subquery(versions.values("conversation").annotate(count=Count("pk")).values("count")), 0
+            ),
+            last_body=Subquery(active_messages.order_by("-created_at").values("body")[:1]),
+        )
+    )
+    bodies = MessageContent.objects.using(db_alias).in_bulk({c.last_body for c in conversations if c.last_body})
+    for conversation in conversations:
+        body = bodies.get(conversation.last_body)
+        if body is not None:
+            text = body.content if body.compressed_content is None else decompress_content(body.compressed_content)
+            conversation.last_message_preview = message_preview(text)
+        conversation.message_count = conversation.counted_messages
+        conversation.version_count = conversation.counted_versions
+    Conversation.objects.using(db_alias).bulk_update(
+        conversations, ["message_count", "version_count", "last_message_preview"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0007_version_tree"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="last_message_preview",
+            field=models.CharField(blank=True, default="", editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="message_count",
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="number of messages"),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="version_count",
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="number of versions"),
+        ),
+        migrations.RunPython(backfill_conversation_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:10
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_version_created_at(apps, schema_editor):
+    # the versions created so far are dated like the API shows them: by their root message, else their conversation
+    Conversation = apps.get_model("chat", "Conversation")
+    Message = apps.get_model("chat", "Message")
+    Version = apps.get_model("chat", "Version")
+    Version.objects.using(schema_editor.connection.alias).update(
+        created_at=Coalesce(
+            Subquery(Message.objects.filter(pk=OuterRef("root_message")).values("created_at")[:1]),
+            Subquery(Conversation.objects.filter(pk=OuterRef("conversation")).values("created_at")[:1]),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0009_conversation_user_no_constraint"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="version",
+            options={"ordering": ["created_at"]},
+        ),
+        migrations.AddField(
+            model_name="version",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_version_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="version",
+            index=models.Index(fields=["conversation", "created_at"], name="chat_version_conv_created"),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:18
+
+from django.db import migrations
+
+import chat.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0010_version_created_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="version",
+            name="path",
+            field=chat.models.BytewiseTextField(default="", editable=False),
+        ),
+    ]
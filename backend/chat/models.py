@@ -1,8 +1,17 @@
 import uuid
+from collections import Counter, defaultdict
+from typing import Iterable
 
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 
 from authentication.models import CustomUser
+from chat.utils.compression import decompress_content
+from chat.utils.content import PREVIEW_LENGTH, content_hash, message_preview
+from chat.utils.sharding import ShardedQuerySet
+from chat.utils.version_tree import compute_version_tree, path_ids, subtree_path_bound, version_path
 
 
 class Role(models.Model):
@@ -12,6 +21,56 @@ class Role(models.Model):
         return self.name
 
 
+class ConversationQuerySet(ShardedQuerySet):
+    def recount(self, batch_size: int = 500) -> int:
+        """
+        Recomputes the denormalized counters and preview of the conversations, returns the number of updated ones.
+        """
+        active_messages = Message._base_manager.filter(version=OuterRef("active_version")).order_by()
+        versions = Version.objects.filter(conversation=OuterRef("pk")).order_by()
+        conversations = (
+            self.annotate(
+                counted_messages=Coalesce(
+                    Subquery(active_messages.values("version").annotate(count=Count("pk")).values("count")), 0
+                ),
+                counted_versions=Coalesce(
+                    Subquery(versions.values("conversation").annotate(count=Count("pk")).values("count")), 0
+                ),
+                last_body=Subquery(active_messages.order_by("-created_at").values("body")[:1]),
+            )
+            .only("pk", *STATS_FIELDS)
+            .order_by("pk")
+        )
+
+        updated = 0
+        last_pk = None
+        while True:
+            batch_queryset = conversations if last_pk is None else conversations.filter(pk__gt=last_pk)
+            batch = list(batch_queryset[:batch_size])
+            if not batch:
+                return updated
+            last_pk = batch[-1].pk
+
+            bodies = MessageContent.objects.db_manager(self.db).in_bulk({c.last_body for c in batch if c.last_body})
+            changed = []
+            for conversation in batch:
+                body = bodies.get(conversation.last_body)
+                stats = {
+                    "message_count": conversation.counted_messages,
+                    "version_count": conversation.counted_versions,
+                    "last_message_preview": message_preview(body.text) if body is not None else "",
+                }
+                if any(getattr(conversation, name) != value for name, value in stats.items()):
+                    for name, value in stats.items():
+                        setattr(conversation, name, value)
+                    changed.append(conversation)
+            self.model._base_manager.db_manager(self.db).bulk_update(changed, STATS_FIELDS)
+            updated += len(changed)
+
+
+STATS_FIELDS = ["message_count", "version_count", "last_message_preview"]
+
+
 class Conversation(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=100, blank=False, null=False, default="Mock title")
@@ -21,15 +80,133 @@ class Conversation(models.Model):
         "Version", null=True, blank=True, on_delete=models.CASCADE, related_name="current_version_conversations"
     )
     deleted_at = models.DateTimeField(null=True, blank=True)
-    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # users stay on the default database while their conversations may live on a shard, see `chat.utils.sharding`
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, db_constraint=False)
+    # denormalized for listings, maintained by the writes of versions and messages and repaired by
+    # `recount_conversations`: the number of messages of the active version, the number of versions and the start of
+    # the active version's last message
+    message_count = models.PositiveIntegerField("number of messages", default=0, editable=False)
+    version_count = models.PositiveIntegerField("number of versions", default=0, editable=False)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True, default="", editable=False)
+
+    objects = ConversationQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
-    def version_count(self):
-        return self.versions.count()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._active_version_source = instance.__dict__.get("active_version_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # the counters are only written with `update()`, a stale instance must not overwrite them
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in STATS_FIELDS
+            ]
+        switched = getattr(self, "_active_version_source", None) != self.active_version_id
+        super().save(*args, **kwargs)
+        self._active_version_source = self.active_version_id
+        if switched:
+            Conversation.objects.using(self._state.db).filter(pk=self.pk).recount()
+            self.refresh_from_db(fields=STATS_FIELDS)
+
+
+class VersionQuerySet(ShardedQuerySet):
+    def subtree(self, version: "Version", include_self: bool = True) -> "VersionQuerySet":
+        """
+        Returns the descendants of a version as one range scan over the ``(conversation, path)`` index.
+        """
+        lookup = "path__gte" if include_self else "path__gt"
+        return self.filter(
+            conversation_id=version.conversation_id,
+            **{lookup: version.path},
+            path__lt=subtree_path_bound(version.path),
+        )
+
+    def ancestors(self, version: "Version", include_self: bool = False) -> "VersionQuerySet":
+        """
+        Returns the ancestors of a version from the root down, looked up by the primary keys on its path.
+        """
+        ids = path_ids(version.path)
+        if not include_self:
+            ids = ids[:-1]
+        return self.filter(pk__in=ids).order_by("depth")
+
+    def branches_at(self, version: "Version", position: int) -> "VersionQuerySet":
+        """
+        Returns the versions offering an alternative message at ``position`` of the path of a version.
+
+        These are the versions which share the path's messages before ``position``: the version which created the
+        path's message before the position, and every version branched at the position from the same messages. The
+        path's own version at the position is one of them.
+        """
+        if position == 0:
+            return self.filter(conversation_id=version.conversation_id, prefix_version__isnull=True, branch_index=0)
+        prefix = (
+            Version.objects.filter(pk__in=path_ids(version.path), branch_index__lt=position)
+            .order_by("-depth")
+            .values("pk")[:1]
+        )
+        return self.filter(
+            models.Q(pk=Subquery(prefix)) | models.Q(prefix_version=Subquery(prefix), branch_index=position)
+        )
 
-    version_count.short_description = "Number of versions"
+    def rebuild_tree(self, conversation_id) -> int:
+        """
+        Recomputes the tree fields of all versions of a conversation, returns the number of updated versions.
+        """
+        versions = list(
+            self.filter(conversation_id=conversation_id).annotate(
+                parent_branch_index=Coalesce(
+                    Subquery(
+                        Message.objects.filter(
+                            version=OuterRef("parent_version"), created_at__lt=OuterRef("root_message__created_at")
+                        )
+                        .order_by()
+                        .values("version")
+                        .annotate(count=Count("pk"))
+                        .values("count")
+                    ),
+                    0,
+                )
+            )
+        )
+        tree = compute_version_tree(
+            {"id": v.pk, "parent_version_id": v.parent_version_id, "branch_index": v.parent_branch_index}
+            for v in versions
+        )
+        changed = []
+        for version in versions:
+            fields = tree[version.pk]
+            if any(getattr(version, name) != value for name, value in fields.items()):
+                for name, value in fields.items():
+                    setattr(version, name, value)
+                changed.append(version)
+        self.bulk_update(changed, TREE_FIELDS, batch_size=500)
+        return len(changed)
+
+
+TREE_FIELDS = ["depth", "path", "branch_index", "prefix_version"]
+
+
+class BytewiseTextField(models.TextField):
+    """
+    A text field whose values are compared byte by byte, which range queries over materialized paths rely on.
+
+    SQLite compares text bytewise by default, the default collations of PostgreSQL weigh punctuation differently and
+    are replaced with the ``C`` collation.
+    """
+
+    def db_parameters(self, connection):
+        parameters = super().db_parameters(connection)
+        if connection.vendor == "postgresql":
+            parameters["collation"] = "C"
+        return parameters
 
 
 class Version(models.Model):
@@ -39,6 +216,27 @@ class Version(models.Model):
     root_message = models.ForeignKey(
         "Message", null=True, blank=True, on_delete=models.SET_NULL, related_name="root_message_versions"
     )
+    # tree index, maintained on insert: the depth below the root version, the hex ids of the ancestors and the version
+    # itself ("<root>/.../<id>/"), the number of messages shared with the parent, and the version which created the
+    # last of those shared messages
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    path = BytewiseTextField(default="", editable=False)
+    branch_index = models.PositiveIntegerField(default=0, editable=False)
+    prefix_version = models.ForeignKey(
+        "self", null=True, blank=True, editable=False, on_delete=models.SET_NULL, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = VersionQuerySet.as_manager()
+
+    class Meta:
+        # the versions of a conversation are listed in the order they were created, whichever index is used
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["conversation", "created_at"], name="chat_version_conv_created"),
+            models.Index(fields=["conversation", "path"], name="chat_version_conv_path"),
+            models.Index(fields=["prefix_version", "branch_index"], name="chat_version_prefix_branch"),
+        ]
 
     def __str__(self):
         if self.root_message:
@@ -46,20 +244,257 @@ class Version(models.Model):
         else:
             return f"Version of `{self.conversation.title}` with no root message yet"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tree_source = (instance.__dict__.get("parent_version_id"), instance.__dict__.get("root_message_id"))
+        instance._conversation_source = instance.__dict__.get("conversation_id")
+        return instance
+
+    def set_tree_fields(self) -> None:
+        """
+        Derives the tree fields of a new version from its parent version and root message.
+        """
+        parent = self.parent_version
+        if parent is None:
+            self.depth, self.path, self.branch_index, self.prefix_version_id = 0, version_path(self.pk), 0, None
+            return
+
+        self.depth = parent.depth + 1
+        self.path = version_path(self.pk, parent.path)
+        if self.root_message_id is None:
+            self.branch_index = 0
+        else:
+            self.branch_index = (
+                Message.objects.next_to(self)
+                .filter(version_id=parent.pk, created_at__lt=self.root_message.created_at)
+                .count()
+            )
+        self.prefix_version_id = (
+            None
+            if self.branch_index == 0
+            else Version.objects.next_to(self)
+            .ancestors(parent, include_self=True)
+            .filter(branch_index__lt=self.branch_index)
+            .order_by("-depth")
+            .values_list("pk", flat=True)
+            .first()
+        )
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        tree_source = (self.parent_version_id, self.root_message_id)
+        moved = not adding and getattr(self, "_tree_source", tree_source) != tree_source
+        conversation_ids = {getattr(self, "_conversation_source", self.conversation_id), self.conversation_id}
+        using = kwargs.get("using") or router.db_for_write(Version, instance=self)
+        if adding:
+            # the related lookups of a new version go to the shard it is written to
+            self._state.db = using
+            self.set_tree_fields()
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            conversations = Conversation.objects.using(self._state.db)
+            if adding:
+                conversations.filter(pk=self.conversation_id).update(version_count=F("version_count") + 1)
+            elif len(conversation_ids) > 1:
+                conversations.filter(pk__in=conversation_ids).recount()
+        self._tree_source = tree_source
+        self._conversation_source = self.conversation_id
+        if moved:
+            # re-parenting (only possible through the admin) moves the whole subtree
+            Version.objects.using(self._state.db).rebuild_tree(self.conversation_id)
+            self.refresh_from_db(fields=TREE_FIELDS)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using") or router.db_for_write(Version, instance=self)):
+            result = super().delete(*args, **kwargs)
+            Conversation.objects.using(self._state.db).filter(pk=self.conversation_id).recount()
+        # the children of the version became roots
+        Version.objects.using(self._state.db).rebuild_tree(self.conversation_id)
+        return result
+
+
+class MessageContentManager(models.Manager):
+    def acquire(self, contents: Iterable[str]) -> list[str]:
+        """
+        Stores the given texts unless already present and takes one reference per occurrence.
+
+        Returns the content hashes in the order of the given texts.
+        """
+        contents = list(contents)
+        if not contents:
+            return []
+        hashes = [content_hash(content) for content in contents]
+        counts = Counter(hashes)
+        texts = dict(zip(hashes, contents))
+        using = self._db or router.db_for_write(self.model, **self._hints)
+        with transaction.atomic(using=using):
+            queryset = self.get_queryset().using(using)
+            missing = set(counts)
+            while True:
+                # locked until the references are taken, so that a concurrent `release()` cannot delete them meanwhile
+                missing -= set(queryset.select_for_update().filter(pk__in=missing).values_list("pk", flat=True))
+                if not missing:
+                    break
+                # a concurrent writer may insert the same content first, which is just as good, or release it before
+                # it is locked, when it is inserted again
+                queryset.bulk_create(
+                    [self.model(hash=key, content=texts[key]) for key in missing], ignore_conflicts=True
+                )
+            self.db_manager(using)._add_references(counts, 1)
+        return hashes
+
+    def add_references(self, hashes: Iterable[str]) -> None:
+        self._add_references(Counter(hashes), 1)
+
+    def release(self, hashes: Iterable[str]) -> None:
+        """
+        Drops one reference per given hash and deletes the contents which are no longer referenced.
+        """
+        counts = Counter(hashes)
+        if not counts:
+            return
+        self._add_references(counts, -1)
+        self.get_queryset().filter(pk__in=counts, ref_count=0).delete()
+
+    def recount(self) -> int:
+        """
+        Recomputes all reference counts from the messages and deletes unreferenced contents.
+        """
+        references = (
+            Message._base_manager.filter(body=OuterRef("pk")).order_by().values("body").annotate(count=Count("pk"))
+        )
+        queryset = self.get_queryset()
+        updated = queryset.update(ref_count=Coalesce(Subquery(references.values("count")), 0))
+        queryset.filter(ref_count=0).delete()
+        return updated
+
+    def _add_references(self, counts: Counter, sign: int) -> None:
+        by_count = defaultdict(list)
+        for key, count in counts.items():
+            by_count[count].append(key)
+        for count, keys in by_count.items():
+            self.get_queryset().filter(pk__in=keys).update(ref_count=F("ref_count") + sign * count)
+
+
+class MessageContent(models.Model):
+    """
+    Message text stored once per distinct value and shared by every message with that text.
+    """
+
+    hash = models.CharField(max_length=64, primary_key=True, editable=False)
+    content = models.TextField(blank=True)
+    # cold storage, set by `compress_cold_messages` which empties `content` at the same time
+    compressed_content = models.BinaryField(null=True, blank=True, editable=False)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    objects = MessageContentManager()
+
+    @cached_property
+    def text(self) -> str:
+        if self.compressed_content is not None:
+            return decompress_content(self.compressed_content)
+        return self.content
+
+    def __str__(self):
+        return self.hash
+
+
+class MessageQuerySet(ShardedQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if objs and self._db is None and not self._hints:
+            # unless routed explicitly, the messages go to the shard of their version
+            return self.next_to(objs[0]).bulk_create(objs, *args, **kwargs)
+        self._for_write = True
+        with transaction.atomic(using=self.db):
+            contents = MessageContent.objects.db_manager(self.db)
+            # messages created with an existing `body` only take a reference on it
+            contents.add_references(obj.body_id for obj in objs if not obj._content_changed)
+            changed = [obj for obj in objs if obj._content_changed]
+            for obj, key in zip(changed, contents.acquire(obj._content for obj in changed)):
+                obj.body_id = key
+                obj._content_changed = False
+            created = super().bulk_create(objs, *args, **kwargs)
+            Conversation.objects.using(self.db).filter(active_version_id__in={obj.version_id for obj in objs}).recount()
+            return created
+
+
+class MessageManager(models.Manager.from_queryset(MessageQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().select_related("body")
+
 
 class Message(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    content = models.TextField(blank=False, null=False)
+    body = models.ForeignKey(MessageContent, on_delete=models.PROTECT, related_name="messages")
     role = models.ForeignKey(Role, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     version = models.ForeignKey("Version", related_name="messages", on_delete=models.CASCADE)
 
+    objects = MessageManager()
+
+    # text of the message when known without loading `body`, interned into `body` on save once changed
+    _content = None
+    _content_changed = False
+
     class Meta:
         ordering = ["created_at"]
+        # a version's messages in order, and the position of a message within its version
+        indexes = [models.Index(fields=["version", "created_at"], name="chat_message_version_created")]
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = self.body.text
+        return self._content
+
+    @content.setter
+    def content(self, value: str):
+        self._content = value
+        self._content_changed = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._version_source = instance.__dict__.get("version_id")
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._content, self._content_changed = None, False
 
     def save(self, *args, **kwargs):
-        self.version.conversation.save()
-        super().save(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(Message, instance=self)
+        contents = MessageContent.objects.db_manager(using)
+        adding = self._state.adding
+        if adding:
+            # the related lookups of a new message go to the shard it is written to
+            self._state.db = using
+        with transaction.atomic(using=using):
+            previous_body_id = None
+            if self._content_changed:
+                previous_body_id = None if adding else self.body_id
+                (self.body_id,) = contents.acquire([self._content])
+                self._content_changed = False
+            elif adding:
+                contents.add_references([self.body_id])
+            self.version.conversation.save()
+            super().save(*args, **kwargs)
+            if previous_body_id is not None:
+                # released after the update, the old content may only be deleted once nothing references it
+                contents.release([previous_body_id])
+
+            conversations = Conversation.objects.using(using)
+            if adding:
+                # the new message is the last one of its version
+                conversations.filter(active_version_id=self.version_id).update(
+                    message_count=F("message_count") + 1, last_message_preview=message_preview(self.content)
+                )
+            else:
+                version_ids = {getattr(self, "_version_source", self.version_id), self.version_id}
+                conversations.filter(active_version_id__in=version_ids).recount()
+        self._version_source = self.version_id
 
     def __str__(self):
         return f"{self.role}: {self.content[:20]}..."
@@ -20,6 +20,8 @@ class VersionTimeIdSerializer(serializers.Serializer):
 
 
 class MessageSerializer(serializers.ModelSerializer):
+    # `content` is a model property backed by the shared `MessageContent` row
+    content = serializers.CharField(style={"base_template": "textarea.html"})
     role = serializers.SlugRelatedField(slug_field="name", queryset=Role.objects.all())
 
     class Meta:
@@ -42,6 +44,17 @@ class MessageSerializer(serializers.ModelSerializer):
         return representation
 
 
+class PathMessageSerializer(MessageSerializer):
+    """
+    A message on the path of a single version, the sibling versions are added by the active path endpoint.
+    """
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        del representation["versions"]
+        return representation
+
+
 class VersionSerializer(serializers.ModelSerializer):
     messages = MessageSerializer(many=True)
     active = serializers.SerializerMethodField()
@@ -98,7 +111,7 @@ class VersionSerializer(serializers.ModelSerializer):
         messages_data = validated_data.pop("messages", [])
         for message_data in messages_data:
             if "id" in message_data:
-                message = Message.objects.get(id=message_data["id"], version=instance)
+                message = Message.objects.next_to(instance).get(id=message_data["id"], version=instance)
                 message.content = message_data.get("content", message.content)
                 message.role = message_data.get("role", message.role)
                 message.save()
@@ -119,7 +132,11 @@ class ConversationSerializer(serializers.ModelSerializer):
             "active_version",
             "versions",  # optional
             "modified_at",  # DB, read-only
+            "message_count",  # DB, read-only
+            "version_count",  # DB, read-only
+            "last_message_preview",  # DB, read-only
         ]
+        read_only_fields = ["message_count", "version_count", "last_message_preview"]
 
     def create(self, validated_data):
         versions_data = validated_data.pop("versions", [])
@@ -135,14 +152,14 @@ class ConversationSerializer(serializers.ModelSerializer):
         instance.title = validated_data.get("title", instance.title)
         active_version_id = validated_data.get("active_version", instance.active_version)
         if active_version_id is not None:
-            active_version = Version.objects.get(id=active_version_id)
+            active_version = Version.objects.next_to(instance).get(id=active_version_id)
             instance.active_version = active_version
         instance.save()
 
         versions_data = validated_data.pop("versions", [])
         for version_data in versions_data:
             if "id" in version_data:
-                version = Version.objects.get(id=version_data["id"], conversation=instance)
+                version = Version.objects.next_to(instance).get(id=version_data["id"], conversation=instance)
                 version_serializer = VersionSerializer(version, data=version_data)
             else:
                 version_serializer = VersionSerializer(data=version_data)
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, MessageContent
+from chat.utils.purge import purge_conversations
+from chat.utils.sharding import shard_for_user
+
+
+@receiver(post_delete, sender=Message)
+def release_message_content(sender, instance, using, **kwargs):
+    MessageContent.objects.db_manager(using).release([instance.body_id])
+
+
+@receiver(post_delete, sender=Message)
+def recount_conversation(sender, instance, using, **kwargs):
+    Conversation.objects.using(using).filter(active_version_id=instance.version_id).recount()
+
+
+@receiver(pre_delete, sender=CustomUser)
+def purge_sharded_conversations(sender, instance, using, **kwargs):
+    # the cascade of a deleted user only reaches the conversations on its own database
+    shard = shard_for_user(instance.pk)
+    if shard != using:
+        conversation_ids = Conversation.objects.using(shard).filter(user_id=instance.pk).values_list("pk", flat=True)
+        purge_conversations(list(conversation_ids), using=shard)
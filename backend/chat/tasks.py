@@ -0,0 +1,21 @@
+from chat.models import Conversation
+from chat.utils.purge import purge_conversations
+from chat.utils.sharding import shard_for_user
+from jobs.queue import task
+
+
+@task(name="chat.purge_conversation")
+def purge_conversation(conversation_id: str, user_id: int) -> None:
+    """
+    Hard-deletes a soft-deleted conversation of a user with its versions and messages, which takes long enough for
+    large conversations to be left out of the request deleting it.
+    """
+    using = shard_for_user(user_id)
+    # looked up again, the conversation may have been purged by an earlier attempt
+    conversation_ids = list(
+        Conversation.objects.using(using)
+        .filter(pk=conversation_id, deleted_at__isnull=False)
+        .values_list("pk", flat=True)
+    )
+    if conversation_ids:
+        purge_conversations(conversation_ids, using=using)
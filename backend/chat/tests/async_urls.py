@@ -0,0 +1,8 @@
+from django.urls import include, path
+
+from backend.urls import urlpatterns as backend_urlpatterns
+from chat import async_views
+from chat.urls import build_urlpatterns
+
+# the project URLs with the chat endpoints served by the async views, which take precedence over the sync ones
+urlpatterns = [path("chat/", include(build_urlpatterns(async_views))), *backend_urlpatterns]
@@ -0,0 +1,144 @@
+import json
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Role, Version
+
+
+class ActivePathTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_role = Role.objects.create(name="user")
+        cls.assistant_role = Role.objects.create(name="assistant")
+        cls.mock_user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+
+    def setUp(self):
+        self.client.force_login(self.mock_user)
+        self.conversation = Conversation.objects.create(user=self.mock_user)
+        self.v0 = Version.objects.create(conversation=self.conversation)
+        self.conversation.active_version = self.v0
+        self.conversation.save()
+        for idx in range(4):
+            self.add_message(f"Message {idx}", role="user" if idx % 2 == 0 else "assistant")
+        m2 = self.v0.messages.all()[2]
+
+        # v1 and v2 edit the third message of v0, v3 edits the first message of v1 and v4 the third message of v1
+        self.v1 = self.branch(m2, "Edited message 2")
+        self.switch(self.v0)
+        self.v2 = self.branch(m2, "Other edit of message 2")
+        self.switch(self.v1)
+        self.v3 = self.branch(self.v1.messages.all()[0], "Edited message 0")
+        self.switch(self.v1)
+        self.v4 = self.branch(self.v1.messages.all()[2], "Edit of the edited message 2")
+
+    def add_message(self, content, role="user"):
+        url = reverse("conversation_add_message", kwargs={"pk": self.conversation.id})
+        response = self.client.post(url, data={"content": content, "role": role}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def branch(self, root_message, content):
+        url = reverse("conversation_add_version", kwargs={"pk": self.conversation.id})
+        response = self.client.post(
+            url, data=json.dumps({"root_message_id": str(root_message.id)}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.add_message(content)
+        return Version.objects.get(pk=response.data["id"])
+
+    def switch(self, version):
+        url = reverse("conversation_switch_version", kwargs={"pk": self.conversation.id, "version_id": version.id})
+        self.assertEqual(self.client.put(url).status_code, status.HTTP_204_NO_CONTENT)
+
+    def get_path(self, version=None):
+        url = reverse("get_conversation_active_path", kwargs={"pk": self.conversation.id})
+        response = self.client.get(url, {"version_id": str(version.id)} if version else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def assert_siblings(self, message, versions, current):
+        self.assertEqual(set(message["sibling_version_ids"]), {version.id for version in versions})
+        self.assertEqual(message["sibling_version_ids"][message["sibling_index"]], current.id)
+
+    def test_active_version_path(self):
+        data = self.get_path()
+
+        self.assertEqual(data["version_id"], self.v4.id)
+        self.assertEqual(
+            [message["content"] for message in data["messages"]],
+            ["Message 0", "Message 1", "Edit of the edited message 2"],
+        )
+        self.assert_siblings(data["messages"][0], [self.v0, self.v3], current=self.v0)
+        self.assertEqual(data["messages"][1]["sibling_version_ids"], [])
+        self.assertIsNone(data["messages"][1]["sibling_index"])
+        self.assert_siblings(data["messages"][2], [self.v0, self.v1, self.v2, self.v4], current=self.v4)
+
+    def test_requested_version_path(self):
+        data = self.get_path(self.v0)
+
+        self.assertEqual(len(data["messages"]), 4)
+        self.assert_siblings(data["messages"][0], [self.v0, self.v3], current=self.v0)
+        self.assert_siblings(data["messages"][2], [self.v0, self.v1, self.v2, self.v4], current=self.v0)
+        self.assertEqual(data["messages"][3]["sibling_version_ids"], [])
+        # the original version comes first
+        self.assertEqual(data["messages"][2]["sibling_version_ids"][0], self.v0.id)
+
+    def test_branch_at_first_message(self):
+        data = self.get_path(self.v3)
+
+        self.assertEqual([message["content"] for message in data["messages"]], ["Edited message 0"])
+        self.assert_siblings(data["messages"][0], [self.v0, self.v3], current=self.v3)
+
+    def test_message_payload(self):
+        message = self.get_path(self.v0)["messages"][1]
+
+        self.assertEqual(set(message), {"id", "content", "role", "created_at", "sibling_version_ids", "sibling_index"})
+        self.assertEqual(message["role"], "assistant")
+
+    def test_queries_do_not_grow_with_the_tree(self):
+        url = reverse("get_conversation_active_path", kwargs={"pk": self.conversation.id})
+        self.client.get(url)  # warms up the session and user caches
+        with CaptureQueriesContext(connection) as small_tree:
+            self.client.get(url)
+
+        for idx in range(5):
+            self.switch(self.v0)
+            self.branch(self.v0.messages.all()[3], f"Edit {idx} of message 3")
+        self.switch(self.v4)
+        with CaptureQueriesContext(connection) as large_tree:
+            self.client.get(url)
+
+        self.assertEqual(len(large_tree.captured_queries), len(small_tree.captured_queries))
+
+    def test_unknown_version(self):
+        url = reverse("get_conversation_active_path", kwargs={"pk": self.conversation.id})
+        other = Version.objects.create(conversation=Conversation.objects.create(user=self.mock_user))
+
+        for version_id in [str(other.id), "not-a-uuid"]:
+            response = self.client.get(url, {"version_id": version_id})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_conversation(self):
+        url = reverse("get_conversation_active_path", kwargs={"pk": "00000000-0000-0000-0000-000000000000"})
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conversation_without_versions(self):
+        conversation = Conversation.objects.create(user=self.mock_user)
+        url = reverse("get_conversation_active_path", kwargs={"pk": conversation.id})
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["version_id"])
+        self.assertEqual(response.data["messages"], [])
+
+
+@override_settings(ROOT_URLCONF="chat.tests.async_urls")
+class AsyncActivePathTests(ActivePathTests):
+    pass
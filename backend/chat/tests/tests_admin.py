@@ -0,0 +1,115 @@
+from django.contrib import admin
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authentication.models import CustomUser
+from chat.admin import MessageInline
+from chat.models import Conversation, Message, Role, Version
+
+
+class ChatAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_role = Role.objects.create(name="user")
+        cls.admin_user = CustomUser.objects.create_superuser("admin@email.com", "password")
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def create_conversation(self, message_count=2, branch_count=1):
+        conversation = Conversation.objects.create(title="Admin conversation", user=self.admin_user)
+        version = Version.objects.create(conversation=conversation)
+        messages = [
+            Message.objects.create(version=version, content=f"Message {idx}", role=self.user_role)
+            for idx in range(message_count)
+        ]
+        for _ in range(branch_count):
+            Version.objects.create(conversation=conversation, parent_version=version, root_message=messages[-1])
+        conversation.active_version = version
+        conversation.save()
+        return conversation
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assert_constant_queries(self, url, add_rows):
+        self.count_queries(url)  # warms up the session and user caches
+        queries = self.count_queries(url)
+        add_rows()
+        self.assertEqual(self.count_queries(url), queries)
+
+    def test_conversation_changelist_queries_do_not_grow(self):
+        self.create_conversation()
+        self.assert_constant_queries(
+            reverse("admin:chat_conversation_changelist"),
+            lambda: [self.create_conversation(branch_count=3) for _ in range(5)],
+        )
+
+    def test_version_changelist_queries_do_not_grow(self):
+        self.create_conversation()
+        self.assert_constant_queries(
+            reverse("admin:chat_version_changelist"),
+            lambda: [self.create_conversation(branch_count=3) for _ in range(5)],
+        )
+
+    def test_message_changelist_queries_do_not_grow(self):
+        self.create_conversation()
+        self.assert_constant_queries(
+            reverse("admin:chat_message_changelist"), lambda: [self.create_conversation() for _ in range(5)]
+        )
+
+    def test_version_change_page_paginates_messages(self):
+        conversation = self.create_conversation(message_count=MessageInline.per_page + 5)
+        url = reverse("admin:chat_version_change", args=[conversation.active_version_id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f"page 1 of 2, {MessageInline.per_page + 5} total")
+        self.assertContains(response, "Message 0")
+        self.assertNotContains(response, f"Message {MessageInline.per_page + 4}<")
+
+        response = self.client.get(url, {"message_page": 2})
+        self.assertContains(response, "page 2 of 2")
+        self.assertContains(response, f"Message {MessageInline.per_page + 4}<")
+
+    def test_saving_a_page_loads_only_the_submitted_messages(self):
+        conversation = self.create_conversation(message_count=MessageInline.per_page + 5)
+        version = conversation.active_version
+        request = RequestFactory().post("/")
+        request.user = self.admin_user
+        formset_class = MessageInline(Version, admin.site).get_formset(request, version)
+        submitted = list(Message.objects.filter(version=version).order_by("created_at")[:2])
+        prefix = formset_class.get_default_prefix()
+        data = {f"{prefix}-TOTAL_FORMS": "3", f"{prefix}-INITIAL_FORMS": "2"}
+        data.update({f"{prefix}-{idx}-id": str(message.pk) for idx, message in enumerate(submitted)})
+
+        formset = formset_class(data, instance=version, prefix=prefix)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(set(formset.get_queryset()), set(submitted))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(formset._submitted_pks(), [message.pk for message in submitted])
+
+        data[f"{prefix}-1-id"] = "not a pk"
+        self.assertEqual(formset_class(data, instance=version, prefix=prefix)._submitted_pks(), [submitted[0].pk])
+
+    def test_conversation_change_page_lists_versions_without_messages(self):
+        conversation = self.create_conversation(message_count=5, branch_count=2)
+
+        response = self.client.get(reverse("admin:chat_conversation_change", args=[conversation.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "page 1 of 1, 3 total")
+        self.assertNotContains(response, "Message 0<")
+
+    def test_hard_delete_conversation(self):
+        conversation = self.create_conversation(branch_count=2)
+
+        response = self.client.post(reverse("admin:chat_conversation_delete", args=[conversation.pk]), {"post": "yes"})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Conversation.objects.exists())
+        self.assertFalse(Version.objects.exists())
+        self.assertFalse(Message.objects.exists())
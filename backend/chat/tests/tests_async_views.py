@@ -0,0 +1,86 @@
+import json
+
+from django.test import override_settings
+from django.urls import resolve, reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from chat import async_views
+from chat.models import Conversation, Message, Role, Version
+from chat.tests import tests_functional
+
+
+@override_settings(ROOT_URLCONF="chat.tests.async_urls")
+class AsyncLoggedInConversationTests(tests_functional.LoggedInConversationTests):
+    """
+    Runs the functional tests of the sync chat views against ``chat.async_views``.
+    """
+
+    def test_async_views_are_routed(self):
+        url = reverse("get_conversations")
+        self.assertIs(resolve(url).func, async_views.get_conversations)
+
+    def test_login_required(self):
+        self.client.logout()
+
+        response = self.client.get(reverse("get_conversations"))
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+    def test_malformed_json(self):
+        url = reverse("conversation_add_message", kwargs={"pk": self.conversation.id})
+
+        response = self.client.post(url, data="{", content_type="application/json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("JSON parse error", response.data["detail"])
+
+    def test_response_is_rendered_json(self):
+        response = self.client.get(reverse("get_branched_conversation", kwargs={"pk": self.conversation.id}))
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(response.content)["id"], str(self.conversation.id))
+
+
+class AsyncResponseParityTests(APITestCase):
+    """
+    Compares the bodies of the sync and async views byte for byte.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+        roles = [Role.objects.create(name="user"), Role.objects.create(name="assistant")]
+        cls.conversation = Conversation.objects.create(user=cls.user, title="Zażółć gęślą jaźń")
+        root = Version.objects.create(conversation=cls.conversation)
+        messages = [
+            Message.objects.create(version=root, content=f"Wiadomość {idx} ✓", role=roles[idx % 2]) for idx in range(3)
+        ]
+        branch = Version.objects.create(conversation=cls.conversation, parent_version=root, root_message=messages[1])
+        Message.objects.create(version=branch, content="Wiadomość 0 ✓", role=roles[0])
+        cls.conversation.active_version = root
+        cls.conversation.save()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertSameResponse(self, url):
+        expected = self.client.get(url)
+        with override_settings(ROOT_URLCONF="chat.tests.async_urls"):
+            response = self.client.get(url)
+        self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+        return response
+
+    def test_same_bodies(self):
+        pk = self.conversation.pk
+        response = self.assertSameResponse(reverse("conversation_manage", kwargs={"pk": pk}))
+        # rendered with microseconds and without escaping non-ASCII text
+        self.assertRegex(response.content.decode(), r'"created_at":"[^"]+\.\d{6}')
+        self.assertIn("Zażółć", response.content.decode())
+
+        self.assertSameResponse(reverse("get_conversations"))
+        self.assertSameResponse(reverse("get_branched_conversations"))
+        self.assertSameResponse(reverse("get_branched_conversation", kwargs={"pk": pk}))
+        self.assertSameResponse(reverse("get_conversation_active_path", kwargs={"pk": pk}))
+        self.assertSameResponse(reverse("get_conversation_active_path", kwargs={"pk": pk}) + "?version_id=x")
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from authentication.models import CustomUser
+from chat.management.commands.backfill_titles import Command
+from chat.models import Conversation, Message, Role, Version
+from src.libs import openai
+from src.utils.rate_limit import RateLimiter
+
+COMMAND = "chat.management.commands.backfill_titles"
+
+
+def packed_titles(conversations):
+    return [f"About {question}" for question, _ in conversations]
+
+
+class BackfillTitlesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_role = Role.objects.create(name="user")
+        cls.assistant_role = Role.objects.create(name="assistant")
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password")
+
+    def setUp(self):
+        self.conversations = [self.create_conversation(f"question {idx}") for idx in range(5)]
+        self.titled = self.create_conversation("titled", title="Kept title")
+        self.unanswered = self.create_conversation("unanswered", answered=False)
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint.json")
+
+    def create_conversation(self, question, title="Mock title", answered=True):
+        conversation = Conversation.objects.create(user=self.user, title=title)
+        version = Version.objects.create(conversation=conversation)
+        Message.objects.create(version=version, content=question, role=self.user_role)
+        if answered:
+            Message.objects.create(version=version, content="answer", role=self.assistant_role)
+        conversation.active_version = version
+        conversation.save()
+        return conversation
+
+    def backfill(self, *args):
+        call_command(
+            "backfill_titles",
+            "--checkpoint",
+            self.checkpoint,
+            "--rpm",
+            "100000",
+            *args,
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+
+    def titles(self):
+        return {c.pk: c.title for c in Conversation.objects.all()}
+
+    @mock.patch(f"{COMMAND}.get_gpt_title", side_effect=lambda question, answer: f"About {question}")
+    @mock.patch(f"{COMMAND}.get_gpt_titles", side_effect=packed_titles)
+    def test_titles_are_generated_in_packs(self, get_gpt_titles, get_gpt_title):
+        modified_at = Conversation.objects.get(pk=self.conversations[0].pk).modified_at
+        self.backfill("--pack-size", "2", "--workers", "2")
+
+        titles = self.titles()
+        for conversation in self.conversations:
+            question = conversation.active_version.messages.first().content
+            self.assertEqual(titles[conversation.pk], f"About {question}")
+        self.assertEqual(titles[self.titled.pk], "Kept title")
+        self.assertEqual(titles[self.unanswered.pk], "Mock title")
+        self.assertEqual([len(call.args[0]) for call in get_gpt_titles.call_args_list], [2, 2])
+        # a pack of one uses the plain title prompt
+        self.assertEqual(get_gpt_title.call_count, 1)
+        self.assertEqual(Conversation.objects.get(pk=self.conversations[0].pk).modified_at, modified_at)
+
+    @mock.patch(f"{COMMAND}.get_gpt_title", return_value="Single title")
+    @mock.patch(f"{COMMAND}.get_gpt_titles", side_effect=ValueError("Expected 5 titles"))
+    def test_unusable_packed_answer_falls_back_to_single_requests(self, get_gpt_titles, get_gpt_title):
+        self.backfill()
+
+        self.assertEqual(get_gpt_title.call_count, 5)
+        self.assertEqual(Conversation.objects.filter(title="Single title").count(), 5)
+
+    @mock.patch(f"{COMMAND}.get_gpt_titles", side_effect=packed_titles)
+    def test_resumes_from_checkpoint(self, get_gpt_titles):
+        self.backfill("--limit", "2", "--pack-size", "2")
+        with open(self.checkpoint) as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint["titled"], 2)
+
+        # conversations behind the checkpoint are not visited again
+        Conversation.objects.filter(title__startswith="About").update(title="Mock title")
+        self.backfill()
+        self.assertEqual(Conversation.objects.filter(title="Mock title").count(), 3)
+
+        self.backfill("--restart")
+        self.assertEqual(Conversation.objects.filter(title="Mock title").count(), 1)
+
+    @mock.patch(f"{COMMAND}.get_gpt_titles")
+    def test_rate_limited_requests_are_retried(self, get_gpt_titles):
+        get_gpt_titles.side_effect = iter([openai.error.RateLimitError("slow down"), ["A", "B", "C", "D", "E"]])
+        self.backfill("--retry-delay", "0")
+
+        self.assertEqual(get_gpt_titles.call_count, 2)
+        self.assertEqual(Conversation.objects.filter(title__in=["A", "B", "C", "D", "E"]).count(), 5)
+
+    @mock.patch(f"{COMMAND}.get_gpt_titles", side_effect=packed_titles)
+    def test_titles_renamed_meanwhile_are_kept(self, get_gpt_titles):
+        fetch = Command._fetch
+
+        def fetch_then_rename(command, *args):
+            conversations = fetch(command, *args)
+            Conversation.objects.filter(pk=self.conversations[0].pk).update(title="Renamed")
+            return conversations
+
+        with mock.patch.object(Command, "_fetch", fetch_then_rename):
+            self.backfill()
+
+        self.assertEqual(self.titles()[self.conversations[0].pk], "Renamed")
+        self.assertEqual(Conversation.objects.filter(title__startswith="About").count(), 4)
+
+
+class RateLimiterTests(TestCase):
+    @mock.patch("src.utils.rate_limit.time.sleep")
+    @mock.patch("src.utils.rate_limit.time.monotonic", return_value=100.0)
+    def test_calls_are_spaced_after_the_burst(self, monotonic, sleep):
+        limiter = RateLimiter(rate=2, period=1.0, burst=2)
+
+        self.assertEqual([limiter.acquire() for _ in range(4)], [0.0, 0.0, 0.5, 1.0])
+        limiter.penalize(3)
+        self.assertEqual(limiter.acquire(), 4.5)
@@ -0,0 +1,76 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, MessageContent, Role, Version
+from chat.utils.compression import AVAILABLE_CODECS, compress_content, decompress_content
+
+
+class ColdStorageTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_role = Role.objects.create(name="user")
+        cls.mock_user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+
+    def setUp(self):
+        self.client.force_login(self.mock_user)
+        self.long_content = "A long assistant answer with repeated words. " * 50
+        self.shared_content = "A long answer pasted into both conversations. " * 50
+        self.cold_conversation = self.create_conversation(self.long_content)
+        self.hot_conversation = self.create_conversation("Another long assistant answer. " * 50)
+        Conversation.objects.filter(pk=self.cold_conversation.pk).update(
+            modified_at=timezone.now() - timedelta(days=40)
+        )
+
+    def create_conversation(self, content):
+        conversation = Conversation.objects.create(user=self.mock_user)
+        version = Version.objects.create(conversation=conversation)
+        Message.objects.create(version=version, content=content, role=self.user_role)
+        Message.objects.create(version=version, content="Short", role=self.user_role)
+        Message.objects.create(version=version, content=self.shared_content, role=self.user_role)
+        conversation.active_version = version
+        conversation.save()
+        return conversation
+
+    def test_codecs_round_trip(self):
+        for codec in AVAILABLE_CODECS:
+            self.assertEqual(
+                decompress_content(memoryview(compress_content("Zażółć gęślą jaźń", codec))), "Zażółć gęślą jaźń"
+            )
+
+    def test_compress_cold_messages(self):
+        call_command("compress_cold_messages", days=30, stdout=StringIO())
+
+        cold = MessageContent.objects.filter(compressed_content__isnull=False)
+        self.assertEqual(cold.count(), 1)
+        self.assertEqual(cold.values_list("content", flat=True).get(), "")
+        message = Message.objects.get(body__in=cold)
+        self.assertEqual(message.version.conversation, self.cold_conversation)
+        self.assertEqual(message.content, self.long_content)
+
+    def test_compressed_messages_serialized_transparently(self):
+        call_command("compress_cold_messages", days=30, stdout=StringIO())
+
+        url = reverse("get_branched_conversation", kwargs={"pk": self.cold_conversation.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        contents = [message["content"] for message in response.data["versions"][0]["messages"]]
+        self.assertEqual(contents, [self.long_content, "Short", self.shared_content])
+
+    def test_edited_message_becomes_hot(self):
+        call_command("compress_cold_messages", days=30, stdout=StringIO())
+
+        message = Message.objects.get(body__compressed_content__isnull=False)
+        message.content = self.long_content + " Edited."
+        message.save()
+        message.refresh_from_db()
+        self.assertIsNone(message.body.compressed_content)
+        self.assertEqual(message.content, self.long_content + " Edited.")
+        # the compressed content is no longer referenced
+        self.assertFalse(MessageContent.objects.filter(compressed_content__isnull=False).exists())
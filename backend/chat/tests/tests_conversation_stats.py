@@ -0,0 +1,128 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from freezegun import freeze_time
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, MessageContent, Role, Version
+from chat.utils.compression import compress_content
+from chat.utils.content import PREVIEW_LENGTH, message_preview
+
+
+class ConversationStatsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_role = Role.objects.create(name="user")
+        cls.assistant_role = Role.objects.create(name="assistant")
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("add_conversation"),
+            data=json.dumps(
+                {
+                    "title": "Stats",
+                    "messages": [
+                        {"role": "user", "content": "Question"},
+                        {"role": "assistant", "content": "First  answer\nwith lines"},
+                    ],
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.conversation = Conversation.objects.get(pk=response.data["id"])
+        self.version = self.conversation.active_version
+
+    def stats(self):
+        conversation = Conversation.objects.get(pk=self.conversation.pk)
+        return conversation.message_count, conversation.version_count, conversation.last_message_preview
+
+    def add_message(self, content, url_name="conversation_add_message", pk=None):
+        response = self.client.post(
+            reverse(url_name, kwargs={"pk": pk or self.conversation.pk}),
+            data=json.dumps({"role": "user", "content": content}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    def test_new_conversation(self):
+        self.assertEqual(self.stats(), (2, 1, "First answer with lines"))
+        response = self.client.get(reverse("conversation_manage", kwargs={"pk": self.conversation.pk}))
+        self.assertEqual(response.data["message_count"], 2)
+        self.assertEqual(response.data["version_count"], 1)
+
+    def test_added_message(self):
+        self.add_message("Another question")
+        self.assertEqual(self.stats(), (3, 1, "Another question"))
+
+    def test_message_of_another_version_leaves_the_active_one(self):
+        other = Version.objects.create(conversation=self.conversation)
+        self.add_message("Elsewhere", url_name="version_add_message", pk=other.pk)
+        self.assertEqual(self.stats(), (2, 2, "First answer with lines"))
+
+    def test_new_and_switched_version(self):
+        root_message = self.version.messages.last()
+        response = self.client.post(
+            reverse("conversation_add_version", kwargs={"pk": self.conversation.pk}),
+            data=json.dumps({"root_message_id": str(root_message.pk)}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.stats(), (1, 2, "Question"))
+
+        response = self.client.put(
+            reverse("conversation_switch_version", kwargs={"pk": self.conversation.pk, "version_id": self.version.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.stats(), (2, 2, "First answer with lines"))
+
+    def test_edited_and_deleted_messages(self):
+        message = self.version.messages.last()
+        message.content = "Edited answer"
+        message.save()
+        self.assertEqual(self.stats(), (2, 1, "Edited answer"))
+
+        Message.objects.get(pk=message.pk).delete()
+        self.assertEqual(self.stats(), (1, 1, "Question"))
+
+    def test_deleted_version(self):
+        Version.objects.create(conversation=self.conversation).delete()
+        self.assertEqual(self.stats(), (2, 1, "First answer with lines"))
+
+    def test_stale_instance_does_not_overwrite_the_counters(self):
+        stale = Conversation.objects.get(pk=self.conversation.pk)
+        self.add_message("Another question")
+        stale.title = "Renamed"
+        stale.save()
+        self.assertEqual(self.stats(), (3, 1, "Another question"))
+
+    def test_conversation_listing_reads_the_counters(self):
+        with self.assertNumQueries(1):
+            conversations = list(Conversation.objects.filter(user=self.user).values("message_count", "version_count"))
+        self.assertEqual(conversations, [{"message_count": 2, "version_count": 1}])
+
+    def test_recount_command_repairs_drifted_counters(self):
+        Conversation.objects.update(message_count=10, version_count=0, last_message_preview="")
+        stdout = StringIO()
+        call_command("recount_conversations", stdout=stdout)
+
+        self.assertIn("Successfully repaired 1 conversations", stdout.getvalue())
+        self.assertEqual(self.stats(), (2, 1, "First answer with lines"))
+
+    def test_preview_of_a_compressed_message(self):
+        text = "Long answer " * 20
+        with freeze_time("2030-01-01"):
+            message = Message.objects.create(version=self.version, content=text, role=self.assistant_role)
+        MessageContent.objects.filter(pk=message.body_id).update(content="", compressed_content=compress_content(text))
+        Conversation.objects.update(last_message_preview="")
+
+        Conversation.objects.recount()
+        self.assertEqual(self.stats(), (3, 1, message_preview(text)))
+        self.assertEqual(len(message_preview(text)), PREVIEW_LENGTH)
@@ -0,0 +1,75 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, Role, Version
+
+
+class ExportConversationsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_role = Role.objects.create(name="user")
+        cls.mock_user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+        cls.other_user = CustomUser.objects.create_user("other@email.com", "password", is_active=True)
+
+    def setUp(self):
+        self.client.force_login(self.mock_user)
+        self.conversation = self.create_conversation(self.mock_user, "Exported")
+        self.deleted_conversation = self.create_conversation(self.mock_user, "Deleted", deleted_at=timezone.now())
+        self.create_conversation(self.other_user, "Other user")
+
+    def create_conversation(self, user, title, deleted_at=None):
+        conversation = Conversation.objects.create(title=title, user=user, deleted_at=deleted_at)
+        version = Version.objects.create(conversation=conversation)
+        for content in ("Hi", "Hello, how can I help you?"):
+            Message.objects.create(version=version, content=f"{title}: {content}", role=self.user_role)
+        conversation.active_version = version
+        conversation.save()
+        return conversation
+
+    @staticmethod
+    def parse(content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_export(self):
+        response = self.client.get(reverse("export_conversations"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        rows = self.parse(b"".join(response.streaming_content))
+        self.assertEqual([row["type"] for row in rows], ["conversation", "version", "message", "message"])
+        self.assertEqual(rows[0]["id"], str(self.conversation.id))
+        self.assertEqual(rows[0]["active_version_id"], str(self.conversation.active_version_id))
+        self.assertEqual(rows[1]["conversation_id"], str(self.conversation.id))
+        self.assertEqual(rows[2]["version_id"], rows[1]["id"])
+        self.assertEqual(rows[2]["role"], "user")
+        self.assertEqual(rows[2]["content"], "Exported: Hi")
+
+    def test_export_gzip_with_deleted(self):
+        response = self.client.get(reverse("export_conversations"), {"gzip": "true", "include_deleted": "true"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn("conversations.ndjson.gz", response["Content-Disposition"])
+
+        rows = self.parse(gzip.decompress(b"".join(response.streaming_content)))
+        conversations = [row["title"] for row in rows if row["type"] == "conversation"]
+        self.assertEqual(sorted(conversations), ["Deleted", "Exported"])
+        self.assertEqual(len([row for row in rows if row["type"] == "message"]), 4)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "export.ndjson.gz")
+            call_command("export_conversations", "mock@email.com", output=path, gzip=True, stderr=StringIO())
+            with gzip.open(path) as f:
+                rows = self.parse(f.read())
+
+        self.assertEqual(len(rows), 4)
@@ -1,5 +1,6 @@
 import json
 
+from django.test import override_settings
 from django.urls import reverse
 from freezegun import freeze_time
 from rest_framework import status
@@ -7,6 +8,8 @@ from rest_framework.test import APITestCase
 
 from authentication.models import CustomUser
 from chat.models import Conversation, Message, Role, Version
+from jobs.models import Job
+from jobs.worker import claim_jobs, run_job
 
 
 class LoggedInConversationTests(APITestCase):
@@ -304,6 +307,51 @@ class LoggedInConversationTests(APITestCase):
         self.conversation.refresh_from_db()
         self.assertIsNotNone(self.conversation.deleted_at)
 
+    def test_conversation_hard_delete_runs_in_the_background(self):
+        url = reverse("conversation_manage", kwargs={"pk": self.conversation.id})
+        response = self.client.delete(url)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.conversation.refresh_from_db()
+        self.assertIsNotNone(self.conversation.deleted_at)
+        job = Job.objects.get()
+        self.assertEqual(
+            (job.name, job.args), ("chat.purge_conversation", [str(self.conversation.id), self.mock_user.pk])
+        )
+
+        run_job(claim_jobs("worker", 1)[0], "worker")
+        self.assertFalse(Conversation.objects.filter(pk=self.conversation.id).exists())
+        self.assertFalse(Message.objects.filter(version__conversation_id=self.conversation.id).exists())
+
+    def assert_deleted_conversation_is_hidden(self):
+        pk = self.conversation.id
+        self.assertEqual(self.client.delete(reverse("conversation_manage", kwargs={"pk": pk})).status_code, 204)
+
+        # gone from every read endpoint before the background job purged it
+        for name in ["get_conversations", "get_branched_conversations"]:
+            self.assertEqual(self.client.get(reverse(name)).json(), [])
+        for name in ["conversation_manage", "get_branched_conversation", "get_conversation_active_path"]:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, kwargs={"pk": pk}))
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        export = b"".join(self.client.get(reverse("export_conversations")).streaming_content)
+        self.assertNotIn(str(pk).encode(), export)
+        response = self.client.post(
+            reverse("gpt_stored_conversation"), {"conversation_id": str(pk), "model": "gpt35"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # deleting it again neither fails nor queues another purge
+        self.assertEqual(self.client.delete(reverse("conversation_manage", kwargs={"pk": pk})).status_code, 404)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_hard_deleted_conversation_is_hidden_at_once(self):
+        self.assert_deleted_conversation_is_hidden()
+
+    @override_settings(ROOT_URLCONF="chat.tests.async_urls")
+    def test_hard_deleted_conversation_is_hidden_at_once_by_the_async_views(self):
+        self.assert_deleted_conversation_is_hidden()
+
     def test_conversation_delete_no_conversation(self):
         url = reverse("conversation_delete", kwargs={"pk": self.nonexistent_uuid})
         response = self.client.put(url)
@@ -0,0 +1,194 @@
+import json
+from unittest import mock
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, MessageContent, Role, Version
+from chat.serializers import MessageSerializer
+from chat.utils.compression import compress_content
+from chat.utils.content import content_hash
+from chat.utils.purge import purge_conversations
+
+
+class MessageContentTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_role = Role.objects.create(name="user")
+        cls.mock_user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+
+    def setUp(self):
+        self.client.force_login(self.mock_user)
+        self.conversation = Conversation.objects.create(user=self.mock_user)
+        self.version = Version.objects.create(conversation=self.conversation)
+        self.messages = [
+            Message.objects.create(version=self.version, content=content, role=self.user_role)
+            for content in ["Pasted snippet", "Question", "Pasted snippet"]
+        ]
+        self.conversation.active_version = self.version
+        self.conversation.save()
+
+    def ref_counts(self):
+        return dict(MessageContent.objects.values_list("content", "ref_count"))
+
+    def test_acquire_inserts_again_what_a_concurrent_release_deleted(self):
+        original = QuerySet.bulk_create
+        calls = []
+
+        def racing_bulk_create(queryset, objs, *args, **kwargs):
+            calls.append(objs)
+            created = original(queryset, objs, *args, **kwargs)
+            if len(calls) == 1:
+                # the new content is released by another writer before it is locked
+                MessageContent.objects.filter(pk__in=[obj.pk for obj in objs], ref_count=0).delete()
+            return created
+
+        with mock.patch.object(QuerySet, "bulk_create", racing_bulk_create):
+            hashes = MessageContent.objects.acquire(["Fresh text", "Question"])
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(hashes, [content_hash("Fresh text"), content_hash("Question")])
+        self.assertEqual(self.ref_counts(), {"Pasted snippet": 2, "Question": 2, "Fresh text": 1})
+
+    def test_identical_contents_stored_once(self):
+        self.assertEqual(self.ref_counts(), {"Pasted snippet": 2, "Question": 1})
+        self.assertEqual(self.messages[0].body_id, content_hash("Pasted snippet"))
+        self.assertEqual(Message.objects.get(pk=self.messages[2].pk).content, "Pasted snippet")
+
+    def test_bulk_create_interns_contents(self):
+        Message.objects.bulk_create(
+            [Message(version=self.version, content=content, role=self.user_role) for content in ["Question", "New"]]
+        )
+
+        self.assertEqual(self.ref_counts(), {"Pasted snippet": 2, "Question": 2, "New": 1})
+
+    def test_branching_shares_contents(self):
+        url = reverse("conversation_add_version", kwargs={"pk": self.conversation.id})
+        response = self.client.post(
+            url, data=json.dumps({"root_message_id": str(self.messages[2].id)}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.ref_counts(), {"Pasted snippet": 3, "Question": 2})
+        self.assertEqual([message["content"] for message in response.data["messages"]], ["Pasted snippet", "Question"])
+
+    def test_editing_releases_previous_content(self):
+        message = self.messages[1]
+        message.content = "Edited question"
+        message.save()
+
+        self.assertEqual(self.ref_counts(), {"Pasted snippet": 2, "Edited question": 1})
+
+    def test_deleting_messages_releases_contents(self):
+        self.messages[0].delete()
+        self.assertEqual(self.ref_counts(), {"Pasted snippet": 1, "Question": 1})
+
+        self.conversation.delete()
+        self.assertFalse(MessageContent.objects.exists())
+
+    def test_purge_releases_contents(self):
+        other = Conversation.objects.create(user=self.mock_user)
+        Message.objects.create(
+            version=Version.objects.create(conversation=other), content="Question", role=self.user_role
+        )
+
+        purge_conversations([self.conversation.pk])
+
+        self.assertEqual(self.ref_counts(), {"Question": 1})
+
+    def test_recount_repairs_reference_counts(self):
+        MessageContent.objects.update(ref_count=7)
+        MessageContent.objects.create(hash=content_hash("Orphan"), content="Orphan", ref_count=1)
+
+        MessageContent.objects.recount()
+
+        self.assertEqual(self.ref_counts(), {"Pasted snippet": 2, "Question": 1})
+
+    def test_serializer_output_unchanged(self):
+        message = Message.objects.get(pk=self.messages[0].pk)
+
+        self.assertEqual(
+            MessageSerializer(message).data,
+            {
+                "id": str(message.id),
+                "content": "Pasted snippet",
+                "role": "user",
+                "created_at": timezone.localtime(message.created_at).isoformat().replace("+00:00", "Z"),
+                "versions": [],
+            },
+        )
+
+    def test_serializer_requires_content(self):
+        serializer = MessageSerializer(data={"role": "user"})
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors["content"][0].code, "required")
+
+    def test_serializer_creates_message(self):
+        serializer = MessageSerializer(data={"content": "Question", "role": "user"})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save(version=self.version)
+
+        self.assertEqual(self.ref_counts(), {"Pasted snippet": 2, "Question": 2})
+
+
+class MessageContentQueryTests(TestCase):
+    def test_version_messages_load_contents_in_one_query(self):
+        role = Role.objects.create(name="user")
+        conversation = Conversation.objects.create(user=CustomUser.objects.create(email="mock@email.com"))
+        version = Version.objects.create(conversation=conversation)
+        for idx in range(5):
+            Message.objects.create(version=version, content=f"Message {idx}", role=role)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len([message.content for message in version.messages.all()]), 5)
+
+
+class DeduplicateMigrationTests(TransactionTestCase):
+    migrate_from = [("chat", "0002_message_compressed_content")]
+    migrate_to = [("chat", "0005_remove_message_content")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_existing_messages_are_deduplicated(self):
+        apps = self.migrate(self.migrate_from)
+        Role = apps.get_model("chat", "Role")
+        Conversation = apps.get_model("chat", "Conversation")
+        Version = apps.get_model("chat", "Version")
+        Message = apps.get_model("chat", "Message")
+        CustomUser = apps.get_model("authentication", "CustomUser")
+
+        role = Role.objects.create(name="user")
+        conversation = Conversation.objects.create(user=CustomUser.objects.create(email="mock@email.com"))
+        version = Version.objects.create(conversation=conversation)
+        for content in ["Same", "Same", "Other"]:
+            Message.objects.create(version=version, content=content, role=role)
+        Message.objects.create(version=version, content="", compressed_content=compress_content("Same"), role=role)
+        Message.objects.create(version=version, content="", compressed_content=compress_content("Cold only"), role=role)
+
+        apps = self.migrate(self.migrate_to)
+        MessageContent = apps.get_model("chat", "MessageContent")
+        Message = apps.get_model("chat", "Message")
+
+        self.assertEqual(
+            {content.hash: content.ref_count for content in MessageContent.objects.all()},
+            {content_hash("Same"): 3, content_hash("Other"): 1, content_hash("Cold only"): 1},
+        )
+        cold = MessageContent.objects.get(pk=content_hash("Cold only"))
+        self.assertEqual(cold.content, "")
+        self.assertIsNotNone(cold.compressed_content)
+        self.assertFalse(Message.objects.filter(body__isnull=True).exists())
@@ -0,0 +1,54 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, Role, Version
+
+
+class PurgeDeletedConversationsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_role = Role.objects.create(name="user")
+        cls.mock_user = CustomUser.objects.create(email="mock@email.com", is_active=True)
+
+    def create_conversation(self, deleted_days_ago=None):
+        deleted_at = timezone.now() - timedelta(days=deleted_days_ago) if deleted_days_ago is not None else None
+        conversation = Conversation.objects.create(user=self.mock_user, deleted_at=deleted_at)
+        version = Version.objects.create(conversation=conversation)
+        messages = [
+            Message.objects.create(version=version, content=f"Message {idx}", role=self.user_role) for idx in range(3)
+        ]
+        branch = Version.objects.create(conversation=conversation, parent_version=version, root_message=messages[1])
+        Message.objects.create(version=branch, content=messages[0].content, role=self.user_role)
+        conversation.active_version = branch
+        conversation.save()
+        return conversation
+
+    def test_purge_old_soft_deleted_conversations(self):
+        old = [self.create_conversation(deleted_days_ago=40) for _ in range(3)]
+        recent = self.create_conversation(deleted_days_ago=5)
+        alive = self.create_conversation()
+
+        out = StringIO()
+        call_command("purge_deleted_conversations", days=30, batch_size=2, stdout=out)
+
+        self.assertFalse(Conversation.objects.filter(pk__in=[c.pk for c in old]).exists())
+        self.assertFalse(Version.objects.filter(conversation__in=old).exists())
+        self.assertFalse(Message.objects.filter(version__conversation__in=old).exists())
+        self.assertEqual(set(Conversation.objects.all()), {recent, alive})
+        self.assertEqual(Version.objects.count(), 4)
+        self.assertEqual(Message.objects.count(), 8)
+        self.assertIn("Successfully purged 3 conversations, 6 versions and 12 messages", out.getvalue())
+
+    def test_dry_run(self):
+        self.create_conversation(deleted_days_ago=40)
+
+        out = StringIO()
+        call_command("purge_deleted_conversations", days=30, dry_run=True, stdout=out)
+
+        self.assertEqual(Conversation.objects.count(), 1)
+        self.assertIn("1 conversations", out.getvalue())
@@ -0,0 +1,110 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, MessageContent, Role, Version
+from chat.serializers import ConversationSerializer
+from chat.utils.branching import make_branched_conversation
+from chat.utils.compression import compress_content
+from chat.utils.read_serializers import serialize_conversations
+
+
+class ReadSerializerParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+        cls.other_user = CustomUser.objects.create_user("other@email.com", "password", is_active=True)
+        roles = [Role.objects.create(name="user"), Role.objects.create(name="assistant")]
+
+        # a branched conversation: two edits of the second question and a regenerated answer of the first edit
+        cls.branched = Conversation.objects.create(user=cls.user, title="Branched")
+        root = Version.objects.create(conversation=cls.branched)
+        messages = [
+            Message.objects.create(version=root, content=f"Root message {idx}", role=roles[idx % 2]) for idx in range(4)
+        ]
+        edit = Version.objects.create(conversation=cls.branched, parent_version=root, root_message=messages[1])
+        Message.objects.create(version=edit, content="Root message 0", role=roles[0])
+        edited = Message.objects.create(version=edit, content="Edited question", role=roles[1])
+        regenerated = Version.objects.create(conversation=cls.branched, parent_version=edit, root_message=edited)
+        Message.objects.create(version=regenerated, content="Regenerated answer", role=roles[1])
+        Version.objects.create(conversation=cls.branched, parent_version=root, root_message=messages[3])
+        cls.branched.active_version = edit
+        cls.branched.save()
+
+        # without an active version or versions at all
+        cls.inactive = Conversation.objects.create(user=cls.user, title="No active version")
+        Message.objects.create(
+            version=Version.objects.create(conversation=cls.inactive), content="Root message 0", role=roles[0]
+        )
+        cls.empty = Conversation.objects.create(user=cls.user, title="Empty")
+        Conversation.objects.create(user=cls.other_user, title="Not listed")
+
+        # a compressed content shared with another message
+        compressed = MessageContent.objects.get(content="Root message 2")
+        compressed.compressed_content = compress_content(compressed.content)
+        compressed.content = ""
+        compressed.save()
+
+    def assertParity(self, conversations):
+        expected = ConversationSerializer(conversations, many=True).data
+        data = serialize_conversations(conversations)
+
+        self.assertEqual(data, expected)
+        # the same keys in the same order, and the same rendering of the values left to the renderer
+        self.assertEqual(JSONRenderer().render(data), JSONRenderer().render(expected))
+
+    def test_parity(self):
+        self.assertParity(Conversation.objects.filter(user=self.user).order_by("-modified_at"))
+        self.assertParity(Conversation.objects.filter(pk=self.branched.pk))
+        self.assertParity(Conversation.objects.none())
+
+    def test_parity_with_many_branches(self):
+        conversation = Conversation.objects.create(user=self.user, title="Many branches")
+        root = Version.objects.create(conversation=conversation)
+        messages = [
+            Message.objects.create(version=root, content=f"Message {idx}", role=Role.objects.get(name="user"))
+            for idx in range(3)
+        ]
+        created = [root]
+        for idx in range(8):
+            parent = created[idx // 2]
+            created.append(
+                Version.objects.create(conversation=conversation, parent_version=parent, root_message=messages[idx % 3])
+            )
+        conversations = Conversation.objects.filter(pk=conversation.pk)
+
+        self.assertParity(conversations)
+        # in the order of creation, not of the random ids on the tree paths
+        versions = serialize_conversations(conversations)[0]["versions"]
+        self.assertEqual([version["id"] for version in versions], [str(version.pk) for version in created])
+
+    def test_parity_in_other_time_zones(self):
+        for zone in ("UTC", "America/New_York"):
+            with self.subTest(zone=zone), timezone.override(zone):
+                self.assertParity(Conversation.objects.filter(user=self.user).order_by("created_at"))
+
+    def test_query_count_does_not_depend_on_the_size(self):
+        with self.assertNumQueries(3):
+            serialize_conversations(Conversation.objects.filter(user=self.user))
+
+    def test_endpoints(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("conversation_manage", kwargs={"pk": self.branched.pk}))
+        self.assertEqual(response.content, JSONRenderer().render(ConversationSerializer(self.branched).data))
+        expected = ConversationSerializer(self.branched).data
+        make_branched_conversation(expected)
+        response = self.client.get(reverse("get_branched_conversation", kwargs={"pk": self.branched.pk}))
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+        response = self.client.get(reverse("get_conversations"))
+        self.assertEqual(
+            [conversation["title"] for conversation in response.json()], ["Empty", "No active version", "Branched"]
+        )
+
+        other = Conversation.objects.get(user=self.other_user)
+        response = self.client.get(reverse("conversation_manage", kwargs={"pk": other.pk}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("get_branched_conversation", kwargs={"pk": other.pk}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,275 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.admin import helpers
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from chat.admin import ConversationAdmin
+from chat.models import Conversation, Message, MessageContent, Role, Version
+from chat.utils.sharding import jump_hash, shard_for_user
+
+SHARDS = ["default", "shard1", "shard2"]
+
+# local SQLite shards for these tests, created by the test runner like any other database the tests use
+for _alias in SHARDS[1:]:
+    connections.settings.setdefault(_alias, {"ENGINE": "django.db.backends.sqlite3", "NAME": f"test_{_alias}.sqlite3"})
+connections.settings = connections.configure_settings(connections.settings)
+
+
+def create_user_on(shard, prefix="mock"):
+    """
+    Creates users until one is placed on the given shard.
+    """
+    for idx in range(100):
+        user = CustomUser.objects.create_user(f"{prefix}{idx}@email.com", "password", is_active=True)
+        if shard_for_user(user.pk) == shard:
+            return user
+        user.delete()
+    raise AssertionError(f"No user placed on {shard}")
+
+
+class JumpHashTests(SimpleTestCase):
+    def test_buckets_are_stable_and_in_range(self):
+        buckets = [jump_hash(key, 10) for key in range(1000)]
+        self.assertEqual(buckets, [jump_hash(key, 10) for key in range(1000)])
+        self.assertEqual(set(buckets), set(range(10)))
+        self.assertEqual({jump_hash(key, 1) for key in range(100)}, {0})
+
+    def test_a_new_bucket_only_takes_keys(self):
+        keys = [key * 2654435761 for key in range(2000)]
+        moved = 0
+        for key in keys:
+            before, after = jump_hash(key, 10), jump_hash(key, 11)
+            if before != after:
+                self.assertEqual(after, 10)
+                moved += 1
+        # 1 / 11 of the keys in expectation
+        self.assertAlmostEqual(moved / len(keys), 1 / 11, delta=0.03)
+
+    @override_settings(CHAT_SHARDS=SHARDS)
+    def test_users_are_spread_over_the_shards(self):
+        placements = [shard_for_user(user_id) for user_id in range(1, 301)]
+        self.assertEqual(placements, [shard_for_user(user_id) for user_id in range(1, 301)])
+        self.assertEqual(set(placements), set(SHARDS))
+        with override_settings(CHAT_SHARDS=["default"]):
+            self.assertEqual(shard_for_user(1), "default")
+
+
+@override_settings(CHAT_SHARDS=SHARDS)
+class ShardedViewsTests(APITestCase):
+    databases = set(SHARDS)
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("create_roles", stdout=StringIO())
+        cls.user = create_user_on("shard1")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post_json(self, url, data):
+        return self.client.post(url, data=json.dumps(data), content_type="application/json")
+
+    def test_conversation_lives_on_the_shard_of_its_user(self):
+        response = self.post_json(
+            reverse("add_conversation"),
+            {
+                "title": "Sharded",
+                "messages": [{"role": "user", "content": "Question"}, {"role": "assistant", "content": "Answer"}],
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        conversation_id = response.data["id"]
+
+        self.assertFalse(Conversation.objects.using("default").exists())
+        conversation = Conversation.objects.using("shard1").get(pk=conversation_id)
+        self.assertEqual((conversation.message_count, conversation.last_message_preview), (2, "Answer"))
+        self.assertEqual(Message.objects.using("shard1").count(), 2)
+        self.assertEqual(MessageContent.objects.using("shard1").count(), 2)
+
+        response = self.post_json(
+            reverse("conversation_add_message", kwargs={"pk": conversation_id}), {"role": "user", "content": "More"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        root_message = Message.objects.using("shard1").get(body__content="Answer")
+        response = self.post_json(
+            reverse("conversation_add_version", kwargs={"pk": conversation_id}),
+            {"root_message_id": str(root_message.pk)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_version = Version.objects.using("shard1").get(pk=response.data["id"])
+        self.assertEqual((new_version.depth, new_version.branch_index), (1, 1))
+
+        response = self.client.get(reverse("get_conversations"))
+        self.assertEqual([c["id"] for c in response.data], [conversation_id])
+        response = self.client.get(reverse("get_conversation_active_path", kwargs={"pk": conversation_id}))
+        self.assertEqual([m["content"] for m in response.data["messages"]], ["Question"])
+        response = self.client.get(reverse("export_conversations"))
+        self.assertEqual(b"".join(response.streaming_content).count(b'"type": "message"'), 4)
+
+    def test_other_users_do_not_see_the_conversation(self):
+        conversation = Conversation.objects.create(user=self.user, title="Private")
+        self.assertEqual(conversation._state.db, "shard1")
+
+        self.client.force_login(create_user_on("shard1", prefix="other"))
+        response = self.client.get(reverse("conversation_manage", kwargs={"pk": conversation.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleting_the_user_deletes_its_conversations(self):
+        conversation = Conversation.objects.create(user=self.user)
+        Message.objects.create(
+            version=Version.objects.create(conversation=conversation),
+            content="Question",
+            role=Role.objects.get(name="user"),
+        )
+
+        self.user.delete()
+        self.assertFalse(Conversation.objects.using("shard1").exists())
+        self.assertFalse(MessageContent.objects.using("shard1").exists())
+
+
+@override_settings(ROOT_URLCONF="chat.tests.async_urls")
+class AsyncShardedViewsTests(ShardedViewsTests):
+    """
+    Runs the sharding tests of the sync chat views against ``chat.async_views``.
+    """
+
+
+@override_settings(CHAT_SHARDS=SHARDS)
+class RebalanceShardsTests(TestCase):
+    databases = set(SHARDS)
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("create_roles", stdout=StringIO())
+        cls.user = create_user_on("shard2")
+        cls.staying_user = create_user_on("default", prefix="staying")
+
+    def create_conversation(self, user, using="default"):
+        # as placed before `shard2` was added
+        conversation = Conversation.objects.using(using).create(user=user, title="Moved")
+        version = Version.objects.create(conversation=conversation)
+        role = Role.objects.using(using).get(name="user")
+        messages = [Message.objects.create(version=version, content=f"Text {idx}", role=role) for idx in range(3)]
+        branch = Version.objects.create(conversation=conversation, parent_version=version, root_message=messages[2])
+        Message.objects.create(version=branch, content="Text 0", role=role)
+        conversation.active_version = branch
+        conversation.save()
+        return conversation
+
+    def test_moves_misplaced_conversations(self):
+        conversation = self.create_conversation(self.user)
+        staying = self.create_conversation(self.staying_user)
+        created_at = list(
+            Message.objects.using("default")
+            .filter(version__conversation=conversation)
+            .values_list("created_at", flat=True)
+        )
+
+        stdout = StringIO()
+        call_command("rebalance_shards", batch_size=1, stdout=stdout)
+        self.assertIn("Successfully moved 1 conversations, 2 versions and 4 messages", stdout.getvalue())
+
+        self.assertEqual(list(Conversation.objects.using("default")), [staying])
+        moved = Conversation.objects.using("shard2").get(pk=conversation.pk)
+        self.assertEqual(
+            (moved.title, moved.active_version_id, moved.message_count, moved.version_count),
+            ("Moved", conversation.active_version_id, 1, 2),
+        )
+        self.assertEqual(
+            list(
+                Message.objects.using("shard2").filter(version__conversation=moved).values_list("created_at", flat=True)
+            ),
+            created_at,
+        )
+        branch = Version.objects.using("shard2").get(pk=conversation.active_version_id)
+        self.assertEqual((branch.depth, branch.branch_index, branch.path), (1, 2, conversation.active_version.path))
+        self.assertEqual(
+            dict(MessageContent.objects.using("shard2").values_list("content", "ref_count")),
+            {"Text 0": 2, "Text 1": 1, "Text 2": 1},
+        )
+        # the contents still used by the staying conversation keep their references
+        self.assertEqual(
+            dict(MessageContent.objects.using("default").values_list("content", "ref_count")),
+            {"Text 0": 2, "Text 1": 1, "Text 2": 1},
+        )
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("get_conversation_active_path", kwargs={"pk": conversation.pk}))
+        self.assertEqual([m["content"] for m in response.data["messages"]], ["Text 0"])
+
+    def test_dry_run(self):
+        conversation = self.create_conversation(self.user)
+
+        stdout = StringIO()
+        call_command("rebalance_shards", dry_run=True, stdout=stdout)
+        self.assertIn(f"1 conversations of user {self.user.pk} would move from default to shard2", stdout.getvalue())
+        self.assertEqual(list(Conversation.objects.using("default")), [conversation])
+
+
+@override_settings(CHAT_SHARDS=SHARDS)
+class ShardedAdminTests(TestCase):
+    databases = set(SHARDS)
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("create_roles", stdout=StringIO())
+        cls.admin_user = CustomUser.objects.create_superuser("admin@email.com", "password")
+        now = timezone.now()
+        # modified in the order of their number, on alternating shards
+        cls.conversations = []
+        for idx in range(6):
+            using = SHARDS[idx % 3]
+            conversation = Conversation.objects.using(using).create(user=cls.admin_user, title=f"Conversation {idx}")
+            Conversation.objects.using(using).filter(pk=conversation.pk).update(
+                modified_at=now - timedelta(minutes=10 - idx)
+            )
+            cls.conversations.append(conversation)
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def listed_titles(self, **params):
+        response = self.client.get(reverse("admin:chat_conversation_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return [conversation.title for conversation in response.context["cl"].result_list]
+
+    def test_changelist_merges_the_shards(self):
+        self.assertEqual(self.listed_titles(), [f"Conversation {idx}" for idx in reversed(range(6))])
+
+        with patch.object(ConversationAdmin, "list_per_page", 4):
+            self.assertEqual(
+                self.listed_titles(), ["Conversation 5", "Conversation 4", "Conversation 3", "Conversation 2"]
+            )
+            self.assertEqual(self.listed_titles(p=2), ["Conversation 1", "Conversation 0"])
+
+    def test_change_page_and_actions_on_a_shard(self):
+        conversation = self.conversations[1]
+        url = reverse("admin:chat_conversation_change", args=[conversation.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        changelist_url = reverse("admin:chat_conversation_changelist")
+        self.client.post(
+            changelist_url, {"action": "soft_delete_selected", helpers.ACTION_CHECKBOX_NAME: [str(conversation.pk)]}
+        )
+        self.assertIsNotNone(Conversation.objects.using("shard1").get(pk=conversation.pk).deleted_at)
+
+        response = self.client.post(
+            changelist_url,
+            {
+                "action": "soft_delete_selected",
+                helpers.ACTION_CHECKBOX_NAME: [str(c.pk) for c in self.conversations[:2]],
+            },
+            follow=True,
+        )
+        self.assertContains(response, "select one shard at a time")
+        self.assertIsNone(Conversation.objects.using("default").get(pk=self.conversations[0].pk).deleted_at)
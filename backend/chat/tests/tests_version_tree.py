@@ -0,0 +1,171 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, Role, Version
+from chat.serializers import ConversationSerializer
+from chat.utils.version_tree import compute_version_tree, path_ids, subtree_path_bound, version_path
+
+
+class VersionTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name="user")
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password")
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(user=self.user)
+        self.v0 = Version.objects.create(conversation=self.conversation)
+        for idx in range(4):
+            Message.objects.create(version=self.v0, content=f"Message {idx}", role=self.role)
+        m2 = self.v0.messages.all()[2]
+
+        # v1 and v2 edit the third message of v0, v3 edits the first message of v1 and v4 the third message of v1
+        self.v1 = self.branch(self.v0, m2)
+        self.v2 = self.branch(self.v0, m2)
+        self.v3 = self.branch(self.v1, self.v1.messages.all()[0])
+        self.v4 = self.branch(self.v1, self.v1.messages.all()[2])
+        # an unrelated conversation with paths of the same shape
+        other = Conversation.objects.create(user=self.user)
+        Version.objects.create(conversation=other, parent_version=Version.objects.create(conversation=other))
+
+    def branch(self, parent, root_message):
+        version = Version.objects.create(
+            conversation=self.conversation, parent_version=parent, root_message=root_message
+        )
+        for message in parent.messages.filter(created_at__lt=root_message.created_at):
+            Message.objects.create(version=version, content=message.content, role=self.role)
+        Message.objects.create(version=version, content="Edit", role=self.role)
+        return version
+
+    def test_tree_fields_maintained_on_insert(self):
+        self.assertEqual((self.v0.depth, self.v0.path, self.v0.branch_index), (0, version_path(self.v0.id), 0))
+        self.assertIsNone(self.v0.prefix_version_id)
+
+        self.assertEqual(self.v4.depth, 2)
+        self.assertEqual(path_ids(self.v4.path), [self.v0.id, self.v1.id, self.v4.id])
+        self.assertEqual(self.v4.branch_index, 2)
+        # the second message of v1 was created by v0
+        self.assertEqual(self.v4.prefix_version_id, self.v0.id)
+        self.assertEqual((self.v3.branch_index, self.v3.prefix_version_id), (0, None))
+        self.assertEqual((self.v1.branch_index, self.v1.prefix_version_id), (2, self.v0.id))
+
+    def test_subtree(self):
+        with self.assertNumQueries(1):
+            subtree = set(Version.objects.subtree(self.v1))
+        self.assertEqual(subtree, {self.v1, self.v3, self.v4})
+        self.assertEqual(set(Version.objects.subtree(self.v1, include_self=False)), {self.v3, self.v4})
+        self.assertEqual(set(Version.objects.subtree(self.v0)), {self.v0, self.v1, self.v2, self.v3, self.v4})
+        self.assertGreater(subtree_path_bound(self.v1.path), self.v4.path)
+
+    def test_ancestors(self):
+        with self.assertNumQueries(1):
+            ancestors = list(Version.objects.ancestors(self.v4))
+        self.assertEqual(ancestors, [self.v0, self.v1])
+        self.assertEqual(list(Version.objects.ancestors(self.v4, include_self=True)), [self.v0, self.v1, self.v4])
+        self.assertEqual(list(Version.objects.ancestors(self.v0)), [])
+
+    def test_branches_at(self):
+        with self.assertNumQueries(1):
+            branches = set(Version.objects.branches_at(self.v4, 2))
+        self.assertEqual(branches, {self.v0, self.v1, self.v2, self.v4})
+        self.assertEqual(set(Version.objects.branches_at(self.v4, 0)), {self.v0, self.v3})
+        self.assertEqual(set(Version.objects.branches_at(self.v4, 1)), {self.v0})
+
+    def test_versions_are_listed_in_creation_order(self):
+        created = [self.v0, self.v1, self.v2, self.v3, self.v4]
+        created += [self.branch(self.v0, self.v0.messages.all()[1]) for _ in range(4)]
+
+        # whichever index the query uses, its random paths do not decide the order
+        self.assertEqual(list(self.conversation.versions.all()), created)
+        versions = ConversationSerializer(self.conversation).data["versions"]
+        self.assertEqual([version["id"] for version in versions], [str(version.pk) for version in created])
+
+    def test_paths_are_compared_bytewise(self):
+        field = Version._meta.get_field("path")
+        with mock.patch.object(connection, "vendor", "postgresql"):
+            self.assertEqual(field.db_parameters(connection)["collation"], "C")
+        # SQLite compares text bytewise by default
+        with mock.patch.object(connection, "vendor", "sqlite"):
+            self.assertIsNone(field.db_parameters(connection)["collation"])
+
+    def test_queries_use_the_tree_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("query plan inspection is SQLite specific")
+        for queryset, index in [
+            (Version.objects.subtree(self.v1), "chat_version_conv_path"),
+            (Version.objects.filter(prefix_version=self.v0, branch_index=2), "chat_version_prefix_branch"),
+        ]:
+            self.assertIn(index, queryset.explain())
+
+    def test_reparenting_rebuilds_the_subtree(self):
+        self.v1.parent_version = self.v2
+        self.v1.save()
+
+        self.v4.refresh_from_db()
+        self.assertEqual(path_ids(self.v4.path), [self.v0.id, self.v2.id, self.v1.id, self.v4.id])
+        self.assertEqual(self.v4.depth, 3)
+        self.assertEqual(self.v1.depth, 2)
+
+    def test_deleting_a_version_makes_its_children_roots(self):
+        self.v1.delete()
+
+        self.v4.refresh_from_db()
+        self.assertEqual((self.v4.depth, self.v4.path, self.v4.prefix_version_id), (0, version_path(self.v4.id), None))
+
+    def test_rebuild_matches_insert_time_fields(self):
+        versions = Version.objects.filter(conversation=self.conversation).order_by("pk")
+        fields = list(versions.values("depth", "path", "branch_index", "prefix_version"))
+        versions.update(depth=0, path="", branch_index=0, prefix_version=None)
+
+        self.assertEqual(Version.objects.rebuild_tree(self.conversation.id), 5)
+        self.assertEqual(list(versions.values("depth", "path", "branch_index", "prefix_version")), fields)
+
+    def test_compute_breaks_parent_cycles(self):
+        a, b = self.v0.id, self.v1.id
+        tree = compute_version_tree(
+            [{"id": a, "parent_version_id": b, "branch_index": 0}, {"id": b, "parent_version_id": a, "branch_index": 1}]
+        )
+        self.assertEqual(sorted(row["depth"] for row in tree.values()), [0, 1])
+
+
+class VersionTreeMigrationTests(TransactionTestCase):
+    migrate_from = [("chat", "0006_message_version_created_index")]
+    migrate_to = [("chat", "0007_version_tree")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_existing_versions_are_backfilled(self):
+        apps = self.migrate(self.migrate_from)
+        Role = apps.get_model("chat", "Role")
+        Conversation = apps.get_model("chat", "Conversation")
+        Version = apps.get_model("chat", "Version")
+        Message = apps.get_model("chat", "Message")
+        MessageContent = apps.get_model("chat", "MessageContent")
+        CustomUser = apps.get_model("authentication", "CustomUser")
+
+        role = Role.objects.create(name="user")
+        body = MessageContent.objects.create(hash="0" * 64, content="Same", ref_count=3)
+        conversation = Conversation.objects.create(user=CustomUser.objects.create(email="mock@email.com"))
+        root = Version.objects.create(conversation=conversation)
+        messages = [Message.objects.create(version=root, body=body, role=role) for _ in range(2)]
+        child = Version.objects.create(conversation=conversation, parent_version=root, root_message=messages[1])
+        Message.objects.create(version=child, body=body, role=role)
+
+        apps = self.migrate(self.migrate_to)
+        Version = apps.get_model("chat", "Version")
+
+        root, child = Version.objects.get(pk=root.pk), Version.objects.get(pk=child.pk)
+        self.assertEqual((root.depth, root.path), (0, version_path(root.pk)))
+        self.assertEqual((child.depth, child.path), (1, version_path(child.pk, root.path)))
+        self.assertEqual((child.branch_index, child.prefix_version_id), (1, root.pk))
@@ -1,22 +1,53 @@
+from django.conf import settings
 from django.urls import path
 
-from chat import views
+from chat import async_views, views
 
-urlpatterns = [
-    path("", views.chat_root_view, name="chat_root_view"),
-    path("conversations/", views.get_conversations, name="get_conversations"),
-    path("conversations_branched/", views.get_conversations_branched, name="get_branched_conversations"),
-    path("conversation_branched/<uuid:pk>/", views.get_conversation_branched, name="get_branched_conversation"),
-    path("conversations/add/", views.add_conversation, name="add_conversation"),
-    path("conversations/<uuid:pk>/", views.conversation_manage, name="conversation_manage"),
-    path("conversations/<uuid:pk>/change_title/", views.conversation_change_title, name="conversation_change_title"),
-    path("conversations/<uuid:pk>/add_message/", views.conversation_add_message, name="conversation_add_message"),
-    path("conversations/<uuid:pk>/add_version/", views.conversation_add_version, name="conversation_add_version"),
-    path(
-        "conversations/<uuid:pk>/switch_version/<uuid:version_id>/",
-        views.conversation_switch_version,
-        name="conversation_switch_version",
-    ),
-    path("conversations/<uuid:pk>/delete/", views.conversation_soft_delete, name="conversation_delete"),
-    path("versions/<uuid:pk>/add_message/", views.version_add_message, name="version_add_message"),
-]
+
+def build_urlpatterns(views_module) -> list:
+    """
+    Routes the chat endpoints to the views of the given module, either ``chat.views`` or ``chat.async_views``.
+    """
+    return [
+        path("", views_module.chat_root_view, name="chat_root_view"),
+        path("conversations/", views_module.get_conversations, name="get_conversations"),
+        path("conversations_branched/", views_module.get_conversations_branched, name="get_branched_conversations"),
+        path(
+            "conversation_branched/<uuid:pk>/",
+            views_module.get_conversation_branched,
+            name="get_branched_conversation",
+        ),
+        path(
+            "conversations/<uuid:pk>/active_path/",
+            views_module.get_conversation_active_path,
+            name="get_conversation_active_path",
+        ),
+        path("conversations/add/", views_module.add_conversation, name="add_conversation"),
+        path("conversations/export/", views_module.export_conversations, name="export_conversations"),
+        path("conversations/<uuid:pk>/", views_module.conversation_manage, name="conversation_manage"),
+        path(
+            "conversations/<uuid:pk>/change_title/",
+            views_module.conversation_change_title,
+            name="conversation_change_title",
+        ),
+        path(
+            "conversations/<uuid:pk>/add_message/",
+            views_module.conversation_add_message,
+            name="conversation_add_message",
+        ),
+        path(
+            "conversations/<uuid:pk>/add_version/",
+            views_module.conversation_add_version,
+            name="conversation_add_version",
+        ),
+        path(
+            "conversations/<uuid:pk>/switch_version/<uuid:version_id>/",
+            views_module.conversation_switch_version,
+            name="conversation_switch_version",
+        ),
+        path("conversations/<uuid:pk>/delete/", views_module.conversation_soft_delete, name="conversation_delete"),
+        path("versions/<uuid:pk>/add_message/", views_module.version_add_message, name="version_add_message"),
+    ]
+
+
+urlpatterns = build_urlpatterns(async_views if settings.CHAT_ASYNC_VIEWS else views)
@@ -0,0 +1,149 @@
+import uuid
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from chat.models import Message, Version
+from chat.serializers import PathMessageSerializer
+from chat.utils.version_tree import path_ids
+
+__all__ = ["find_sibling_versions", "make_active_path", "resolve_path_version", "sibling_versions_queryset"]
+
+
+def _count_messages(**filters) -> Subquery:
+    messages = Message.objects.filter(**filters).order_by().values("version").annotate(count=Count("pk"))
+    return Coalesce(Subquery(messages.values("count")), 0)
+
+
+def sibling_versions_queryset(version):
+    """
+    Describes the versions which can appear as siblings on the message path of a version, with one small row per
+    version and no message contents.
+
+    These are the version and its ancestors, the versions branched from the messages they created (found through the
+    ``(prefix_version, branch_index)`` index) and the versions branched at the first message. Besides the tree fields,
+    every row carries the ``message_count``, answered from the ``(version, created_at)`` index of the messages, and the
+    ``shown_at`` time the API shows for the version, that of its root message or else of its conversation.
+
+    Parameters
+    ----------
+    version : Version
+        The version whose path is rendered.
+    """
+    chain_ids = path_ids(version.path)
+    return (
+        Version.objects.next_to(version)
+        .filter(
+            Q(pk__in=chain_ids)
+            | Q(prefix_version__in=chain_ids)
+            | Q(conversation_id=version.conversation_id, prefix_version__isnull=True, branch_index=0)
+        )
+        .annotate(
+            message_count=_count_messages(version=OuterRef("pk")),
+            shown_at=Coalesce("root_message__created_at", "conversation__created_at"),
+        )
+        .values("id", "parent_version_id", "prefix_version_id", "branch_index", "message_count", "shown_at")
+    )
+
+
+def find_sibling_versions(version_rows: Iterable[dict], version) -> dict[int, tuple[list, int]]:
+    """
+    Finds the branch points along the message path of a version.
+
+    A version created by branching shares the first ``branch_index`` messages with its parent and has its own message
+    at ``branch_index``. At every position of the path, the alternatives are the versions which share the path's
+    messages before that position but own a different message at it: the ``prefix_version`` which created the message
+    before the position, and every version branched at the position with the same ``prefix_version``.
+
+    Parameters
+    ----------
+    version_rows : Iterable[dict]
+        The rows of ``sibling_versions_queryset``.
+    version : Version
+        The version whose path is rendered.
+
+    Returns
+    -------
+    dict[int, tuple[list, int]]
+        For every message position with alternatives, the ids of the sibling versions ordered by creation time and the
+        index of the one on the path.
+    """
+    versions = {row["id"]: row for row in version_rows}
+    chain = [versions[pk] for pk in reversed(path_ids(version.path)) if pk in versions]
+
+    def owner(position: int) -> Optional[object]:
+        # the version which created the message at `position` of the path
+        if position < 0:
+            return None
+        return next((row["id"] for row in chain if row["branch_index"] <= position), chain[-1]["id"])
+
+    branches = defaultdict(set)
+    for row in versions.values():
+        if row["message_count"] > row["branch_index"] and (row["prefix_version_id"] or row["branch_index"] == 0):
+            branches[(row["branch_index"], row["prefix_version_id"])].add(row["id"])
+
+    siblings = {}
+    for position in range(versions[version.pk]["message_count"]):
+        prefix_id = owner(position - 1)
+        alternatives = branches.get((position, prefix_id), set())
+        if prefix_id is not None:
+            alternatives = alternatives | {prefix_id}
+        current = owner(position)
+        alternatives = alternatives | {current}
+        if len(alternatives) < 2:
+            continue
+        ordered = sorted(alternatives, key=lambda pk: (versions[pk]["shown_at"], str(pk)))
+        siblings[position] = (ordered, ordered.index(current))
+    return siblings
+
+
+def resolve_path_version(conversation, requested_id: Optional[str] = None) -> Optional[Version]:
+    """
+    Returns the requested version, or the active version when none is requested.
+
+    Raises
+    ------
+    Version.DoesNotExist
+        If the requested version is not part of the conversation.
+    """
+    if requested_id is None:
+        return conversation.active_version
+    try:
+        version_id = uuid.UUID(str(requested_id))
+    except ValueError:
+        raise Version.DoesNotExist
+    return Version.objects.next_to(conversation).get(conversation=conversation, pk=version_id)
+
+
+def make_active_path(conversation, version, version_rows: list[dict], messages: list) -> dict:
+    """
+    Builds the response of the active path endpoint: the messages of one version, each with the ids of the sibling
+    versions branching at its position (empty where there is no branch) and the index of the path's own version.
+
+    Parameters
+    ----------
+    conversation : Conversation
+        The conversation the version belongs to.
+    version : Version | None
+        The rendered version, None for a conversation without versions.
+    version_rows : list[dict]
+        The rows of ``sibling_versions_queryset``.
+    messages : list[Message]
+        The messages of the version in order.
+    """
+    siblings = find_sibling_versions(version_rows, version) if version is not None else {}
+    messages_data = PathMessageSerializer(messages, many=True).data
+    for position, message_data in enumerate(messages_data):
+        sibling_version_ids, sibling_index = siblings.get(position, ([], None))
+        message_data["sibling_version_ids"] = sibling_version_ids
+        message_data["sibling_index"] = sibling_index
+
+    return {
+        "id": conversation.id,
+        "title": conversation.title,
+        "active_version": conversation.active_version_id,
+        "version_id": version.pk if version is not None else None,
+        "messages": messages_data,
+    }
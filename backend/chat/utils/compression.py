@@ -0,0 +1,67 @@
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, zlib is always available
+    zstandard = None
+
+__all__ = ["AVAILABLE_CODECS", "DEFAULT_CODEC", "compress_content", "decompress_content"]
+
+# the first byte of every compressed blob identifies the codec, so codecs can be mixed within one table
+_CODEC_HEADERS = {"zlib": b"\x01", "zstd": b"\x02"}
+
+AVAILABLE_CODECS = ["zlib", "zstd"] if zstandard is not None else ["zlib"]
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+
+def compress_content(content: str, codec: str = DEFAULT_CODEC, level: int = 9) -> bytes:
+    """
+    Compresses message content into a self-describing blob.
+
+    Parameters
+    ----------
+    content : str
+        The text to compress.
+    codec : str, optional
+        Either "zlib" or "zstd" (requires the optional ``zstandard`` package). Default is zstd when available.
+    level : int, optional
+        The compression level. Default is 9.
+
+    Returns
+    -------
+    bytes
+        The codec header followed by the compressed UTF-8 text.
+    """
+    data = content.encode()
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("The zstd codec requires the `zstandard` package")
+        return _CODEC_HEADERS["zstd"] + zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == "zlib":
+        return _CODEC_HEADERS["zlib"] + zlib.compress(data, level)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def decompress_content(blob) -> str:
+    """
+    Restores the text of a blob created by ``compress_content``.
+
+    Parameters
+    ----------
+    blob : bytes | memoryview
+        The stored blob, database drivers may return either type.
+
+    Returns
+    -------
+    str
+        The original text.
+    """
+    blob = bytes(blob)
+    header, data = blob[:1], blob[1:]
+    if header == _CODEC_HEADERS["zlib"]:
+        return zlib.decompress(data).decode()
+    if header == _CODEC_HEADERS["zstd"]:
+        if zstandard is None:
+            raise ValueError("Decompressing zstd content requires the `zstandard` package")
+        return zstandard.ZstdDecompressor().decompress(data).decode()
+    raise ValueError("Unknown compressed content header")
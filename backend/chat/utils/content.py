@@ -0,0 +1,39 @@
+import hashlib
+
+__all__ = ["PREVIEW_LENGTH", "content_hash", "message_preview"]
+
+PREVIEW_LENGTH = 100
+
+
+def content_hash(content: str) -> str:
+    """
+    Returns the key a message body is stored under in the content table.
+
+    Parameters
+    ----------
+    content : str
+        The message text.
+
+    Returns
+    -------
+    str
+        The hex encoded SHA-256 digest of the UTF-8 text.
+    """
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def message_preview(content: str) -> str:
+    """
+    Returns the preview of a message shown in conversation listings.
+
+    Parameters
+    ----------
+    content : str
+        The message text.
+
+    Returns
+    -------
+    str
+        The text on a single line, cut to ``PREVIEW_LENGTH`` characters.
+    """
+    return " ".join(content.split())[:PREVIEW_LENGTH]
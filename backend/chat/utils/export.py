@@ -0,0 +1,89 @@
+import zlib
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from chat.models import Conversation, Message, Version
+from chat.utils.compression import decompress_content
+
+__all__ = ["gzip_chunks", "iter_conversation_export"]
+
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+_encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+def iter_conversation_export(user, include_deleted: bool = False, chunk_size: int = 2000) -> Iterator[str]:
+    """
+    Streams a user's conversation history as NDJSON.
+
+    All conversations come first, followed by all versions and then all messages, each line carrying a ``type`` and
+    the id of its parent. Every table is read with a single ``.values().iterator()`` query, so memory use does not
+    depend on the size of the history. Lines are grouped into chunks of roughly ``EXPORT_BUFFER_SIZE`` characters.
+
+    Parameters
+    ----------
+    user : CustomUser
+        The owner of the exported conversations.
+    include_deleted : bool, optional
+        Whether soft-deleted conversations are exported too. Default is False.
+    chunk_size : int, optional
+        Number of rows fetched from the database at once. Default is 2000.
+    """
+    conversations = Conversation.objects.for_user(user).filter(user=user)
+    if not include_deleted:
+        conversations = conversations.filter(deleted_at__isnull=True)
+    conversation_ids = conversations.values("pk")
+
+    rows = (
+        (
+            "conversation",
+            conversations.order_by("created_at").values(
+                "id", "title", "created_at", "modified_at", "deleted_at", "active_version_id"
+            ),
+        ),
+        (
+            "version",
+            Version.objects.for_user(user)
+            .filter(conversation__in=conversation_ids)
+            .order_by("conversation_id")
+            .values("id", "conversation_id", "parent_version_id", "root_message_id"),
+        ),
+        (
+            "message",
+            Message.objects.for_user(user)
+            .filter(version__conversation__in=conversation_ids)
+            .order_by("version_id", "created_at")
+            .values("id", "version_id", "role__name", "body__content", "body__compressed_content", "created_at"),
+        ),
+    )
+
+    buffer, buffered = [], 0
+    for row_type, queryset in rows:
+        for row in queryset.iterator(chunk_size=chunk_size):
+            if row_type == "message":
+                row["role"] = row.pop("role__name")
+                content, compressed_content = row.pop("body__content"), row.pop("body__compressed_content")
+                if compressed_content is not None:
+                    content = decompress_content(compressed_content)
+                row["content"] = content
+            line = _encoder.encode({"type": row_type, **row}) + "\n"
+            buffer.append(line)
+            buffered += len(line)
+            if buffered >= EXPORT_BUFFER_SIZE:
+                yield "".join(buffer)
+                buffer, buffered = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip-compresses a stream of text chunks on the fly.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
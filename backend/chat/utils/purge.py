@@ -0,0 +1,65 @@
+from django.db import connections, transaction
+
+from chat.models import Conversation, Message, MessageContent, Version
+
+__all__ = ["purge_conversations"]
+
+# values per `IN (...)` list, below the parameter limits of every backend
+DELETE_BATCH_SIZE = 500
+
+
+def _delete_rows(model, field_name: str, values: list, using: str) -> int:
+    # a plain `DELETE ... WHERE <column> IN (...)`, without the collector and signals of `QuerySet.delete()`
+    connection = connections[using]
+    field = model._meta.get_field(field_name)
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(field.column)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), DELETE_BATCH_SIZE):
+            end = start + DELETE_BATCH_SIZE
+            batch = [field.get_db_prep_value(value, connection) for value in values[start:end]]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(batch))})", batch)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def purge_conversations(conversation_ids: list, using: str = "default") -> dict[str, int]:
+    """
+    Hard-deletes the given conversations together with their versions and messages in one short transaction.
+
+    Rows are removed with plain ``DELETE ... WHERE ... IN (...)`` statements per table instead of going through the
+    ORM's cascade collector, which would load every related row into memory and send ``pre_delete``/``post_delete``
+    signals for each of them. The references of the deleted messages on their contents are released in bulk as well.
+
+    Parameters
+    ----------
+    conversation_ids : list
+        Primary keys of the conversations to delete.
+    using : str, optional
+        The database alias to delete from. Default is "default".
+
+    Returns
+    -------
+    dict[str, int]
+        The number of deleted rows per model.
+    """
+    with transaction.atomic(using=using):
+        conversations = Conversation.objects.using(using).filter(pk__in=conversation_ids)
+        versions = Version.objects.using(using).filter(conversation_id__in=conversation_ids)
+        messages = Message.objects.using(using).filter(version__conversation_id__in=conversation_ids)
+
+        # break the references between the three tables first, so that the deletes never hit a foreign key constraint
+        conversations.update(active_version=None)
+        versions.update(parent_version=None, root_message=None, prefix_version=None)
+
+        version_ids = list(versions.values_list("pk", flat=True))
+        body_ids = list(messages.values_list("body_id", flat=True))
+        conversation_ids = list(conversations.values_list("pk", flat=True))
+        deleted = {
+            "messages": _delete_rows(Message, "version", version_ids, using),
+            "versions": _delete_rows(Version, "id", version_ids, using),
+            "conversations": _delete_rows(Conversation, "id", conversation_ids, using),
+        }
+        MessageContent.objects.db_manager(using).release(body_ids)
+        return deleted
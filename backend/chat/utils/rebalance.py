@@ -0,0 +1,65 @@
+from django.db import transaction
+
+from chat.models import Conversation, Message, MessageContent, Role, Version
+from chat.utils.purge import purge_conversations
+
+__all__ = ["move_conversations"]
+
+
+def _copy(queryset, objs: list, timestamp_fields: list[str]) -> None:
+    # `bulk_create` stamps the `auto_now`/`auto_now_add` fields with the current time, the copies keep the original ones
+    timestamps = [[getattr(obj, name) for name in timestamp_fields] for obj in objs]
+    queryset.bulk_create(objs, batch_size=500)
+    for obj, values in zip(objs, timestamps):
+        for name, value in zip(timestamp_fields, values):
+            setattr(obj, name, value)
+    queryset.model._base_manager.using(queryset.db).bulk_update(objs, timestamp_fields, batch_size=500)
+
+
+def move_conversations(conversation_ids: list, source: str, target: str) -> dict[str, int]:
+    """
+    Moves conversations with their versions and messages from one shard to another.
+
+    The rows are copied in one transaction on the target, which takes a reference on the contents of the copied
+    messages (inserting the contents it lacks), and then purged from the source in one transaction there. Conversations
+    already present on the target, left behind by an interrupted move, are only purged from the source.
+
+    Parameters
+    ----------
+    conversation_ids : list
+        Primary keys of the conversations to move.
+    source : str
+        The database alias the conversations are on.
+    target : str
+        The database alias they are moved to.
+
+    Returns
+    -------
+    dict[str, int]
+        The number of copied rows per model.
+    """
+    copied_ids = set(Conversation.objects.using(target).filter(pk__in=conversation_ids).values_list("pk", flat=True))
+    missing_ids = [pk for pk in conversation_ids if pk not in copied_ids]
+
+    conversations = list(Conversation.objects.using(source).filter(pk__in=missing_ids))
+    versions = list(Version.objects.using(source).filter(conversation_id__in=missing_ids))
+    messages = list(Message.objects.using(source).filter(version__conversation_id__in=missing_ids))
+    with transaction.atomic(using=target):
+        Role.objects.using(target).bulk_create(list(Role.objects.using(source)), ignore_conflicts=True)
+        # contents shared with messages already on the target are kept, the copied messages take their references
+        MessageContent.objects.using(target).bulk_create(
+            [
+                MessageContent(hash=body.hash, content=body.content, compressed_content=body.compressed_content)
+                for body in {message.body_id: message.body for message in messages}.values()
+            ],
+            ignore_conflicts=True,
+        )
+        # the references between the three tables are only checked on commit
+        _copy(Conversation.objects.using(target), conversations, ["created_at", "modified_at"])
+        Version.objects.using(target).bulk_create(versions, batch_size=500)
+        _copy(Message.objects.using(target), messages, ["created_at"])
+        # the last message is told by the restored creation times
+        Conversation.objects.using(target).filter(pk__in=missing_ids).recount()
+
+    purge_conversations(conversation_ids, using=source)
+    return {"conversations": len(conversations), "versions": len(versions), "messages": len(messages)}
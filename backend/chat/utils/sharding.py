@@ -0,0 +1,210 @@
+import functools
+import hashlib
+from typing import Optional
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, models, router
+from django.db.models.expressions import F, OrderBy
+from django.utils.functional import cached_property
+
+__all__ = [
+    "ShardRouter",
+    "ShardedPaginator",
+    "ShardedQuerySet",
+    "instance_shard",
+    "jump_hash",
+    "merge_shards",
+    "shard_for_user",
+    "shard_querysets",
+]
+
+# the relation of a sharded model leading towards the conversation, whose user decides the shard
+_PARENT_FIELDS = {"version": "conversation", "message": "version"}
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash of Lamping and Veach.
+
+    Growing from ``n`` to ``n + 1`` buckets moves only ``1 / (n + 1)`` of the keys, all of them into the new bucket,
+    so adding a shard relocates the least possible data.
+
+    Parameters
+    ----------
+    key : int
+        A 64 bit key.
+    buckets : int
+        The number of buckets.
+
+    Returns
+    -------
+    int
+        The bucket of the key, in ``range(buckets)``.
+    """
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_user(user_id) -> str:
+    """
+    Returns the database alias of the shard holding the conversations of a user.
+    """
+    shards = settings.CHAT_SHARDS
+    if len(shards) == 1:
+        return shards[0]
+    key = int.from_bytes(hashlib.blake2b(str(user_id).encode(), digest_size=8).digest(), "big")
+    return shards[jump_hash(key, len(shards))]
+
+
+def instance_shard(instance) -> Optional[str]:
+    """
+    Returns the shard of an object of the chat data, None if it cannot be told.
+
+    Stored objects live on the database they were loaded from (the primary for objects read from a replica), new ones
+    on the shard of the user of their conversation, found through their cached relations, or else on the database they
+    are being saved to.
+    """
+    if instance._meta.label == settings.AUTH_USER_MODEL:
+        return shard_for_user(instance.pk)
+    database = DEFAULT_DB_ALIAS if instance._state.db in settings.DATABASE_REPLICAS else instance._state.db
+    if not instance._state.adding:
+        return database
+    model_name = instance._meta.model_name
+    if model_name == "conversation" and instance.user_id is not None:
+        return shard_for_user(instance.user_id)
+    if model_name in _PARENT_FIELDS:
+        parent = instance._meta.get_field(_PARENT_FIELDS[model_name]).get_cached_value(instance, None)
+        if parent is not None:
+            return instance_shard(parent)
+    # e.g. set by `save()`, not by assigning a role which tells nothing about the shard
+    return database if model_name in ("conversation", *_PARENT_FIELDS) else None
+
+
+def shard_querysets(queryset: models.QuerySet) -> list[models.QuerySet]:
+    """
+    Returns the queryset on every shard.
+    """
+    return [queryset.using(alias) for alias in settings.CHAT_SHARDS]
+
+
+class ShardRouter:
+    """
+    Routes the chat models to the shard of their user, given by a ``shard`` hint (see ``ShardedQuerySet.for_user``)
+    or by the ``instance`` hint of related lookups and saves.
+
+    The default database is left to the routers after this one, so that reads of it may still go to a replica. Roles are
+    looked up on the default database, ``create_roles`` copies them to every shard with the same ids.
+    """
+
+    def _shard(self, model, hints) -> Optional[str]:
+        if model._meta.app_label != "chat":
+            return None
+        shard = hints.get("shard")
+        if shard is None and hints.get("instance") is not None:
+            shard = instance_shard(hints["instance"])
+        return None if shard == DEFAULT_DB_ALIAS else shard
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # e.g. a message on a shard and its role read from the default database, which exists on every shard
+        if "chat" in (obj1._meta.app_label, obj2._meta.app_label):
+            return True
+        return None
+
+
+class ShardedQuerySet(models.QuerySet):
+    def for_user(self, user) -> "ShardedQuerySet":
+        """
+        Routes the queryset to the shard holding the chat data of a user.
+        """
+        return self._with_hints(shard=shard_for_user(user.pk))
+
+    def next_to(self, instance) -> "ShardedQuerySet":
+        """
+        Routes the queryset to the shard of an object of the chat data.
+        """
+        return self._with_hints(instance=instance)
+
+    def create(self, **kwargs):
+        # unless routed explicitly, the object goes to the shard of the objects it relates to
+        if self._db is not None or self._hints:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=router.db_for_write(self.model, instance=obj))
+        return obj
+
+    def _with_hints(self, **hints) -> "ShardedQuerySet":
+        clone = self._chain()
+        clone._hints = {**self._hints, **hints}
+        return clone
+
+
+def _ordering_key(model, ordering: list):
+    fields = []
+    for item in ordering:
+        if isinstance(item, OrderBy) and isinstance(item.expression, F):
+            name, descending = item.expression.name, item.descending
+        elif isinstance(item, str) and item != "?":
+            name, descending = item.lstrip("-"), item.startswith("-")
+        else:
+            continue
+        if name == "pk" or "__" not in name:
+            name = model._meta.pk.attname if name == "pk" else model._meta.get_field(name).attname
+        fields.append((name, descending))
+
+    def value(obj, name):
+        for part in name.split("__"):
+            obj = getattr(obj, part) if obj is not None else None
+        return obj
+
+    def compare(obj1, obj2) -> int:
+        for name, descending in fields:
+            value1, value2 = value(obj1, name), value(obj2, name)
+            if value1 == value2:
+                continue
+            # nulls first in ascending order, as SQLite sorts them
+            less = value2 is not None and (value1 is None or value1 < value2)
+            return (1 if less else -1) if descending else (-1 if less else 1)
+        return 0
+
+    return functools.cmp_to_key(compare)
+
+
+def merge_shards(queryset: models.QuerySet, limit: int) -> list:
+    """
+    Returns the first ``limit`` objects of the queryset across all shards, merged by the queryset's ordering.
+
+    Every shard is asked for its first ``limit`` objects, so the cost grows with the position in the list.
+    """
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering or ["pk"])
+    rows = [obj for shard_queryset in shard_querysets(queryset) for obj in shard_queryset[:limit]]
+    return sorted(rows, key=_ordering_key(queryset.model, ordering))[:limit]
+
+
+class ShardedPaginator(Paginator):
+    """
+    Pages through a queryset on all shards as one list, e.g. for the admin change lists.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        return sum(shard_queryset.count() for shard_queryset in shard_querysets(self.object_list))
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        return self._get_page(merge_shards(self.object_list, top)[bottom:top], number, self)
@@ -0,0 +1,115 @@
+import uuid
+from collections import defaultdict
+from typing import Iterable, Optional
+
+__all__ = ["compute_version_tree", "find_prefix_version", "path_ids", "subtree_path_bound", "version_path"]
+
+PATH_SEPARATOR = "/"
+
+
+def version_path(version_id: uuid.UUID, parent_path: str = "") -> str:
+    """
+    Returns the materialized path of a version: the hex ids of its ancestors and itself, each followed by a slash.
+    """
+    return f"{parent_path}{version_id.hex}{PATH_SEPARATOR}"
+
+
+def path_ids(path: str) -> list[uuid.UUID]:
+    """
+    Returns the ids of the versions on a materialized path, from the root down to the version itself.
+    """
+    return [uuid.UUID(part) for part in path.split(PATH_SEPARATOR) if part]
+
+
+def subtree_path_bound(path: str) -> str:
+    """
+    Returns the exclusive upper bound of the paths in the subtree of ``path``.
+
+    Every path in the subtree starts with ``path``, which ends with a slash. Replacing that slash with the next
+    character (``0``) gives the smallest string sorting after all of them, so the subtree is one index range scan.
+    This holds for bytewise comparisons only, the paths are stored in a ``BytewiseTextField``.
+    """
+    return path[:-1] + chr(ord(PATH_SEPARATOR) + 1)
+
+
+def find_prefix_version(chain: Iterable[tuple], branch_index: int) -> Optional[uuid.UUID]:
+    """
+    Returns the version which created the messages before ``branch_index`` on a path.
+
+    Parameters
+    ----------
+    chain : Iterable[tuple]
+        ``(id, branch_index)`` of the version the branch is taken from and its ancestors, deepest first.
+    branch_index : int
+        The position of the branch.
+
+    Returns
+    -------
+    uuid.UUID | None
+        The deepest version on the chain which created its own message at ``branch_index - 1``, None when branching
+        at the first message.
+    """
+    if branch_index == 0:
+        return None
+    for version_id, version_branch_index in chain:
+        if version_branch_index <= branch_index - 1:
+            return version_id
+    return None
+
+
+def compute_version_tree(rows: Iterable[dict]) -> dict[uuid.UUID, dict]:
+    """
+    Computes the tree fields of all versions of a conversation.
+
+    Parameters
+    ----------
+    rows : Iterable[dict]
+        ``id``, ``parent_version_id`` and ``branch_index`` of every version. Versions whose parent is missing, or which
+        are part of a parent cycle, are treated as roots.
+
+    Returns
+    -------
+    dict[uuid.UUID, dict]
+        ``depth``, ``path``, ``branch_index`` and ``prefix_version_id`` per version id.
+    """
+    rows = {row["id"]: row for row in rows}
+    children = defaultdict(list)
+    for row in rows.values():
+        if row["parent_version_id"] in rows:
+            children[row["parent_version_id"]].append(row["id"])
+
+    tree = {}
+
+    def visit(root_id):
+        stack = [(root_id, None)]
+        while stack:
+            version_id, parent_id = stack.pop()
+            if version_id in tree:
+                continue
+            row = rows[version_id]
+            if parent_id is None:
+                tree[version_id] = {
+                    "depth": 0,
+                    "path": version_path(version_id),
+                    "branch_index": 0,
+                    "prefix_version_id": None,
+                }
+            else:
+                parent = tree[parent_id]
+                chain = [(pk, tree[pk]["branch_index"]) for pk in reversed(path_ids(parent["path"]))]
+                tree[version_id] = {
+                    "depth": parent["depth"] + 1,
+                    "path": version_path(version_id, parent["path"]),
+                    "branch_index": row["branch_index"],
+                    "prefix_version_id": find_prefix_version(chain, row["branch_index"]),
+                }
+            stack.extend((child_id, version_id) for child_id in children[version_id])
+
+    for version_id, row in rows.items():
+        if row["parent_version_id"] not in rows:
+            visit(version_id)
+    # whatever is left is part of a cycle, cut it at an arbitrary version
+    for version_id in rows:
+        if version_id not in tree:
+            visit(version_id)
+    return tree
@@ -1,4 +1,5 @@
 from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view
@@ -6,7 +7,13 @@ from rest_framework.response import Response
 
 from chat.models import Conversation, Message, Version
 from chat.serializers import ConversationSerializer, MessageSerializer, TitleSerializer, VersionSerializer
+from chat.tasks import purge_conversation
+from chat.utils.active_path import make_active_path, resolve_path_version, sibling_versions_queryset
 from chat.utils.branching import make_branched_conversation
+from chat.utils.export import gzip_chunks, iter_conversation_export
+from chat.utils.read_serializers import serialize_conversations
+from src.utils.replicas import replica_reads
+from src.utils.streaming import adapt_streaming_content
 
 
 @api_view(["GET"])
@@ -14,20 +21,28 @@ def chat_root_view(request):
     return Response({"message": "Chat works!"}, status=status.HTTP_200_OK)
 
 
+@replica_reads
 @login_required
 @api_view(["GET"])
 def get_conversations(request):
-    conversations = Conversation.objects.filter(user=request.user, deleted_at__isnull=True).order_by("-modified_at")
-    serializer = ConversationSerializer(conversations, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    conversations = (
+        Conversation.objects.for_user(request.user)
+        .filter(user=request.user, deleted_at__isnull=True)
+        .order_by("-modified_at")
+    )
+    return Response(serialize_conversations(conversations), status=status.HTTP_200_OK)
 
 
+@replica_reads
 @login_required
 @api_view(["GET"])
 def get_conversations_branched(request):
-    conversations = Conversation.objects.filter(user=request.user, deleted_at__isnull=True).order_by("-modified_at")
-    conversations_serializer = ConversationSerializer(conversations, many=True)
-    conversations_data = conversations_serializer.data
+    conversations = (
+        Conversation.objects.for_user(request.user)
+        .filter(user=request.user, deleted_at__isnull=True)
+        .order_by("-modified_at")
+    )
+    conversations_data = serialize_conversations(conversations)
 
     for conversation_data in conversations_data:
         make_branched_conversation(conversation_data)
@@ -35,28 +50,67 @@ def get_conversations_branched(request):
     return Response(conversations_data, status=status.HTTP_200_OK)
 
 
+@replica_reads
 @login_required
 @api_view(["GET"])
 def get_conversation_branched(request, pk):
-    try:
-        conversation = Conversation.objects.get(user=request.user, pk=pk)
-    except Conversation.DoesNotExist:
+    conversations_data = serialize_conversations(
+        Conversation.objects.for_user(request.user).filter(user=request.user, pk=pk, deleted_at__isnull=True)
+    )
+    if not conversations_data:
         return Response({"detail": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    conversation_serializer = ConversationSerializer(conversation)
-    conversation_data = conversation_serializer.data
+    conversation_data = conversations_data[0]
     make_branched_conversation(conversation_data)
 
     return Response(conversation_data, status=status.HTTP_200_OK)
 
 
+@replica_reads
+@login_required
+@api_view(["GET"])
+def get_conversation_active_path(request, pk):
+    try:
+        conversation = Conversation.objects.for_user(request.user).get(
+            user=request.user, pk=pk, deleted_at__isnull=True
+        )
+    except Conversation.DoesNotExist:
+        return Response({"detail": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        version = resolve_path_version(conversation, request.query_params.get("version_id"))
+    except Version.DoesNotExist:
+        return Response({"detail": "Version not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    version_rows = list(sibling_versions_queryset(version)) if version is not None else []
+    messages = list(Message.objects.for_user(request.user).filter(version=version).select_related("role"))
+    return Response(make_active_path(conversation, version, version_rows, messages), status=status.HTTP_200_OK)
+
+
+@login_required
+@api_view(["GET"])
+def export_conversations(request):
+    include_deleted = request.query_params.get("include_deleted") == "true"
+    chunks = iter_conversation_export(request.user, include_deleted=include_deleted)
+    filename = "conversations.ndjson"
+    content_type = "application/x-ndjson"
+    if request.query_params.get("gzip") == "true":
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        content_type = "application/gzip"
+
+    response = StreamingHttpResponse(adapt_streaming_content(request, chunks), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 @api_view(["POST"])
 def add_conversation(request):
     try:
         conversation_data = {"title": request.data.get("title", "Mock title"), "user": request.user}
-        conversation = Conversation.objects.create(**conversation_data)
-        version = Version.objects.create(conversation=conversation)
+        conversation = Conversation.objects.for_user(request.user).create(**conversation_data)
+        version = Version.objects.for_user(request.user).create(conversation=conversation)
 
         messages_data = request.data.get("messages", [])
         for idx, message_data in enumerate(messages_data):
@@ -77,19 +131,25 @@ def add_conversation(request):
         return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@replica_reads
 @login_required
 @api_view(["GET", "PUT", "DELETE"])
 def conversation_manage(request, pk):
+    conversations = Conversation.objects.for_user(request.user).filter(
+        user=request.user, pk=pk, deleted_at__isnull=True
+    )
+    if request.method == "GET":
+        conversations_data = serialize_conversations(conversations)
+        if not conversations_data:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(conversations_data[0])
+
     try:
-        conversation = Conversation.objects.get(user=request.user, pk=pk)
+        conversation = conversations.get()
     except Conversation.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == "GET":
-        serializer = ConversationSerializer(conversation)
-        return Response(serializer.data)
-
-    elif request.method == "PUT":
+    if request.method == "PUT":
         serializer = ConversationSerializer(conversation, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -97,7 +157,10 @@ def conversation_manage(request, pk):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == "DELETE":
-        conversation.delete()
+        # hidden at once, the versions and messages are deleted in the background
+        conversation.deleted_at = timezone.now()
+        conversation.save(update_fields=["deleted_at"])
+        purge_conversation.enqueue(conversation.pk, request.user.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -105,7 +168,7 @@ def conversation_manage(request, pk):
 @api_view(["PUT"])
 def conversation_change_title(request, pk):
     try:
-        conversation = Conversation.objects.get(user=request.user, pk=pk)
+        conversation = Conversation.objects.for_user(request.user).get(user=request.user, pk=pk)
     except Conversation.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
@@ -123,7 +186,7 @@ def conversation_change_title(request, pk):
 @api_view(["PUT"])
 def conversation_soft_delete(request, pk):
     try:
-        conversation = Conversation.objects.get(user=request.user, pk=pk)
+        conversation = Conversation.objects.for_user(request.user).get(user=request.user, pk=pk)
     except Conversation.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
@@ -136,7 +199,7 @@ def conversation_soft_delete(request, pk):
 @api_view(["POST"])
 def conversation_add_message(request, pk):
     try:
-        conversation = Conversation.objects.get(user=request.user, pk=pk)
+        conversation = Conversation.objects.for_user(request.user).get(user=request.user, pk=pk)
         version = conversation.active_version
     except Conversation.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
@@ -162,10 +225,10 @@ def conversation_add_message(request, pk):
 @api_view(["POST"])
 def conversation_add_version(request, pk):
     try:
-        conversation = Conversation.objects.get(user=request.user, pk=pk)
+        conversation = Conversation.objects.for_user(request.user).get(user=request.user, pk=pk)
         version = conversation.active_version
         root_message_id = request.data.get("root_message_id")
-        root_message = Message.objects.get(pk=root_message_id)
+        root_message = Message.objects.for_user(request.user).get(pk=root_message_id)
     except Conversation.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
     except Message.DoesNotExist:
@@ -175,16 +238,20 @@ def conversation_add_version(request, pk):
     if root_message.version.conversation != conversation:
         return Response({"detail": "Root message not part of the conversation"}, status=status.HTTP_400_BAD_REQUEST)
 
-    new_version = Version.objects.create(
+    new_version = Version.objects.for_user(request.user).create(
         conversation=conversation, parent_version=root_message.version, root_message=root_message
     )
 
     # Copy messages before root_message to new_version
-    messages_before_root = Message.objects.filter(version=version, created_at__lt=root_message.created_at)
+    messages_before_root = Message.objects.for_user(request.user).filter(
+        version=version, created_at__lt=root_message.created_at
+    )
+    # the copies share the stored contents of the originals, no text is read or written
     new_messages = [
-        Message(content=message.content, role=message.role, version=new_version) for message in messages_before_root
+        Message(body_id=body_id, role_id=role_id, version=new_version)
+        for body_id, role_id in messages_before_root.values_list("body_id", "role_id")
     ]
-    Message.objects.bulk_create(new_messages)
+    Message.objects.for_user(request.user).bulk_create(new_messages)
 
     # Set the new version as the current version
     conversation.active_version = new_version
@@ -198,8 +265,8 @@ def conversation_add_version(request, pk):
 @api_view(["PUT"])
 def conversation_switch_version(request, pk, version_id):
     try:
-        conversation = Conversation.objects.get(pk=pk)
-        version = Version.objects.get(pk=version_id, conversation=conversation)
+        conversation = Conversation.objects.for_user(request.user).get(pk=pk)
+        version = Version.objects.for_user(request.user).get(pk=version_id, conversation=conversation)
     except Conversation.DoesNotExist:
         return Response({"detail": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND)
     except Version.DoesNotExist:
@@ -215,7 +282,7 @@ def conversation_switch_version(request, pk, version_id):
 @api_view(["POST"])
 def version_add_message(request, pk):
     try:
-        version = Version.objects.get(pk=pk)
+        version = Version.objects.for_user(request.user).get(pk=pk)
     except Version.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.2 on 2026-10-19 10:17
+
+import uuid
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Generation",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("conversation_id", models.UUIDField()),
+                ("version_id", models.UUIDField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("running", "Running"), ("done", "Done"), ("failed", "Failed")],
+                        default="running",
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="GenerationChunk",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("seq", models.PositiveIntegerField()),
+                ("text", models.TextField()),
+                (
+                    "generation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="chunks", to="gpt.generation"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="generation",
+            index=models.Index(
+                fields=["user", "conversation_id", "version_id", "created_at"], name="gpt_generation_key_created"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="generation",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "running")),
+                fields=("user", "conversation_id", "version_id"),
+                name="gpt_generation_one_running",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="generationchunk",
+            constraint=models.UniqueConstraint(fields=("generation", "seq"), name="gpt_generationchunk_seq"),
+        ),
+    ]
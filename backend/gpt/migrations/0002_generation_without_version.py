@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("gpt", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="generation",
+            name="conversation_id",
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="generation",
+            name="version_id",
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("gpt", "0002_generation_without_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="generation",
+            name="gpt_generation_one_running",
+        ),
+        migrations.RemoveIndex(
+            model_name="generation",
+            name="gpt_generation_key_created",
+        ),
+        migrations.AddField(
+            model_name="generation",
+            name="prompt_digest",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name="generation",
+            index=models.Index(
+                fields=["user", "conversation_id", "version_id", "prompt_digest", "created_at"],
+                name="gpt_generation_key_created",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="generation",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "running")),
+                fields=("user", "conversation_id", "version_id", "prompt_digest"),
+                name="gpt_generation_one_running",
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+import uuid
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from authentication.models import CustomUser
+
+
+class Generation(models.Model):
+    """
+    An answer generated for a conversation version, published chunk by chunk so that other requests, in any worker
+    process, can follow it.
+
+    Answers streamed as Server-Sent Events are published without a version as well, so that their clients can resume
+    them from any worker process.
+    """
+
+    class Status(models.TextChoices):
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # null for answers which are not shared, the unique constraint never matches them
+    conversation_id = models.UUIDField(null=True, blank=True)
+    version_id = models.UUIDField(null=True, blank=True)
+    # requests for the same version share a generation only when they send the same model and messages
+    prompt_digest = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # refreshed whenever chunks are published, a running generation which stops refreshing lost its worker
+    updated_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "conversation_id", "version_id", "prompt_digest"],
+                condition=Q(status="running"),
+                name="gpt_generation_one_running",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "conversation_id", "version_id", "prompt_digest", "created_at"],
+                name="gpt_generation_key_created",
+            )
+        ]
+
+    def __str__(self):
+        return f"Generation for version `{self.version_id}` ({self.status})"
+
+
+class GenerationChunk(models.Model):
+    generation = models.ForeignKey(Generation, related_name="chunks", on_delete=models.CASCADE)
+    seq = models.PositiveIntegerField()
+    text = models.TextField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["generation", "seq"], name="gpt_generationchunk_seq")]
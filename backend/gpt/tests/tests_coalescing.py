@@ -0,0 +1,85 @@
+import json
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from src.utils.streaming import coalesce_chunks
+
+
+def completion(*chunks):
+    return [{"choices": [{"delta": {"content": chunk}}]} for chunk in chunks]
+
+
+class CoalesceChunksTests(APITestCase):
+    def test_flushes_once_max_bytes_are_buffered(self):
+        chunks = coalesce_chunks(["ab", "c", "de", "f"], max_bytes=3, max_delay=60)
+        self.assertEqual(list(chunks), ["abc", "def"])
+
+    def test_size_is_counted_in_utf8_bytes(self):
+        chunks = coalesce_chunks(["é", "é", "a"], max_bytes=4, max_delay=60)
+        self.assertEqual(list(chunks), ["éé", "a"])
+
+    def test_flushes_on_sentence_boundary(self):
+        chunks = ["Hel", "lo", ". ", "How", " are", " you", "?", " Fine"]
+        self.assertEqual(
+            list(coalesce_chunks(chunks, max_bytes=100, max_delay=60, flush_on_sentence=True)),
+            ["Hello. ", "How are you?", " Fine"],
+        )
+        self.assertEqual(list(coalesce_chunks(chunks, max_bytes=100, max_delay=60)), ["Hello. How are you? Fine"])
+
+    @mock.patch("src.utils.streaming.time.monotonic", side_effect=[0.0, 0.01, 0.05, 0.2, 1.0, 1.01])
+    def test_flushes_after_max_delay(self, monotonic):
+        chunks = coalesce_chunks(["a", "b", "c", "d"], max_bytes=100, max_delay=0.1)
+        self.assertEqual(list(chunks), ["abc", "d"])
+
+    def test_disabled_passes_chunks_through(self):
+        self.assertEqual(list(coalesce_chunks(["a", "b"], max_bytes=0, max_delay=0)), ["a", "b"])
+
+    def test_upstream_closed_when_consumer_stops_early(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield from ["a", "b", "c"]
+            finally:
+                closed.append(True)
+
+        coalesced = coalesce_chunks(chunks(), max_bytes=1, max_delay=60)
+        self.assertEqual(next(coalesced), "a")
+        coalesced.close()
+        self.assertEqual(closed, [True])
+
+
+@override_settings(
+    GPT_STREAM_COALESCING={
+        "DEFAULT": {"MAX_BYTES": 1024, "MAX_DELAY": 60, "FLUSH_ON_SENTENCE": False},
+        "ENDPOINTS": {"gpt_question": {"MAX_BYTES": 0}},
+    }
+)
+@mock.patch("src.utils.gpt.openai.ChatCompletion.create")
+class CoalescedEndpointTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def chunks(self, name, data):
+        response = self.client.post(reverse(name), data=json.dumps(data), content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return list(response.streaming_content)
+
+    def test_default_policy(self, create):
+        create.return_value = completion("Hi", " there", "!")
+        data = {"conversation": [{"role": "user", "content": "Hello"}], "model": "gpt35"}
+        self.assertEqual(self.chunks("gpt_conversation", data), [b"Hi there!"])
+
+    @override_settings(GPT_RESPONSE_CACHE={"ENABLED": False, "TTL": 60, "MAX_BYTES": 1024})
+    def test_endpoint_override(self, create):
+        create.return_value = completion("Hi", " there", "!")
+        self.assertEqual(self.chunks("gpt_question", {"user_question": "Hello"}), [b"Hi", b" there", b"!"])
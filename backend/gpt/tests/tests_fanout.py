@@ -0,0 +1,164 @@
+import json
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from gpt.models import Generation, GenerationChunk
+from gpt.tests.tests_sse import NO_COALESCING, parse_events
+from gpt.utils.fanout import afollow_generation, follow_generation, prompt_digest, publish_generation, start_generation
+from src.utils.scheduler import StreamScheduler
+
+FANOUT = {"POLL_INTERVAL": 0.01, "FLUSH_INTERVAL": 0, "STALE_AFTER": 60, "RETENTION": 300}
+
+
+def completion(*chunks):
+    return [{"choices": [{"delta": {"content": chunk}}]} for chunk in chunks]
+
+
+@override_settings(GPT_FANOUT=FANOUT, GPT_STREAM_COALESCING=NO_COALESCING)
+@mock.patch("src.utils.gpt.openai.ChatCompletion.create")
+class ConversationFanoutTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.key = {"conversation_id": str(uuid.uuid4()), "version_id": str(uuid.uuid4())}
+        self.digest = prompt_digest("gpt35", [{"role": "user", "content": "Hello"}])
+
+    def ask(self, query="", content="Hello", model="gpt35"):
+        data = json.dumps({"conversation": [{"role": "user", "content": content}], "model": model, **self.key})
+        return self.client.post(reverse("gpt_conversation") + query, data=data, content_type="application/json")
+
+    def follow(self, **params):
+        return self.client.get(reverse("gpt_conversation_follow"), {**self.key, **params})
+
+    def read(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_second_request_follows_the_running_generation(self, create):
+        create.return_value = completion("Hi", " there")
+        first = self.ask()
+        second = self.ask()
+
+        self.assertEqual(self.read(first), "Hi there")
+        self.assertEqual(self.read(second), "Hi there")
+        self.assertEqual(create.call_count, 1)
+        generation = Generation.objects.get()
+        self.assertEqual(generation.status, Generation.Status.DONE)
+        self.assertEqual(list(generation.chunks.order_by("seq").values_list("text", flat=True)), ["Hi", " there"])
+
+    def test_different_prompts_for_a_version_are_answered_separately(self, create):
+        create.side_effect = lambda **kwargs: completion(kwargs["messages"][-1]["content"], f" ({kwargs['engine']})")
+        # the first answer keeps running while the others are asked
+        first = self.ask()
+        self.assertEqual(self.read(self.ask(content="Bye")), "Bye (gpt-35-turbo-0613)")
+        self.assertEqual(self.read(self.ask(model="gpt4")), "Hello (gpt-4-0613)")
+        self.assertEqual(self.read(first), "Hello (gpt-35-turbo-0613)")
+        self.assertEqual(create.call_count, 3)
+        self.assertEqual(Generation.objects.values("prompt_digest").distinct().count(), 3)
+
+    def test_follow_endpoint(self, create):
+        create.side_effect = lambda **kwargs: completion("Hi", " there")
+        self.read(self.ask())
+
+        self.assertEqual(self.read(self.follow()), "Hi there")
+        events = parse_events(self.read(self.follow(stream="sse", last_event_id=1)))
+        self.assertEqual([(e["id"], e["data"]) for e in events], [("2", " there"), ("3", "[DONE]")])
+        # a finished generation is answered again once a new question is asked
+        self.assertEqual(self.read(self.ask()), "Hi there")
+        self.assertEqual(create.call_count, 2)
+
+    def test_follow_errors(self, create):
+        self.assertEqual(self.follow().status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.follow(version_id="x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.key.pop("version_id")
+        self.assertEqual(self.follow().status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_generations_are_per_user(self, create):
+        create.return_value = completion("Hi")
+        other_user = CustomUser.objects.create_user("other@email.com", "password")
+        Generation.objects.create(user=other_user, prompt_digest=self.digest, **self.key)
+
+        self.assertEqual(self.read(self.ask()), "Hi")
+        self.assertEqual(create.call_count, 1)
+
+    def test_stale_generation_is_replaced(self, create):
+        create.return_value = completion("Hi")
+        stale = Generation.objects.create(
+            user=self.user, prompt_digest=self.digest, updated_at=timezone.now() - timedelta(minutes=5), **self.key
+        )
+
+        self.assertEqual(self.read(self.ask()), "Hi")
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Generation.Status.FAILED)
+
+    def test_rejected_request_does_not_leave_a_generation(self, create):
+        scheduler = StreamScheduler(default_engine_limit=0, user_limit=1, max_queue=0, queue_timeout=0.01)
+        with mock.patch("gpt.views.stream_scheduler", scheduler):
+            self.assertEqual(self.ask().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(Generation.objects.exists())
+
+
+@override_settings(GPT_FANOUT=FANOUT)
+class GenerationBrokerTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("mock@email.com", "password")
+        self.generation = start_generation(self.user, uuid.uuid4(), uuid.uuid4())
+
+    def test_one_running_generation_per_version(self):
+        key = (self.generation.conversation_id, self.generation.version_id)
+        self.assertIsNone(start_generation(self.user, *key))
+        self.assertIsNotNone(start_generation(self.user, *key, prompt_digest("gpt35", [])))
+
+        list(publish_generation(self.generation, ["a"]))
+        self.assertIsNotNone(start_generation(self.user, *key))
+
+    def test_followers_get_the_prefix_and_live_chunks(self):
+        release = threading.Event()
+        followed = []
+
+        def chunks():
+            yield "a"
+            release.wait(5)
+            yield "b"
+
+        # the publisher runs in another thread, as it would in another worker process
+        publisher = threading.Thread(target=lambda: list(publish_generation(self.generation, chunks())))
+        publisher.start()
+        for item in follow_generation(self.generation.pk):
+            if item is not None:
+                followed.append(item)
+            if item == (1, "a"):
+                release.set()
+        publisher.join()
+
+        self.assertEqual(followed, [(1, "a"), (2, "b"), (None, Generation.Status.DONE)])
+
+    def test_consumer_stopping_early_fails_the_generation(self):
+        published = publish_generation(self.generation, ["a", "b"])
+        next(published)
+        published.close()
+
+        self.generation.refresh_from_db()
+        self.assertEqual(self.generation.status, Generation.Status.FAILED)
+        self.assertEqual(list(follow_generation(self.generation.pk)), [(1, "a"), (None, Generation.Status.FAILED)])
+
+    def test_async_follower(self):
+        list(publish_generation(self.generation, ["a", "b"]))
+
+        async def collect():
+            return [item async for item in afollow_generation(self.generation.pk, after=1)]
+
+        self.assertEqual(async_to_sync(collect)(), [(2, "b"), (None, Generation.Status.DONE)])
+        self.assertEqual(GenerationChunk.objects.count(), 2)
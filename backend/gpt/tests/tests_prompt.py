@@ -0,0 +1,152 @@
+import json
+import uuid
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, MessageContent, Role, Version
+from chat.utils.compression import compress_content
+from gpt.models import Generation
+from gpt.tests.tests_fanout import completion
+from gpt.tests.tests_sse import NO_COALESCING
+from gpt.utils.prompt import conversation_history
+
+SYSTEM_MESSAGE = {"role": "system", "content": "You are a helpful assistant."}
+
+
+class ConversationHistoryTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+        cls.other_user = CustomUser.objects.create_user("other@email.com", "password", is_active=True)
+        roles = [Role.objects.create(name="user"), Role.objects.create(name="assistant")]
+
+        cls.conversation = Conversation.objects.create(user=cls.user, title="Stored")
+        cls.root = Version.objects.create(conversation=cls.conversation)
+        messages = [
+            Message.objects.create(version=cls.root, content=f"Root message {idx}", role=roles[idx % 2])
+            for idx in range(3)
+        ]
+        cls.edit = Version.objects.create(
+            conversation=cls.conversation, parent_version=cls.root, root_message=messages[1]
+        )
+        Message.objects.create(version=cls.edit, content="Root message 0", role=roles[0])
+        Message.objects.create(version=cls.edit, content="Edited answer", role=roles[1])
+        cls.conversation.active_version = cls.root
+        cls.conversation.save()
+
+        cls.empty = Conversation.objects.create(user=cls.user, title="Empty")
+        cls.other = Conversation.objects.create(user=cls.other_user, title="Not mine")
+        Message.objects.create(version=Version.objects.create(conversation=cls.other), content="Secret", role=roles[0])
+
+        compressed = MessageContent.objects.get(content="Root message 2")
+        compressed.compressed_content = compress_content(compressed.content)
+        compressed.content = ""
+        compressed.save()
+
+    def history(self, conversation, **kwargs):
+        return [message["content"] for message in conversation_history(self.user, conversation.pk, **kwargs)[1]]
+
+
+class ConversationHistoryTests(ConversationHistoryTestCase):
+    def test_active_version_in_one_query(self):
+        with self.assertNumQueries(1):
+            version_id, history = conversation_history(self.user, self.conversation.pk)
+
+        self.assertEqual(version_id, self.root.pk)
+        self.assertEqual(
+            history,
+            [
+                {"role": "user", "content": "Root message 0"},
+                {"role": "assistant", "content": "Root message 1"},
+                {"role": "user", "content": "Root message 2"},
+            ],
+        )
+
+    def test_requested_version(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.history(self.conversation, version_id=self.edit.pk), ["Root message 0", "Edited answer"]
+            )
+
+    def test_empty_history(self):
+        self.assertEqual(conversation_history(self.user, self.empty.pk), (None, []))
+        version = Version.objects.create(conversation=self.empty)
+        self.assertEqual(conversation_history(self.user, self.empty.pk, version.pk), (version.pk, []))
+
+    def test_not_found(self):
+        with self.assertRaises(Conversation.DoesNotExist):
+            conversation_history(self.user, self.other.pk)
+        with self.assertRaises(Conversation.DoesNotExist):
+            conversation_history(self.user, uuid.uuid4())
+        with self.assertRaises(Version.DoesNotExist):
+            conversation_history(self.user, self.empty.pk, self.root.pk)
+
+        self.conversation.deleted_at = timezone.now()
+        self.conversation.save()
+        with self.assertRaises(Conversation.DoesNotExist):
+            conversation_history(self.user, self.conversation.pk)
+
+
+@override_settings(GPT_STREAM_COALESCING=NO_COALESCING)
+@mock.patch("src.utils.gpt.openai.ChatCompletion.create")
+class StoredConversationEndpointTests(ConversationHistoryTestCase):
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def ask(self, **data):
+        data = json.dumps({"model": "gpt35", **data})
+        return self.client.post(reverse("gpt_stored_conversation"), data=data, content_type="application/json")
+
+    def read(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_prompt_is_built_from_the_stored_messages(self, create):
+        create.return_value = completion("Hi", " there")
+        response = self.ask(conversation_id=str(self.conversation.pk), content="New question")
+
+        self.assertEqual(self.read(response), "Hi there")
+        self.assertEqual(
+            create.call_args.kwargs["messages"],
+            [
+                SYSTEM_MESSAGE,
+                {"role": "user", "content": "Root message 0"},
+                {"role": "assistant", "content": "Root message 1"},
+                {"role": "user", "content": "Root message 2"},
+                {"role": "user", "content": "New question"},
+            ],
+        )
+        # a new message makes a prompt of its own, which is not shared with other requests
+        self.assertFalse(Generation.objects.exists())
+
+    def test_stored_version_is_answered_once(self, create):
+        create.return_value = completion("Hi")
+        response = self.ask(conversation_id=str(self.conversation.pk), version_id=str(self.edit.pk))
+
+        self.assertEqual(self.read(response), "Hi")
+        self.assertEqual(
+            create.call_args.kwargs["messages"][1:],
+            [
+                {"role": "user", "content": "Root message 0"},
+                {"role": "assistant", "content": "Edited answer"},
+            ],
+        )
+        generation = Generation.objects.get()
+        self.assertEqual((generation.conversation_id, generation.version_id), (self.conversation.pk, self.edit.pk))
+
+    def test_errors(self, create):
+        conversation_id = str(self.conversation.pk)
+        self.assertEqual(self.ask(conversation_id="x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.ask(conversation_id=conversation_id, model="x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.ask(conversation_id=str(self.other.pk)).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.ask(conversation_id=conversation_id, version_id=str(uuid.uuid4())).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+        self.assertEqual(self.ask(conversation_id=str(self.empty.pk)).status_code, status.HTTP_400_BAD_REQUEST)
+        create.assert_not_called()
@@ -0,0 +1,101 @@
+import json
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from gpt.views import response_cache
+from src.utils.response_cache import ResponseCache, make_cache_key
+
+
+def mock_completion_stream(*chunks):
+    return [{"choices": [{"delta": {"content": chunk}}]} for chunk in chunks]
+
+
+class ResponseCacheTests(APITestCase):
+    def test_make_cache_key_normalizes_messages(self):
+        params = {"temperature": 0.7, "stream": True}
+        messages = [{"role": "user", "content": "Hello\r\nthere  "}]
+        normalized_messages = [{"role": "User", "content": " Hello\nthere"}]
+
+        self.assertEqual(
+            make_cache_key("engine", params, messages),
+            make_cache_key("engine", {**params, "stream": False}, normalized_messages),
+        )
+        self.assertNotEqual(make_cache_key("engine", params, messages), make_cache_key("other", params, messages))
+
+    def test_lru_eviction_by_size(self):
+        cache = ResponseCache(max_bytes=10, ttl=60)
+        cache.set("a", "aaaa")
+        cache.set("b", "bbbb")
+        self.assertEqual(cache.get("a"), "aaaa")
+
+        cache.set("c", "cccc")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "aaaa")
+        self.assertEqual(cache.get("c"), "cccc")
+        self.assertLessEqual(cache.stats()["size_bytes"], 10)
+
+    def test_oversized_answer_not_cached(self):
+        cache = ResponseCache(max_bytes=3, ttl=60)
+        cache.set("a", "aaaa")
+        self.assertIsNone(cache.get("a"))
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(max_bytes=100, ttl=60)
+        with mock.patch("src.utils.response_cache.time.monotonic", return_value=0):
+            cache.set("a", "aaaa")
+        with mock.patch("src.utils.response_cache.time.monotonic", return_value=61):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_aborted_stream_not_cached(self):
+        cache = ResponseCache(max_bytes=100, ttl=60)
+        stream = cache.stream("a", lambda: iter(["Hel", "lo"]))
+        self.assertEqual(next(stream), "Hel")
+        stream.close()
+        self.assertIsNone(cache.get("a"))
+
+
+@override_settings(GPT_RESPONSE_CACHE={"ENABLED": True, "TTL": 60, "MAX_BYTES": 1024})
+class CachedAnswerTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff_user = CustomUser.objects.create_user("staff@email.com", "password", is_active=True, is_staff=True)
+
+    def setUp(self):
+        response_cache.clear()
+        self.client.force_login(self.staff_user)
+
+    def ask(self, question):
+        response = self.client.post(
+            reverse("gpt_question"), data=json.dumps({"user_question": question}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    @mock.patch("src.utils.gpt.openai.ChatCompletion.create")
+    def test_repeated_question_served_from_cache(self, create):
+        create.return_value = mock_completion_stream("Hi", " there", "!")
+
+        self.assertEqual(self.ask("Hello"), "Hi there!")
+        self.assertEqual(self.ask(" Hello "), "Hi there!")
+        self.assertEqual(create.call_count, 1)
+
+        response = self.client.get(reverse("gpt_question_cache_stats"))
+        stats = response.json()["data"]
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    @mock.patch("src.utils.gpt.openai.ChatCompletion.create")
+    @override_settings(GPT_RESPONSE_CACHE={"ENABLED": False, "TTL": 60, "MAX_BYTES": 1024})
+    def test_cache_disabled(self, create):
+        create.side_effect = lambda **kwargs: mock_completion_stream("Hi")
+
+        self.ask("Hello")
+        self.ask("Hello")
+        self.assertEqual(create.call_count, 2)
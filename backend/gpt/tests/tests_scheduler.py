@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import CustomUser
+from gpt.views import _worker_share
+from src.utils.scheduler import AdmissionRejected, ScheduledStream, StreamScheduler
+
+
+def make_scheduler(**kwargs):
+    return StreamScheduler(
+        **{"default_engine_limit": 1, "user_limit": 10, "max_queue": 10, "queue_timeout": 5, **kwargs}
+    )
+
+
+class StreamSchedulerTests(APITestCase):
+    def acquire_in_thread(self, scheduler, user_id, granted):
+        def target():
+            slot = scheduler.acquire("engine", user_id)
+            granted.append((user_id, slot))
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread
+
+    def wait_for_waiting(self, scheduler, count):
+        for _ in range(100):
+            if scheduler.stats()["engine"]["waiting"] == count:
+                return
+            time.sleep(0.01)
+        self.fail("Requests did not queue up")
+
+    def test_engine_limit(self):
+        scheduler = make_scheduler(default_engine_limit=2, engine_limits={"small": 1})
+        scheduler.acquire("engine", 1)
+        scheduler.acquire("engine", 2)
+        scheduler.acquire("small", 3)
+
+        with self.assertRaises(AdmissionRejected):
+            scheduler.acquire("engine", 4, timeout=0.01)
+        with self.assertRaises(AdmissionRejected):
+            scheduler.acquire("small", 4, timeout=0.01)
+
+    def test_user_limit(self):
+        scheduler = make_scheduler(default_engine_limit=5, user_limit=1)
+        slot = scheduler.acquire("engine", 1)
+
+        with self.assertRaises(AdmissionRejected):
+            scheduler.acquire("other_engine", 1, timeout=0.01)
+        scheduler.acquire("engine", 2)
+
+        slot.release()
+        scheduler.acquire("other_engine", 1, timeout=0.01)
+
+    def test_queue_full(self):
+        scheduler = make_scheduler(max_queue=0)
+        scheduler.acquire("engine", 1)
+
+        with self.assertRaises(AdmissionRejected) as cm:
+            scheduler.acquire("engine", 2)
+        self.assertGreaterEqual(cm.exception.retry_after, 1)
+
+    def test_fair_queuing_between_users(self):
+        scheduler = make_scheduler()
+        slot = scheduler.acquire("engine", "a")
+
+        granted = []
+        threads = [self.acquire_in_thread(scheduler, "a", granted)]
+        self.wait_for_waiting(scheduler, 1)
+        threads.append(self.acquire_in_thread(scheduler, "a", granted))
+        self.wait_for_waiting(scheduler, 2)
+        threads.append(self.acquire_in_thread(scheduler, "b", granted))
+        self.wait_for_waiting(scheduler, 3)
+
+        for expected_count in range(1, 4):
+            slot.release()
+            for _ in range(100):
+                if len(granted) == expected_count:
+                    break
+                time.sleep(0.01)
+            slot = granted[-1][1]
+
+        for thread in threads:
+            thread.join()
+        self.assertEqual([user_id for user_id, _ in granted], ["a", "b", "a"])
+
+    def test_engine_limits_are_split_between_worker_processes(self):
+        with override_settings(SERVER_WORKERS=4):
+            self.assertEqual([_worker_share(limit) for limit in (16, 6, 2, 0)], [4, 1, 1, 0])
+        self.assertEqual(_worker_share(16), 16)
+
+    def test_scheduled_stream_releases_slot_on_close(self):
+        scheduler = make_scheduler()
+        stream = ScheduledStream(iter(["chunk"]), scheduler.acquire("engine", 1))
+        stream.close()
+        scheduler.acquire("engine", 2, timeout=0.01)
+
+    def test_scheduled_stream_releases_slot_on_exhaustion(self):
+        scheduler = make_scheduler()
+        self.assertEqual(list(ScheduledStream(iter(["a", "b"]), scheduler.acquire("engine", 1))), ["a", "b"])
+        scheduler.acquire("engine", 2, timeout=0.01)
+
+
+class ScheduledConversationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    @mock.patch("src.utils.gpt.openai.ChatCompletion.create")
+    def test_rejected_stream_returns_429(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": "Hi"}}]}]
+        scheduler = make_scheduler(user_limit=1, queue_timeout=0.01)
+        data = json.dumps({"conversation": [{"role": "user", "content": "Hello"}], "model": "gpt35"})
+
+        with mock.patch("gpt.views.stream_scheduler", scheduler):
+            first = self.client.post(reverse("gpt_conversation"), data=data, content_type="application/json")
+            second = self.client.post(reverse("gpt_conversation"), data=data, content_type="application/json")
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn("Retry-After", second)
+
+            self.assertEqual(b"".join(first.streaming_content), b"Hi")
+            first.close()
+            third = self.client.post(reverse("gpt_conversation"), data=data, content_type="application/json")
+            self.assertEqual(third.status_code, status.HTTP_200_OK)
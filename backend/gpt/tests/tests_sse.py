@@ -0,0 +1,244 @@
+import json
+import threading
+import time
+import uuid
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from authentication.models import CustomUser
+from gpt.models import Generation
+from gpt.utils.fanout import prompt_digest
+from src.utils.scheduler import StreamScheduler
+from src.utils.sse import KEEP_ALIVE, ResumableStream, StreamGone, StreamRegistry, format_event
+
+# the tests check chunk boundaries
+NO_COALESCING = {"DEFAULT": {"MAX_BYTES": 0, "MAX_DELAY": 0, "FLUSH_ON_SENTENCE": False}, "ENDPOINTS": {}}
+
+
+def parse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = {"data": []}
+        for line in block.split("\n"):
+            name, _, value = line.partition(": ")
+            if name == "data":
+                fields["data"].append(value)
+            elif name:
+                fields[name] = value
+        if fields["data"]:
+            fields["data"] = "\n".join(fields["data"])
+            events.append(fields)
+    return events
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time")
+        time.sleep(0.01)
+
+
+class ResumableStreamTests(APITestCase):
+    def test_format_event(self):
+        self.assertEqual(format_event("a\nb", event_id=3, event="done"), "id: 3\nevent: done\ndata: a\ndata: b\n\n")
+
+    def test_events_are_numbered_and_terminated(self):
+        stream = ResumableStream(1, ["Hel", "lo"], buffer_size=10).start()
+        events = parse_events("".join(stream.subscribe()))
+
+        self.assertEqual(
+            [(e["id"], e.get("event"), e["data"]) for e in events][:2], [("1", None, "Hel"), ("2", None, "lo")]
+        )
+        self.assertEqual((events[2]["id"], events[2]["event"]), ("3", "done"))
+
+    def test_resume_after_last_event_id(self):
+        stream = ResumableStream(1, ["a", "b", "c"], buffer_size=10).start()
+        wait_until(lambda: stream.done)
+
+        events = parse_events("".join(stream.subscribe(last_event_id=2)))
+        self.assertEqual([e["data"] for e in events], ["c", "[DONE]"])
+
+    def test_resume_ahead_of_the_stream(self):
+        release = threading.Event()
+
+        def chunks():
+            release.wait(5)
+            yield from ["a", "b"]
+
+        # the client got the first event from a process which ran ahead of this one
+        stream = ResumableStream(1, chunks(), buffer_size=10).start()
+        events = stream.subscribe(last_event_id=1, heartbeat=0.01)
+        self.assertEqual(next(events), KEEP_ALIVE)
+        release.set()
+        self.assertEqual([e["data"] for e in parse_events("".join(events))], ["b", "[DONE]"])
+
+    def test_live_events_and_keep_alive(self):
+        release = threading.Event()
+
+        def chunks():
+            yield "first"
+            release.wait(5)
+            yield "second"
+
+        stream = ResumableStream(1, chunks(), buffer_size=10).start()
+        events = stream.subscribe(heartbeat=0.01)
+
+        self.assertIn("data: first", next(events))
+        self.assertEqual(next(events), KEEP_ALIVE)
+        release.set()
+        self.assertIn("data: second", "".join(events))
+
+    def test_evicted_events_cannot_be_resumed(self):
+        stream = ResumableStream(1, ["a", "b", "c", "d"], buffer_size=2).start()
+        wait_until(lambda: stream.done)
+
+        with self.assertRaises(StreamGone):
+            stream.subscribe(last_event_id=1)
+        self.assertEqual([e["data"] for e in parse_events("".join(stream.subscribe(last_event_id=3)))], ["d", "[DONE]"])
+
+    def test_upstream_failure_ends_with_error_event(self):
+        def chunks():
+            yield "partial"
+            raise ConnectionError("upstream went away")
+
+        with self.assertLogs("src.utils.sse", "ERROR"):
+            stream = ResumableStream(1, chunks(), buffer_size=10).start()
+            events = parse_events("".join(stream.subscribe()))
+        self.assertEqual([e.get("event") for e in events], [None, "error"])
+
+    def test_registry_checks_owner_and_expires_finished_streams(self):
+        registry = StreamRegistry(buffer_size=10, grace_period=60)
+        stream = registry.start("owner", ["a"])
+        wait_until(lambda: stream.done)
+
+        self.assertIs(registry.get(stream.id, "owner"), stream)
+        self.assertIsNone(registry.get(stream.id, "someone else"))
+        with mock.patch("src.utils.sse.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(registry.get(stream.id, "owner"))
+
+
+@override_settings(
+    GPT_STREAM_COALESCING=NO_COALESCING,
+    GPT_FANOUT={"POLL_INTERVAL": 0.01, "FLUSH_INTERVAL": 0, "STALE_AFTER": 60, "RETENTION": 300},
+)
+@mock.patch("src.utils.gpt.openai.ChatCompletion.create")
+class ConversationSSETests(APITransactionTestCase):
+    # the streams publish their chunks from background threads, which need the committed rows
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("mock@email.com", "password", is_active=True)
+        self.other_user = CustomUser.objects.create_user("other@email.com", "password", is_active=True)
+        self.client.force_login(self.user)
+        self.registry = StreamRegistry(buffer_size=10, grace_period=60)
+        self.scheduler = StreamScheduler(default_engine_limit=1, user_limit=1, max_queue=0, queue_timeout=0.01)
+        for name, value in [("sse_streams", self.registry), ("stream_scheduler", self.scheduler)]:
+            patcher = mock.patch(f"gpt.views.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # the streams must not write their chunks while the tables are flushed for the next test
+        self.addCleanup(wait_until, lambda: self.registry.stats()["active"] == 0)
+
+    def start_stream(self, **key):
+        data = json.dumps({"conversation": [{"role": "user", "content": "Hello"}], "model": "gpt35", **key})
+        return self.client.post(reverse("gpt_conversation") + "?stream=sse", data=data, content_type="application/json")
+
+    def resume(self, stream_id, **headers):
+        return self.client.get(reverse("gpt_conversation_stream", kwargs={"stream_id": stream_id}), **headers)
+
+    def read(self, response):
+        return parse_events(b"".join(response.streaming_content).decode())
+
+    def test_sse_stream(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": chunk}}]} for chunk in ["Hi", " there"]]
+        response = self.start_stream()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = self.read(response)
+        self.assertEqual(events[0]["event"], "stream")
+        self.assertEqual(json.loads(events[0]["data"])["stream_id"], response["X-Stream-Id"])
+        self.assertEqual([e["data"] for e in events[1:]], ["Hi", " there", "[DONE]"])
+
+    def test_keyed_stream_whose_running_generation_vanished(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": "Hi"}}]}]
+        key = {"conversation_id": str(uuid.uuid4()), "version_id": str(uuid.uuid4())}
+        digest = prompt_digest("gpt35", [{"role": "user", "content": "Hello"}])
+        Generation.objects.create(user=self.user, prompt_digest=digest, **key)
+
+        # the running generation is gone once it is looked up, and another request starts one again meanwhile
+        with mock.patch("gpt.utils.fanout.find_generation", return_value=None):
+            response = self.start_stream(**key)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([e["data"] for e in self.read(response)[1:]], ["Hi", "[DONE]"])
+        self.assertTrue(Generation.objects.filter(pk=response["X-Stream-Id"], version_id__isnull=True).exists())
+
+    def test_keyed_stream_retries_once_the_running_generation_was_deleted(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": "Hi"}}]}]
+        key = {"conversation_id": str(uuid.uuid4()), "version_id": str(uuid.uuid4())}
+        digest = prompt_digest("gpt35", [{"role": "user", "content": "Hello"}])
+        Generation.objects.create(user=self.user, prompt_digest=digest, **key)
+
+        def deleted(*args):
+            # the request of the running generation was rejected by the scheduler
+            Generation.objects.all().delete()
+
+        with mock.patch("gpt.utils.fanout.find_generation", side_effect=deleted):
+            response = self.start_stream(**key)
+
+        self.assertEqual([e["data"] for e in self.read(response)[1:]], ["Hi", "[DONE]"])
+        self.assertEqual(str(Generation.objects.get(pk=response["X-Stream-Id"]).version_id), key["version_id"])
+
+    def test_resume_does_not_call_upstream_again(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": chunk}}]} for chunk in ["Hi", " there"]]
+        response = self.start_stream()
+        response.close()
+
+        resumed = self.resume(response["X-Stream-Id"], HTTP_LAST_EVENT_ID="1")
+        self.assertEqual(resumed.status_code, status.HTTP_200_OK)
+        self.assertEqual([e["data"] for e in self.read(resumed)], [" there", "[DONE]"])
+        self.assertEqual(create.call_count, 1)
+
+    def test_stream_slot_released_when_upstream_finishes(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": "Hi"}}]}]
+        # the client disconnects right away, the upstream call still completes in the background
+        self.start_stream().close()
+
+        wait_until(lambda: self.scheduler.stats()["gpt-35-turbo-0613"]["active"] == 0)
+        self.assertEqual(self.start_stream().status_code, status.HTTP_200_OK)
+
+    def test_resume_from_another_worker(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": chunk}}]} for chunk in ["Hi", " there"]]
+        response = self.start_stream()
+        stream_id = response["X-Stream-Id"]
+        response.close()
+        wait_until(lambda: Generation.objects.get(pk=stream_id).status == Generation.Status.DONE)
+
+        # the worker process serving the resume does not have the stream in memory
+        with mock.patch("gpt.views.sse_streams", StreamRegistry(buffer_size=10, grace_period=60)):
+            resumed = self.resume(stream_id, HTTP_LAST_EVENT_ID="1")
+            self.assertEqual(resumed.status_code, status.HTTP_200_OK)
+            events = self.read(resumed)
+        self.assertEqual([(e["id"], e["data"]) for e in events], [("2", " there"), ("3", "[DONE]")])
+        self.assertEqual(create.call_count, 1)
+
+    def test_resume_after_the_buffer(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": str(idx)}}]} for idx in range(20)]
+        stream_id = self.start_stream()["X-Stream-Id"]
+        wait_until(lambda: self.registry.get(uuid.UUID(stream_id), self.user.pk).done)
+
+        events = self.read(self.resume(stream_id, HTTP_LAST_EVENT_ID="1"))
+        self.assertEqual([e["data"] for e in events], [str(idx) for idx in range(1, 20)] + ["[DONE]"])
+
+    def test_resume_errors(self, create):
+        create.return_value = [{"choices": [{"delta": {"content": "Hi"}}]}]
+        stream_id = self.start_stream()["X-Stream-Id"]
+
+        self.assertEqual(self.resume(stream_id, HTTP_LAST_EVENT_ID="x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.resume(uuid.uuid4()).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_login(self.other_user)
+        self.assertEqual(self.resume(stream_id).status_code, status.HTTP_404_NOT_FOUND)
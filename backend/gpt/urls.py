@@ -5,6 +5,10 @@ from gpt import views
 urlpatterns = [
     path("", views.gpt_root_view),
     path("title/", views.get_title),
-    path("question/", views.get_answer),
-    path("conversation/", views.get_conversation),
+    path("question/", views.get_answer, name="gpt_question"),
+    path("question/cache_stats/", views.get_answer_cache_stats, name="gpt_question_cache_stats"),
+    path("conversation/", views.get_conversation, name="gpt_conversation"),
+    path("conversation/stored/", views.get_stored_conversation, name="gpt_stored_conversation"),
+    path("conversation/follow/", views.follow_conversation, name="gpt_conversation_follow"),
+    path("conversation/stream/<uuid:stream_id>/", views.resume_conversation_stream, name="gpt_conversation_stream"),
 ]
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from gpt.models import Generation, GenerationChunk
+
+__all__ = [
+    "afollow_generation",
+    "find_generation",
+    "follow_generation",
+    "get_generation",
+    "prompt_digest",
+    "publish_generation",
+    "start_generation",
+]
+
+# items produced by the followers: ``(seq, text)`` per chunk, then ``(None, status)`` once the generation ended, and
+# None whenever a poll found nothing new
+FollowItem = Optional[tuple[Optional[int], str]]
+
+
+def prompt_digest(model: str, messages: list[dict]) -> str:
+    """
+    Returns the SHA-256 hex digest of the model and messages of a prompt, which generations are shared for.
+    """
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def start_generation(user, conversation_id=None, version_id=None, digest: str = "") -> Optional[Generation]:
+    """
+    Registers a running generation for a conversation version and prompt digest, or without a version for an answer
+    which is not shared.
+
+    Generations of dead workers are failed and finished generations past their retention are deleted on the way.
+
+    Returns
+    -------
+    Generation | None
+        The new generation, None if one is already running for the version and prompt.
+    """
+    now = timezone.now()
+    Generation.objects.filter(
+        status=Generation.Status.RUNNING, updated_at__lt=now - timedelta(seconds=settings.GPT_FANOUT["STALE_AFTER"])
+    ).update(status=Generation.Status.FAILED, finished_at=now)
+    Generation.objects.filter(finished_at__lt=now - timedelta(seconds=settings.GPT_FANOUT["RETENTION"])).delete()
+
+    try:
+        with transaction.atomic():
+            return Generation.objects.create(
+                user=user, conversation_id=conversation_id, version_id=version_id, prompt_digest=digest
+            )
+    except IntegrityError:
+        return None
+
+
+def find_generation(user, conversation_id, version_id, digest: Optional[str] = None) -> Optional[Generation]:
+    """
+    Returns the latest generation of a conversation version, for the prompt digest if given, which is running or
+    finished within the retention.
+    """
+    generations = Generation.objects.filter(user=user, conversation_id=conversation_id, version_id=version_id)
+    if digest is not None:
+        generations = generations.filter(prompt_digest=digest)
+    generation = generations.order_by("-created_at").first()
+    return _retained(generation)
+
+
+def get_generation(user, generation_id) -> Optional[Generation]:
+    """
+    Returns a generation of the user which is running or finished within the retention.
+    """
+    return _retained(Generation.objects.filter(user=user, pk=generation_id).first())
+
+
+def _retained(generation: Optional[Generation]) -> Optional[Generation]:
+    expired_before = timezone.now() - timedelta(seconds=settings.GPT_FANOUT["RETENTION"])
+    if generation is None or (generation.finished_at and generation.finished_at < expired_before):
+        return None
+    return generation
+
+
+def publish_generation(generation: Generation, chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Passes the chunks through while writing them, numbered from 1, for the followers of the generation.
+
+    Chunks are written in batches every ``GPT_FANOUT["FLUSH_INTERVAL"]`` seconds. The generation is marked done once
+    the chunks are exhausted, and failed if they raise or the consumer stops early.
+    """
+    pending = []
+    seq = 0
+    flushed_at = time.monotonic()
+
+    def flush(**fields):
+        GenerationChunk.objects.bulk_create(pending)
+        pending.clear()
+        Generation.objects.filter(pk=generation.pk).update(updated_at=timezone.now(), **fields)
+
+    status = Generation.Status.FAILED
+    try:
+        for chunk in chunks:
+            seq += 1
+            pending.append(GenerationChunk(generation=generation, seq=seq, text=chunk))
+            if time.monotonic() - flushed_at >= settings.GPT_FANOUT["FLUSH_INTERVAL"]:
+                flush()
+                flushed_at = time.monotonic()
+            yield chunk
+        status = Generation.Status.DONE
+    finally:
+        flush(status=status, finished_at=timezone.now())
+
+
+def _poll(generation_id, after: int) -> tuple[list[tuple[int, str]], Optional[str]]:
+    """
+    Returns the chunks after ``after`` and the final status, None while the generation is running.
+
+    The status is read first: the publisher writes all chunks before the final status, so no chunk is missed.
+    """
+    status, updated_at = Generation.objects.filter(pk=generation_id).values_list("status", "updated_at").get()
+    chunks = list(
+        GenerationChunk.objects.filter(generation_id=generation_id, seq__gt=after)
+        .order_by("seq")
+        .values_list("seq", "text")
+    )
+    if status == Generation.Status.RUNNING:
+        if updated_at >= timezone.now() - timedelta(seconds=settings.GPT_FANOUT["STALE_AFTER"]):
+            return chunks, None
+        status = Generation.Status.FAILED
+    return chunks, status
+
+
+def follow_generation(generation_id, after: int = 0) -> Iterator[FollowItem]:
+    """
+    Yields the published chunks of a generation after ``after``, then the live ones until it ends.
+    """
+    while True:
+        chunks, status = _poll(generation_id, after)
+        yield from chunks
+        if chunks:
+            after = chunks[-1][0]
+        if status is not None:
+            yield None, status
+            return
+        if not chunks:
+            yield None
+            time.sleep(settings.GPT_FANOUT["POLL_INTERVAL"])
+
+
+async def afollow_generation(generation_id, after: int = 0) -> AsyncIterator[FollowItem]:
+    """
+    Async version of ``follow_generation``, which waits between polls without holding a thread.
+    """
+    while True:
+        chunks, status = await sync_to_async(_poll)(generation_id, after)
+        for chunk in chunks:
+            yield chunk
+        if chunks:
+            after = chunks[-1][0]
+        if status is not None:
+            yield None, status
+            return
+        if not chunks:
+            yield None
+            await asyncio.sleep(settings.GPT_FANOUT["POLL_INTERVAL"])
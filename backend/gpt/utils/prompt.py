@@ -0,0 +1,77 @@
+import uuid
+from typing import Optional
+
+from django.db.models import F
+
+from chat.models import Conversation, Message, Version
+from chat.utils.compression import decompress_content
+
+__all__ = ["conversation_history"]
+
+HISTORY_FIELDS = ("version_id", "role__name", "body__content", "body__compressed_content")
+
+
+def conversation_history(
+    user, conversation_id: uuid.UUID, version_id: Optional[uuid.UUID] = None
+) -> tuple[Optional[uuid.UUID], list[dict[str, str]]]:
+    """
+    Reads the stored messages of a conversation version as the ``conversation`` of a chat completion.
+
+    The roles and texts of the messages are read with one ``values_list()`` query over the ``(version, created_at)``
+    index of the messages, which also checks that the conversation belongs to the user and, without a requested
+    version, picks the active one. Only an empty history needs another query to tell an empty version from a missing
+    one.
+
+    Parameters
+    ----------
+    user : CustomUser
+        The owner of the conversation.
+    conversation_id : uuid.UUID
+        The conversation, deleted conversations are not found.
+    version_id : uuid.UUID, optional
+        The version whose messages are read, the active version of the conversation by default.
+
+    Returns
+    -------
+    tuple[uuid.UUID | None, list[dict[str, str]]]
+        The id of the version read, None for a conversation without an active version, and its messages in order.
+
+    Raises
+    ------
+    Conversation.DoesNotExist
+        If the user has no such conversation.
+    Version.DoesNotExist
+        If the requested version is not part of the conversation.
+    """
+    messages = Message.objects.for_user(user).filter(
+        version__conversation_id=conversation_id,
+        version__conversation__user=user,
+        version__conversation__deleted_at__isnull=True,
+    )
+    if version_id is None:
+        messages = messages.filter(version=F("version__conversation__active_version"))
+    else:
+        messages = messages.filter(version_id=version_id)
+
+    history = []
+    for message_version_id, role, content, compressed_content in messages.order_by("created_at").values_list(
+        *HISTORY_FIELDS
+    ):
+        version_id = message_version_id
+        if compressed_content is not None:
+            content = decompress_content(compressed_content)
+        history.append({"role": role, "content": content})
+    if history:
+        return version_id, history
+
+    active_version_id = (
+        Conversation.objects.for_user(user)
+        .filter(user=user, deleted_at__isnull=True)
+        .values_list("active_version_id", flat=True)
+        .get(pk=conversation_id)
+    )
+    if version_id is None:
+        return active_version_id, []
+    if not Version.objects.for_user(user).filter(conversation_id=conversation_id, pk=version_id).exists():
+        raise Version.DoesNotExist
+    return version_id, []
@@ -1,8 +1,173 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import connections
 from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from rest_framework import status
 from rest_framework.decorators import api_view
 
-from src.utils.gpt import get_conversation_answer, get_gpt_title, get_simple_answer
+from chat.models import Conversation, Version
+from gpt.models import Generation
+from gpt.utils import fanout
+from gpt.utils.prompt import conversation_history
+from src.utils.gpt import GPT_VERSIONS, get_conversation_answer, get_gpt_title, get_simple_answer
+from src.utils.response_cache import ResponseCache
+from src.utils.scheduler import AdmissionRejected, ScheduledStream, StreamScheduler
+from src.utils.sse import KEEP_ALIVE, StreamGone, StreamRegistry, format_event
+from src.utils.streaming import adapt_streaming_content, coalesce_chunks, is_asgi_request
+
+response_cache = ResponseCache(
+    max_bytes=settings.GPT_RESPONSE_CACHE["MAX_BYTES"], ttl=settings.GPT_RESPONSE_CACHE["TTL"]
+)
+
+
+def _worker_share(limit: int) -> int:
+    # the engine limits are node-wide, each worker process of `server.py` admits its share
+    return max(min(limit, 1), limit // settings.SERVER_WORKERS)
+
+
+stream_scheduler = StreamScheduler(
+    default_engine_limit=_worker_share(settings.GPT_STREAM_SCHEDULER["DEFAULT_ENGINE_LIMIT"]),
+    engine_limits={
+        engine: _worker_share(limit) for engine, limit in settings.GPT_STREAM_SCHEDULER["ENGINE_LIMITS"].items()
+    },
+    user_limit=settings.GPT_STREAM_SCHEDULER["USER_LIMIT"],
+    max_queue=settings.GPT_STREAM_SCHEDULER["MAX_QUEUE"],
+    queue_timeout=settings.GPT_STREAM_SCHEDULER["QUEUE_TIMEOUT"],
+)
+sse_streams = StreamRegistry(
+    buffer_size=settings.GPT_SSE["BUFFER_EVENTS"], grace_period=settings.GPT_SSE["GRACE_PERIOD"]
+)
+
+
+def _coalesced(request, chunks):
+    policy = {
+        **settings.GPT_STREAM_COALESCING["DEFAULT"],
+        **settings.GPT_STREAM_COALESCING["ENDPOINTS"].get(request.resolver_match.url_name, {}),
+    }
+    return coalesce_chunks(
+        chunks,
+        max_bytes=policy["MAX_BYTES"],
+        max_delay=policy["MAX_DELAY"],
+        flush_on_sentence=policy["FLUSH_ON_SENTENCE"],
+    )
+
+
+def _scheduled_stream(request, model: str, chunks):
+    """
+    Returns the coalesced chunks wrapped in a granted stream slot, or a 429 response if no slot was granted.
+    """
+    try:
+        slot = stream_scheduler.acquire(GPT_VERSIONS[model].engine, request.user.pk)
+    except AdmissionRejected as e:
+        response = JsonResponse({"error": e.reason}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response["Retry-After"] = str(e.retry_after)
+        return None, response
+
+    return ScheduledStream(_coalesced(request, chunks), slot), None
+
+
+def _text_stream_response(request, chunks, thread_sensitive: bool = False):
+    # the GPT stream only touches the database when it is published for followers
+    return StreamingHttpResponse(
+        adapt_streaming_content(request, chunks, thread_sensitive=thread_sensitive), content_type="text/html"
+    )
+
+
+def _scheduled_stream_response(request, model: str, chunks):
+    chunks, error_response = _scheduled_stream(request, model, chunks)
+    if error_response is not None:
+        return error_response
+    return _text_stream_response(request, chunks)
+
+
+def _event_stream_response(content):
+    response = StreamingHttpResponse(content, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _sse_response(request, events):
+    # waiting for the next event never touches the database
+    return _event_stream_response(adapt_streaming_content(request, events, thread_sensitive=False))
+
+
+def _last_event_id(request) -> int:
+    return int(request.headers.get("Last-Event-ID") or request.GET.get("last_event_id") or 0)
+
+
+def _generation_key(data):
+    """
+    Returns the ``(conversation_id, version_id)`` an answer is generated for, None when the request does not name them.
+
+    Raises
+    ------
+    ValueError
+        If an id is not a valid UUID.
+    """
+    if not data.get("conversation_id") or not data.get("version_id"):
+        return None
+    return uuid.UUID(str(data["conversation_id"])), uuid.UUID(str(data["version_id"]))
+
+
+def _closing_connections(chunks):
+    # the chunks are consumed by a background thread, which must not leak its database connection
+    try:
+        yield from chunks
+    finally:
+        connections.close_all()
+
+
+class _FollowRenderer:
+    """
+    Turns the items of a followed generation into raw text or Server-Sent Events with the ids of the chunks.
+    """
+
+    def __init__(self, sse: bool):
+        self.sse = sse
+        self.last_seq = 0
+        self.sent_at = time.monotonic()
+
+    def render(self, item) -> str:
+        if item is None:
+            if not self.sse or time.monotonic() - self.sent_at < settings.GPT_SSE["HEARTBEAT"]:
+                return ""
+            text = KEEP_ALIVE
+        elif item[0] is None:
+            if not self.sse:
+                return ""
+            if item[1] == Generation.Status.DONE:
+                text = format_event("[DONE]", self.last_seq + 1, event="done")
+            else:
+                text = format_event("Upstream stream failed", self.last_seq + 1, event="error")
+        else:
+            self.last_seq, chunk = item
+            text = format_event(chunk, self.last_seq) if self.sse else chunk
+        self.sent_at = time.monotonic()
+        return text
+
+
+async def _arender(items, renderer: _FollowRenderer):
+    async for item in items:
+        if text := renderer.render(item):
+            yield text
+
+
+def _follow_response(request, generation: Generation, sse: bool, after: int = 0):
+    renderer = _FollowRenderer(sse)
+    if is_asgi_request(request):
+        content = _arender(fanout.afollow_generation(generation.pk, after), renderer)
+    else:
+        content = (text for item in fanout.follow_generation(generation.pk, after) if (text := renderer.render(item)))
+    if sse:
+        return _event_stream_response(content)
+    return StreamingHttpResponse(content, content_type="text/html")
 
 
 @api_view(["GET"])
@@ -22,13 +187,147 @@ def get_title(request):
 @api_view(["POST"])
 def get_answer(request):
     data = request.data
-    return StreamingHttpResponse(get_simple_answer(data["user_question"], stream=True), content_type="text/html")
+    cache = response_cache if settings.GPT_RESPONSE_CACHE["ENABLED"] else None
+    return _scheduled_stream_response(
+        request, "gpt35", get_simple_answer(data["user_question"], stream=True, cache=cache)
+    )
+
+
+@login_required
+@api_view(["GET"])
+def get_answer_cache_stats(request):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff only"}, status=status.HTTP_403_FORBIDDEN)
+    return JsonResponse({"data": {"enabled": settings.GPT_RESPONSE_CACHE["ENABLED"], **response_cache.stats()}})
+
+
+def _conversation_answer_response(request, conversation: list[dict], model: str, key=None):
+    """
+    Streams the answer to a conversation as raw text, or as resumable Server-Sent Events with ``?stream=sse``.
+
+    With a ``(conversation_id, version_id)`` key, a request for a version already being answered for the same model and
+    messages follows that answer.
+    Server-Sent Events are always published as a generation, whose id is the stream id, so that any worker process
+    can resume them.
+    """
+    sse = request.query_params.get("stream") == "sse"
+    generation = None
+    if key is not None:
+        digest = fanout.prompt_digest(model, conversation)
+        generation = fanout.start_generation(request.user, *key, digest)
+        if generation is None:
+            # another request (possibly in another worker) is already answering this prompt for the version
+            running = fanout.find_generation(request.user, *key, digest)
+            if running is not None:
+                return _follow_response(request, running, sse)
+            # the running generation was removed in between, e.g. as its request was rejected
+            generation = fanout.start_generation(request.user, *key, digest)
+    if generation is None and sse:
+        generation = fanout.start_generation(request.user)
+
+    chunks, error_response = _scheduled_stream(
+        request, model, get_conversation_answer(conversation, model, stream=True)
+    )
+    if error_response is not None:
+        if generation is not None:
+            generation.delete()
+        return error_response
+    if generation is not None:
+        chunks = fanout.publish_generation(generation, chunks)
+    if not sse:
+        return _text_stream_response(request, chunks, thread_sensitive=generation is not None)
+
+    # resuming clients are served from the buffer by this worker process, from the published chunks by the others
+    stream = sse_streams.start(request.user.pk, _closing_connections(chunks), stream_id=generation.pk)
+    resume_url = reverse("gpt_conversation_stream", kwargs={"stream_id": stream.id})
+
+    def events():
+        # announces where to resume, carries no id so that it is not replayed
+        yield format_event(json.dumps({"stream_id": str(stream.id), "resume_url": resume_url}), event="stream")
+        yield from stream.subscribe(heartbeat=settings.GPT_SSE["HEARTBEAT"])
+
+    response = _sse_response(request, events())
+    response["X-Stream-Id"] = str(stream.id)
+    return response
 
 
 @login_required
 @api_view(["POST"])
 def get_conversation(request):
     data = request.data
-    return StreamingHttpResponse(
-        get_conversation_answer(data["conversation"], data["model"], stream=True), content_type="text/html"
-    )
+    try:
+        key = _generation_key(data)
+    except ValueError:
+        return JsonResponse({"error": "Invalid conversation_id or version_id"}, status=status.HTTP_400_BAD_REQUEST)
+    return _conversation_answer_response(request, data["conversation"], data["model"], key)
+
+
+@login_required
+@api_view(["POST"])
+def get_stored_conversation(request):
+    data = request.data
+    if data.get("model") not in GPT_VERSIONS:
+        return JsonResponse({"error": "Unknown model"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        conversation_id = uuid.UUID(str(data.get("conversation_id")))
+        version_id = uuid.UUID(str(data["version_id"])) if data.get("version_id") else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid conversation_id or version_id"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        version_id, conversation = conversation_history(request.user, conversation_id, version_id)
+    except Conversation.DoesNotExist:
+        return JsonResponse({"error": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Version.DoesNotExist:
+        return JsonResponse({"error": "Version not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    key = None
+    if data.get("content"):
+        conversation.append({"role": "user", "content": data["content"]})
+    elif version_id is not None:
+        # without a new message, the prompt is the stored version alone and its answer can be shared
+        key = (conversation_id, version_id)
+    if not conversation:
+        return JsonResponse({"error": "Nothing to answer"}, status=status.HTTP_400_BAD_REQUEST)
+    return _conversation_answer_response(request, conversation, data["model"], key)
+
+
+@login_required
+@require_GET
+def follow_conversation(request):
+    try:
+        key = _generation_key(request.GET)
+        last_event_id = _last_event_id(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid parameters"}, status=status.HTTP_400_BAD_REQUEST)
+    if key is None:
+        return JsonResponse(
+            {"error": "conversation_id and version_id are required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    generation = fanout.find_generation(request.user, *key)
+    if generation is None:
+        return JsonResponse({"error": "No answer is being generated"}, status=status.HTTP_404_NOT_FOUND)
+    return _follow_response(request, generation, request.GET.get("stream") == "sse", after=last_event_id)
+
+
+@login_required
+@require_GET
+def resume_conversation_stream(request, stream_id):
+    try:
+        last_event_id = _last_event_id(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid Last-Event-ID"}, status=status.HTTP_400_BAD_REQUEST)
+
+    stream = sse_streams.get(stream_id, request.user.pk)
+    if stream is not None:
+        try:
+            return _sse_response(request, stream.subscribe(last_event_id, heartbeat=settings.GPT_SSE["HEARTBEAT"]))
+        except StreamGone:
+            pass
+
+    # the stream was started by another worker process or left the buffer, its published chunks have the same ids
+    generation = fanout.get_generation(request.user, stream_id)
+    if generation is None:
+        return JsonResponse({"error": "Stream not found"}, status=status.HTTP_404_NOT_FOUND)
+    return _follow_response(request, generation, sse=True, after=last_event_id)
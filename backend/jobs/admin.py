@@ -0,0 +1,50 @@
+from django.contrib import admin
+from django.utils import timezone
+from django.utils.html import format_html
+
+from jobs.models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "max_attempts", "run_at", "locked_by", "created_at", "finished_at")
+    list_filter = ("status", "name")
+    search_fields = ("=id", "name", "locked_by")
+    date_hierarchy = "created_at"
+    actions = ["run_now"]
+    fields = readonly_fields = (
+        "id",
+        "name",
+        "args",
+        "kwargs",
+        "status",
+        "run_at",
+        "attempts",
+        "max_attempts",
+        "locked_by",
+        "locked_until",
+        "created_at",
+        "started_at",
+        "finished_at",
+        "error",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Last error")
+    def error(self, obj):
+        return format_html("<pre>{}</pre>", obj.last_error)
+
+    @admin.action(description="Run the selected queued or failed jobs now")
+    def run_now(self, request, queryset):
+        # failed jobs get a full set of attempts again, running jobs are left to their worker
+        count = queryset.filter(status__in=[Job.Status.QUEUED, Job.Status.FAILED]).update(
+            status=Job.Status.QUEUED, run_at=timezone.now(), attempts=0, finished_at=None
+        )
+        self.message_user(request, f"{count} jobs queued to run now.")
+
+
+admin.site.register(Job, JobAdmin)
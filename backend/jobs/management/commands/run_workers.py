@@ -0,0 +1,37 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the background jobs stored in the database with a pool of worker threads, until SIGINT or SIGTERM, which "
+        "let the running jobs finish. Start one per node, or more for more throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOBS["CONCURRENCY"],
+            help="Jobs run at the same time by this process.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOBS["POLL_INTERVAL"],
+            help="Seconds between polls of the queue while idle.",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due instead of waiting for more.")
+
+    def handle(self, *args, **options):
+        worker = Worker(concurrency=options["concurrency"], poll_interval=options["poll_interval"])
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+
+        self.stdout.write(f"Worker {worker.worker_id} running {worker.concurrency} jobs at a time")
+        count = worker.run(once=options["once"])
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker.worker_id} stopped after {count} jobs"))
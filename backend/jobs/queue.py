@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Union
+
+from django.conf import settings
+from django.utils import timezone
+
+from jobs.models import Job
+
+__all__ = ["Task", "get_task", "task"]
+
+_tasks: dict[str, "Task"] = {}
+
+
+class Task:
+    """
+    A function which can be run by the workers, registered under a name stored with its jobs.
+
+    Calling the task runs the function inline, ``enqueue`` and ``schedule`` store a job for the workers. The arguments
+    of a job are stored as JSON, UUIDs, dates and decimals arrive as strings.
+    """
+
+    def __init__(self, func: Callable, name: str, max_attempts: Optional[int] = None):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<Task {self.name}>"
+
+    def enqueue(self, *args, **kwargs) -> Job:
+        """
+        Stores a job which runs the task as soon as a worker is free.
+        """
+        return self.schedule(timezone.now(), *args, **kwargs)
+
+    def schedule(self, when: Union[datetime, timedelta], *args, **kwargs) -> Job:
+        """
+        Stores a job which runs the task at a given time, or after a given delay.
+        """
+        if isinstance(when, timedelta):
+            when = timezone.now() + when
+        return Job.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            run_at=when,
+            max_attempts=self.max_attempts or settings.JOBS["MAX_ATTEMPTS"],
+        )
+
+
+def task(func: Optional[Callable] = None, *, name: Optional[str] = None, max_attempts: Optional[int] = None):
+    """
+    Registers a function as a task, as ``@task`` or ``@task(max_attempts=3)``.
+
+    Tasks are looked up by name when their jobs run, the default name is the dotted path of the function. Define them
+    in the ``tasks`` module of an app, which every process imports at startup.
+
+    Parameters
+    ----------
+    func : Callable, optional
+        The function, when used without arguments.
+    name : str, optional
+        The name stored with the jobs, keep it stable while jobs of the task may be queued.
+    max_attempts : int, optional
+        Runs of a job before it fails for good, ``JOBS["MAX_ATTEMPTS"]`` by default.
+    """
+
+    def register(func: Callable) -> Task:
+        registered = Task(func, name or f"{func.__module__}.{func.__qualname__}", max_attempts)
+        if registered.name in _tasks:
+            raise ValueError(f"A task named `{registered.name}` is already registered")
+        _tasks[registered.name] = registered
+        return registered
+
+    return register(func) if func is not None else register
+
+
+def get_task(name: str) -> Task:
+    """
+    Raises
+    ------
+    KeyError
+        If no task is registered under the name.
+    """
+    return _tasks[name]
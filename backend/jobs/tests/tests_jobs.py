@@ -0,0 +1,194 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from jobs.models import Job
+from jobs.queue import task
+from jobs.worker import Worker, claim_jobs, purge_finished_jobs, renew_leases, retry_delay, run_job
+
+JOBS = {
+    "CONCURRENCY": 2,
+    "POLL_INTERVAL": 0.01,
+    "VISIBILITY_TIMEOUT": 60,
+    "MAX_ATTEMPTS": 3,
+    "RETRY_BACKOFF": 10,
+    "RETRY_BACKOFF_MAX": 25,
+    "RETENTION": 60,
+    "PURGE_INTERVAL": 60,
+}
+
+calls = []
+
+
+@task(name="jobs.tests.record")
+def record(value, suffix=""):
+    calls.append(f"{value}{suffix}")
+
+
+@task(name="jobs.tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("Upstream unavailable")
+
+
+@override_settings(JOBS=JOBS)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_schedule(self):
+        job = record.enqueue("a", suffix="!")
+        self.assertEqual((job.name, job.args, job.kwargs), ("jobs.tests.record", ["a"], {"suffix": "!"}))
+        self.assertEqual((job.status, job.max_attempts), (Job.Status.QUEUED, 3))
+        self.assertEqual(fail.enqueue().max_attempts, 2)
+
+        later = record.schedule(timedelta(hours=1), "b")
+        self.assertGreater(later.run_at, timezone.now() + timedelta(minutes=59))
+        # calling the task runs it inline
+        record("c")
+        self.assertEqual(calls, ["c"])
+
+    def test_task_names_are_unique(self):
+        with self.assertRaises(ValueError):
+            task(name="jobs.tests.record")(lambda: None)
+
+    def test_claims_due_jobs_once(self):
+        second = record.schedule(timezone.now() - timedelta(minutes=1), "second")
+        first = record.schedule(timezone.now() - timedelta(minutes=2), "first")
+        record.schedule(timedelta(minutes=1), "later")
+
+        claimed = claim_jobs("worker-1", 5)
+        self.assertEqual(claimed, [first, second])
+        self.assertEqual({(job.status, job.attempts, job.locked_by) for job in claimed}, {("running", 1, "worker-1")})
+        self.assertEqual(claim_jobs("worker-2", 5), [])
+
+    def test_claims_up_to_the_limit(self):
+        for idx in range(3):
+            record.enqueue(idx)
+        self.assertEqual(len(claim_jobs("worker-1", 2)), 2)
+        self.assertEqual(len(claim_jobs("worker-2", 2)), 1)
+
+    def test_successful_job(self):
+        record.enqueue("a", suffix="!")
+        run_job(claim_jobs("worker", 1)[0], "worker")
+
+        job = Job.objects.get()
+        self.assertEqual(calls, ["a!"])
+        self.assertEqual((job.status, job.locked_by, job.locked_until), (Job.Status.DONE, "", None))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retries_with_backoff_then_fails(self):
+        self.assertEqual([retry_delay(n).total_seconds() for n in (1, 2, 3)], [10, 20, 25])
+        fail.enqueue()
+
+        with self.assertLogs("jobs.worker", "ERROR"):
+            run_job(claim_jobs("worker", 1)[0], "worker")
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertIn("RuntimeError: Upstream unavailable", job.last_error)
+        self.assertAlmostEqual((job.run_at - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertEqual(claim_jobs("worker", 1), [])
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs("jobs.worker", "ERROR"):
+            run_job(claim_jobs("worker", 1)[0], "worker")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+
+    def test_unknown_task_fails(self):
+        Job.objects.create(name="jobs.tests.removed", max_attempts=3)
+        run_job(claim_jobs("worker", 1)[0], "worker")
+
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.last_error), (Job.Status.FAILED, "Unknown task"))
+
+    def test_expired_lease_is_claimed_again(self):
+        record.enqueue("a")
+        stale = claim_jobs("worker-1", 1)[0]
+        self.assertEqual(renew_leases("worker-1", [stale.pk]), 1)
+        self.assertEqual(renew_leases("worker-2", [stale.pk]), 0)
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        retried = claim_jobs("worker-2", 1)[0]
+        self.assertEqual((retried.attempts, retried.locked_by), (2, "worker-2"))
+        # the first worker finishing late does not overwrite the run which took over
+        run_job(stale, "worker-1")
+        self.assertEqual(Job.objects.get().status, Job.Status.RUNNING)
+        run_job(retried, "worker-2")
+        self.assertEqual(Job.objects.get().status, Job.Status.DONE)
+        self.assertEqual(calls, ["a", "a"])
+
+    def test_expired_lease_without_attempts_left_fails(self):
+        Job.objects.create(
+            name="jobs.tests.record",
+            status=Job.Status.RUNNING,
+            attempts=3,
+            max_attempts=3,
+            locked_by="dead",
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(claim_jobs("worker", 1), [])
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+    def test_purge_finished_jobs(self):
+        old = timezone.now() - timedelta(minutes=5)
+        Job.objects.create(name="done", status=Job.Status.DONE, finished_at=old, max_attempts=1)
+        failed = Job.objects.create(name="failed", status=Job.Status.FAILED, finished_at=old, max_attempts=1)
+        recent = Job.objects.create(name="recent", status=Job.Status.DONE, finished_at=timezone.now(), max_attempts=1)
+
+        self.assertEqual(purge_finished_jobs(), 1)
+        self.assertEqual(set(Job.objects.all()), {failed, recent})
+
+    def test_admin_runs_failed_jobs_again(self):
+        admin = CustomUser.objects.create_superuser("admin@email.com", "password")
+        self.client.force_login(admin)
+        job = Job.objects.create(name="jobs.tests.record", status=Job.Status.FAILED, attempts=3, max_attempts=3)
+
+        response = self.client.get(reverse("admin:jobs_job_change", args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.client.post(reverse("admin:jobs_job_changelist"), {"action": "run_now", "_selected_action": [str(job.pk)]})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 0))
+
+
+@override_settings(JOBS=JOBS)
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_due_jobs_concurrently(self):
+        for idx in range(5):
+            record.enqueue(idx)
+        record.schedule(timedelta(hours=1), "later")
+
+        with mock.patch("jobs.worker.renew_leases") as renew:
+            self.assertEqual(Worker(concurrency=2, poll_interval=0.01).run(once=True), 5)
+        self.assertEqual(sorted(calls), ["0", "1", "2", "3", "4"])
+        self.assertEqual(Job.objects.filter(status=Job.Status.DONE).count(), 5)
+        self.assertEqual(Job.objects.filter(status=Job.Status.QUEUED).count(), 1)
+        renew.assert_not_called()
+
+    def test_stopped_worker_finishes_running_jobs(self):
+        worker = Worker(concurrency=1, poll_interval=0.01)
+        record.enqueue("a")
+        record.enqueue("b")
+
+        with mock.patch("jobs.worker.run_job", side_effect=lambda job, worker_id: worker.stop()) as run:
+            self.assertEqual(worker.run(), 1)
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(Job.objects.filter(status=Job.Status.QUEUED).count(), 1)
+
+    def test_run_workers_command(self):
+        record.enqueue("a")
+
+        out = StringIO()
+        call_command("run_workers", once=True, concurrency=3, stdout=out)
+
+        self.assertEqual(calls, ["a"])
+        self.assertIn("running 3 jobs at a time", out.getvalue())
+        self.assertIn("stopped after 1 jobs", out.getvalue())
@@ -0,0 +1,210 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import get_task
+
+__all__ = ["Worker", "claim_jobs", "purge_finished_jobs", "renew_leases", "retry_delay", "run_job"]
+
+logger = logging.getLogger(__name__)
+
+
+def _lease() -> timedelta:
+    return timedelta(seconds=settings.JOBS["VISIBILITY_TIMEOUT"])
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Returns the exponential backoff before the next run of a job which failed ``attempts`` times.
+    """
+    seconds = settings.JOBS["RETRY_BACKOFF"] * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.JOBS["RETRY_BACKOFF_MAX"]))
+
+
+def claim_jobs(worker_id: str, limit: int) -> list[Job]:
+    """
+    Claims up to ``limit`` due jobs for a worker, the longest due first.
+
+    Due jobs are the queued ones whose ``run_at`` passed and the running ones whose lease expired, their worker having
+    stopped renewing it. A job is claimed with a conditional ``UPDATE`` on its ``attempts``, which every claim
+    increments, so concurrent workers never both claim it, on any database. Jobs of dead workers which used up their
+    attempts fail instead.
+
+    Returns
+    -------
+    list[Job]
+        The claimed jobs, running with a lease of ``JOBS["VISIBILITY_TIMEOUT"]`` seconds.
+    """
+    now = timezone.now()
+    expired = Q(status=Job.Status.RUNNING, locked_until__lt=now)
+    Job.objects.filter(expired, attempts__gte=F("max_attempts")).update(
+        status=Job.Status.FAILED,
+        locked_by="",
+        locked_until=None,
+        finished_at=now,
+        last_error="The worker running the job stopped renewing its lease",
+    )
+
+    due = Q(status=Job.Status.QUEUED, run_at__lte=now) | expired
+    claimed_ids = []
+    while len(claimed_ids) < limit:
+        candidates = list(
+            Job.objects.filter(due)
+            .exclude(pk__in=claimed_ids)
+            .order_by("run_at")
+            .values_list("pk", "attempts")[: limit - len(claimed_ids)]
+        )
+        if not candidates:
+            break
+        for pk, attempts in candidates:
+            # lost to another worker when the job moved on in the meantime
+            if Job.objects.filter(due, pk=pk, attempts=attempts).update(
+                status=Job.Status.RUNNING,
+                attempts=attempts + 1,
+                locked_by=worker_id,
+                locked_until=now + _lease(),
+                started_at=now,
+            ):
+                claimed_ids.append(pk)
+    return list(Job.objects.filter(pk__in=claimed_ids).order_by("run_at")) if claimed_ids else []
+
+
+def _finish(job: Job, worker_id: str, **fields) -> bool:
+    # a worker whose lease expired may not overwrite the outcome of the run which took over
+    return bool(
+        Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, locked_by=worker_id, attempts=job.attempts).update(
+            locked_by="", locked_until=None, **fields
+        )
+    )
+
+
+def run_job(job: Job, worker_id: str) -> None:
+    """
+    Runs a claimed job and stores the outcome: done, queued again after ``retry_delay`` or failed once the job used up
+    its attempts. The traceback of the last failure is kept in ``last_error``.
+    """
+    try:
+        func = get_task(job.name)
+    except KeyError:
+        _finish(job, worker_id, status=Job.Status.FAILED, finished_at=timezone.now(), last_error="Unknown task")
+        return
+
+    try:
+        func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception("Job %s (%s) failed on attempt %d of %d", job.pk, job.name, job.attempts, job.max_attempts)
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            _finish(job, worker_id, status=Job.Status.FAILED, finished_at=now, last_error=error)
+        else:
+            _finish(job, worker_id, status=Job.Status.QUEUED, run_at=now + retry_delay(job.attempts), last_error=error)
+    else:
+        _finish(job, worker_id, status=Job.Status.DONE, finished_at=timezone.now())
+
+
+def renew_leases(worker_id: str, job_ids: Iterable) -> int:
+    """
+    Extends the leases of the jobs a worker is running, returns the number of renewed leases.
+    """
+    return Job.objects.filter(pk__in=list(job_ids), status=Job.Status.RUNNING, locked_by=worker_id).update(
+        locked_until=timezone.now() + _lease()
+    )
+
+
+def purge_finished_jobs() -> int:
+    """
+    Deletes the jobs which are done for longer than ``JOBS["RETENTION"]`` seconds, failed jobs stay for the admin.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS["RETENTION"])
+    return Job.objects.filter(status=Job.Status.DONE, finished_at__lt=cutoff).delete()[0]
+
+
+class Worker:
+    """
+    Runs due jobs in a pool of ``concurrency`` threads, polling the queue whenever a thread is free.
+
+    Jobs run at least once: the job of a worker which dies is run again once its lease expired, so tasks should be
+    idempotent. Leases are renewed while the jobs run, a job may take longer than the visibility timeout.
+    """
+
+    def __init__(
+        self, concurrency: Optional[int] = None, poll_interval: Optional[float] = None, worker_id: Optional[str] = None
+    ):
+        self.concurrency = concurrency or settings.JOBS["CONCURRENCY"]
+        self.poll_interval = settings.JOBS["POLL_INTERVAL"] if poll_interval is None else poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        """
+        Stops claiming jobs, ``run`` returns once the running jobs finished.
+        """
+        self._stopping.set()
+
+    def _execute(self, job: Job) -> None:
+        close_old_connections()
+        try:
+            run_job(job, self.worker_id)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _collect(running: dict, finished: Iterable) -> None:
+        for future in finished:
+            job_id = running.pop(future)
+            if future.exception() is not None:
+                # the outcome could not be stored, the job runs again once its lease expired
+                logger.error("Job %s could not be finished", job_id, exc_info=future.exception())
+
+    def run(self, once: bool = False) -> int:
+        """
+        Runs jobs until ``stop`` is called, or with ``once`` until no job is due. Returns the number of jobs run.
+        """
+        renew_every = settings.JOBS["VISIBILITY_TIMEOUT"] / 3
+        renewed_at = purged_at = time.monotonic()
+        count = 0
+        running = {}
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="jobs-worker") as executor:
+            while not self._stopping.is_set():
+                free = self.concurrency - len(running)
+                for job in claim_jobs(self.worker_id, free) if free else []:
+                    running[executor.submit(self._execute, job)] = job.pk
+                    count += 1
+                if once and not running:
+                    break
+
+                if running:
+                    finished, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    self._collect(running, finished)
+                else:
+                    self._stopping.wait(self.poll_interval)
+
+                now = time.monotonic()
+                if running and now - renewed_at >= renew_every:
+                    renew_leases(self.worker_id, running.values())
+                    renewed_at = now
+                if now - purged_at >= settings.JOBS["PURGE_INTERVAL"]:
+                    purge_finished_jobs()
+                    purged_at = now
+
+            # the pool waits for the running jobs, whose leases must not expire meanwhile
+            while running:
+                finished, _ = wait(running, timeout=renew_every, return_when=FIRST_COMPLETED)
+                self._collect(running, finished)
+                renew_leases(self.worker_id, running.values())
+        close_old_connections()
+        return count
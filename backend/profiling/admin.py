@@ -0,0 +1,65 @@
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from profiling.models import RequestProfile
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "method", "path", "status_code", "duration_ms", "query_count", "user")
+    list_filter = ("method", "status_code")
+    list_select_related = ("user",)
+    search_fields = ("path", "user__email")
+    fields = readonly_fields = (
+        "created_at",
+        "user",
+        "method",
+        "path",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "query_time_ms",
+        "download",
+        "profile_summary",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<path:object_id>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="profiling_requestprofile_download",
+            ),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, object_id):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = self.get_object(request, object_id)
+        if profile is None:
+            raise Http404
+        response = HttpResponse(bytes(profile.stats), content_type="application/octet-stream")
+        response["Content-Disposition"] = f'attachment; filename="request-{profile.pk}.prof"'
+        return response
+
+    @admin.display(description="Profile")
+    def download(self, obj):
+        url = reverse("admin:profiling_requestprofile_download", args=[obj.pk])
+        # readable by `pstats`, snakeviz and similar viewers
+        return format_html('<a href="{}">request-{}.prof</a>', url, obj.pk)
+
+    @admin.display(description="Summary")
+    def profile_summary(self, obj):
+        return format_html("<pre>{}</pre>", obj.summary)
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
@@ -0,0 +1,175 @@
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from profiling.models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+# one profiled request at a time per process, the profiler hooks of concurrent ones would interfere
+_lock = threading.Lock()
+
+
+class QueryTimer:
+    """
+    Database execute wrapper counting the queries and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started_at
+
+
+class ThreadProfiler:
+    """
+    Profiles a thread with cProfile and times its queries between ``start`` and ``stop``, which must both be called
+    from that thread: the profiler hooks and the database connections are per thread.
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.queries = QueryTimer()
+        self._wrappers = ExitStack()
+
+    def start(self) -> None:
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self.queries))
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+        self._wrappers.close()
+
+
+def _requested(request) -> bool:
+    config = settings.REQUEST_PROFILING
+    if not config["ENABLED"]:
+        return False
+    header = "HTTP_" + config["HEADER"].upper().replace("-", "_")
+    return bool(request.META.get(header)) or config["QUERY_PARAM"] in request.GET
+
+
+def _build_profile(
+    request, user, response, profiles: list[cProfile.Profile], duration: float, queries: QueryTimer
+) -> RequestProfile:
+    stream = io.StringIO()
+    stats = pstats.Stats(stream=stream)
+    for profile in profiles:
+        profile.create_stats()
+        # pstats refuses profiles which recorded nothing
+        if profile.stats:
+            stats.add(profile)
+    raw_stats = marshal.dumps(stats.stats)
+    stats.strip_dirs().sort_stats(settings.REQUEST_PROFILING["SORT"]).print_stats(
+        settings.REQUEST_PROFILING["SUMMARY_LINES"]
+    )
+    return RequestProfile(
+        user=user,
+        method=request.method,
+        path=request.get_full_path()[:2048],
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=queries.count,
+        query_time_ms=queries.duration * 1000,
+        stats=raw_stats,
+        summary=stream.getvalue(),
+    )
+
+
+class RequestProfilingMiddleware:
+    """
+    Profiles single requests of staff users with cProfile and stores them as ``RequestProfile`` for the admin.
+
+    A request is profiled when it has the ``REQUEST_PROFILING["QUERY_PARAM"]`` query parameter (``?profile=1``) or a
+    non-empty ``REQUEST_PROFILING["HEADER"]`` header (``X-Profile: 1``) and comes from a staff user, its response
+    carries the id of the stored profile in ``X-Profile-Id``. Other requests only pay for the check of the parameter
+    and header. The profile covers the view and the rendering of its response, for streaming responses not the
+    streamed content. Under ASGI, both the event loop thread and the thread running the synchronous code of the request
+    (sync views and middleware, the ORM calls of async views) are profiled. While async views wait, other requests
+    served by the loop show up in the profile.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (_requested(request) and request.user.is_staff) or not self._acquire():
+            return self.get_response(request)
+
+        profiler = ThreadProfiler()
+        try:
+            started_at = time.perf_counter()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+            duration = time.perf_counter() - started_at
+        finally:
+            _lock.release()
+
+        record = _build_profile(request, request.user, response, [profiler.profile], duration, profiler.queries)
+        record.save()
+        response["X-Profile-Id"] = str(record.pk)
+        return response
+
+    async def __acall__(self, request):
+        if not _requested(request):
+            return await self.get_response(request)
+        user = await request.auser()
+        if not user.is_staff or not self._acquire():
+            return await self.get_response(request)
+
+        loop_profile = cProfile.Profile()
+        # the sync code of a request runs in one thread, the one its thread-sensitive sync_to_async calls use
+        sync_profiler = ThreadProfiler()
+        try:
+            started_at = time.perf_counter()
+            await sync_to_async(sync_profiler.start, thread_sensitive=True)()
+            loop_profile.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                loop_profile.disable()
+                await sync_to_async(sync_profiler.stop, thread_sensitive=True)()
+            duration = time.perf_counter() - started_at
+        finally:
+            _lock.release()
+
+        record = _build_profile(
+            request, user, response, [loop_profile, sync_profiler.profile], duration, sync_profiler.queries
+        )
+        await record.asave()
+        response["X-Profile-Id"] = str(record.pk)
+        return response
+
+    @staticmethod
+    def _acquire() -> bool:
+        if _lock.acquire(blocking=False):
+            return True
+        logger.warning("Not profiling the request, another request of this process is being profiled")
+        return False
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("profiling", "0001_initial"),
+    ]
+
+    # the profiles of async views stored so far have no queries, they are set to zero
+    operations = [
+        migrations.AlterField(
+            model_name="requestprofile",
+            name="query_count",
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name="requestprofile",
+            name="query_time_ms",
+            field=models.FloatField(default=0.0),
+            preserve_default=False,
+        ),
+    ]
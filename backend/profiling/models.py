@@ -0,0 +1,31 @@
+import uuid
+
+from django.db import models
+
+from authentication.models import CustomUser
+
+
+class RequestProfile(models.Model):
+    """
+    A cProfile of one request, captured on demand for a staff user by ``RequestProfilingMiddleware``.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, null=True, on_delete=models.SET_NULL)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    # the queries of the thread running the request, under ASGI of the thread running its sync code and ORM calls
+    query_count = models.PositiveIntegerField()
+    query_time_ms = models.FloatField()
+    # marshalled `pstats` data, the format of `pstats.Stats.dump_stats()`
+    stats = models.BinaryField()
+    summary = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
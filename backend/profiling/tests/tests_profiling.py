@@ -0,0 +1,100 @@
+import marshal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from authentication.models import CustomUser
+from chat.models import Conversation, Message, Role, Version
+from profiling.models import RequestProfile
+
+
+def profiled_functions(profile):
+    return {function for _, _, function in marshal.loads(bytes(profile.stats))}
+
+
+class RequestProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("create_roles", stdout=StringIO())
+        cls.staff_user = CustomUser.objects.create_user("staff@email.com", "password", is_active=True, is_staff=True)
+        cls.conversation = Conversation.objects.create(user=cls.staff_user, title="Slow")
+        version = Version.objects.create(conversation=cls.conversation)
+        Message.objects.create(version=version, content="Question", role=Role.objects.get(name="user"))
+        cls.conversation.active_version = version
+        cls.conversation.save()
+
+    def setUp(self):
+        self.client.force_login(self.staff_user)
+        self.url = reverse("get_branched_conversation", kwargs={"pk": self.conversation.pk})
+
+    def test_query_parameter_profiles_the_request(self):
+        response = self.client.get(self.url, {"profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response["X-Profile-Id"], str(profile.pk))
+        self.assertEqual((profile.user, profile.method, profile.status_code), (self.staff_user, "GET", 200))
+        self.assertEqual(profile.path, f"{self.url}?profile=1")
+        self.assertGreater(profile.query_count, 0)
+        self.assertIn("get_conversation_branched", profile.summary)
+        self.assertIn("serialize_conversations", profile.summary)
+        self.assertIn("make_branched_conversation", profiled_functions(profile))
+
+    def test_header_profiles_the_request(self):
+        response = self.client.get(self.url, headers={"X-Profile": "1"})
+
+        self.assertEqual(response["X-Profile-Id"], str(RequestProfile.objects.get().pk))
+
+    def test_other_requests_are_not_profiled(self):
+        response = self.client.get(self.url)
+        self.assertNotIn("X-Profile-Id", response)
+
+        self.client.force_login(CustomUser.objects.create_user("user@email.com", "password", is_active=True))
+        response = self.client.get(reverse("get_conversations"), {"profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+
+        with override_settings(REQUEST_PROFILING={"ENABLED": False}):
+            self.client.force_login(self.staff_user)
+            self.client.get(self.url, {"profile": "1"})
+
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(ROOT_URLCONF="chat.tests.async_urls")
+    async def test_async_view(self):
+        await self.async_client.aforce_login(self.staff_user)
+
+        response = await self.async_client.get(self.url, {"profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        profile = await RequestProfile.objects.aget()
+        self.assertEqual(response["X-Profile-Id"], str(profile.pk))
+        # the ORM calls run in the thread of the sync code
+        self.assertGreater(profile.query_count, 0)
+        self.assertIn("make_branched_conversation", profiled_functions(profile))
+
+    async def test_sync_view_under_asgi(self):
+        await self.async_client.aforce_login(self.staff_user)
+
+        response = await self.async_client.get(self.url, {"profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        profile = await RequestProfile.objects.aget()
+        self.assertEqual(response["X-Profile-Id"], str(profile.pk))
+        self.assertGreater(profile.query_count, 0)
+        self.assertIn("get_conversation_branched", profile.summary)
+        self.assertIn("serialize_conversations", profile.summary)
+        self.assertIn("make_branched_conversation", profiled_functions(profile))
+
+    def test_admin_download(self):
+        self.client.force_login(CustomUser.objects.create_superuser("admin@email.com", "password"))
+        self.client.get(self.url, {"profile": "1"})
+        profile = RequestProfile.objects.get()
+
+        response = self.client.get(reverse("admin:profiling_requestprofile_change", args=[profile.pk]))
+        self.assertContains(response, "get_conversation_branched")
+        response = self.client.get(reverse("admin:profiling_requestprofile_download", args=[profile.pk]))
+        self.assertEqual(response["Content-Disposition"], f'attachment; filename="request-{profile.pk}.prof"')
+        self.assertEqual(response.content, bytes(profile.stats))
@@ -1,4 +1,218 @@
+"""
+Starts the backend under uvicorn.
+
+``python server.py --reload`` runs a single auto-reloading development server. Without ``--reload`` a supervisor binds
+the socket once and runs ``--workers`` worker processes sharing it. A worker which exits is replaced, workers are
+recycled after ``--max-requests`` requests or once their resident memory exceeds ``--max-memory-mb``. On SIGTERM or
+SIGINT the workers stop accepting connections and get ``--graceful-timeout`` seconds to finish in-flight requests,
+GPT streams included, before they are killed.
+
+Every worker imports Django, the URLconf and the LLM client and connects to the database before it accepts requests,
+so the first request does not pay for it. ``/readyz/`` reports whether a worker is warmed up and not draining,
+``/healthz/`` whether it is alive.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+from importlib.util import find_spec
+
 import uvicorn
+from dotenv import load_dotenv
+
+logger = logging.getLogger("server")
+
+APP = "backend.asgi:application"
+MONITOR_INTERVAL = 1.0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", 1)))
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default=os.getenv("SERVER_LOOP", "auto"))
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default=os.getenv("SERVER_HTTP", "auto"))
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 60)),
+        help="Seconds in-flight requests get to finish on shutdown.",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=int(os.getenv("SERVER_MAX_REQUESTS", 0)),
+        help="Requests after which a worker is recycled, 0 to disable.",
+    )
+    parser.add_argument(
+        "--max-requests-jitter",
+        type=int,
+        default=int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 0)),
+        help="Random extra requests per worker, so that workers are not recycled all at once.",
+    )
+    parser.add_argument(
+        "--max-memory-mb",
+        type=int,
+        default=int(os.getenv("SERVER_MAX_MEMORY_MB", 0)),
+        help="Resident memory after which a worker is recycled, 0 to disable.",
+    )
+    parser.add_argument("--log-level", default=os.getenv("SERVER_LOG_LEVEL", "info"))
+    parser.add_argument("--reload", action="store_true", help="Single auto-reloading process for development.")
+    args = parser.parse_args(argv)
+
+    for option, module in (("loop", "uvloop"), ("http", "httptools")):
+        if getattr(args, option) == module and find_spec(module) is None:
+            parser.error(f"--{option} {module} requires the `{module}` package")
+    return args
+
+
+def read_rss_bytes(pid: int):
+    """
+    Returns the resident memory of a process from ``/proc``, or None where it is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class WorkerServer(uvicorn.Server):
+    def handle_exit(self, sig, frame):
+        from src.utils import health
+
+        health.mark_draining()
+        super().handle_exit(sig, frame)
+
+
+def configure_logging(level: str) -> None:
+    logging.basicConfig(level=level.upper(), format="%(levelname)s:     %(message)s")
+
+
+def run_worker(config_kwargs: dict, sockets: list) -> None:
+    configure_logging(config_kwargs["log_level"])
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+    import django
+
+    django.setup()
+
+    from src.utils import health
+
+    health.mark_starting()
+    timings = health.warm_up()
+    config = uvicorn.Config(APP, **config_kwargs)
+    config.load()
+    health.mark_ready()
+    logger.info(
+        "Worker %s warmed up in %.2fs (%s)",
+        os.getpid(),
+        sum(timings.values()),
+        ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items()),
+    )
+    WorkerServer(config).run(sockets=sockets)
+
+
+class Supervisor:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.config_kwargs = {
+            "loop": args.loop,
+            "http": args.http,
+            "lifespan": "off",
+            "log_level": args.log_level,
+            "timeout_graceful_shutdown": args.graceful_timeout,
+        }
+        self.context = multiprocessing.get_context("spawn")
+        self.workers: list = []
+        self.draining: list = []
+        self.should_exit = False
+
+    def run(self) -> None:
+        sock = uvicorn.Config(APP, host=self.args.host, port=self.args.port).bind_socket()
+        logger.info("Listening on http://%s:%s with %s workers", self.args.host, self.args.port, self.args.workers)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self.handle_exit)
+
+        try:
+            while not self.should_exit:
+                for worker in self.workers:
+                    if not worker.is_alive():
+                        logger.info("Worker %s exited with code %s", worker.pid, worker.exitcode)
+                self.workers = [worker for worker in self.workers if worker.is_alive()]
+                self.draining = [worker for worker in self.draining if worker.is_alive()]
+                for _ in range(self.args.workers - len(self.workers)):
+                    self.spawn(sock)
+                if self.args.max_memory_mb:
+                    self.recycle_large_workers(sock)
+                time.sleep(MONITOR_INTERVAL)
+        finally:
+            self.stop_workers()
+            sock.close()
+
+    def spawn(self, sock):
+        config_kwargs = dict(self.config_kwargs)
+        if self.args.max_requests:
+            config_kwargs["limit_max_requests"] = self.args.max_requests + random.randint(
+                0, self.args.max_requests_jitter
+            )
+        worker = self.context.Process(target=run_worker, args=(config_kwargs, [sock]), daemon=False)
+        worker.start()
+        self.workers.append(worker)
+        logger.info("Started worker %s", worker.pid)
+        return worker
+
+    def recycle_large_workers(self, sock) -> None:
+        limit = self.args.max_memory_mb * 1024 * 1024
+        for worker in list(self.workers):
+            rss = read_rss_bytes(worker.pid)
+            if rss is None or rss <= limit:
+                continue
+            logger.warning("Recycling worker %s using %.0f MiB", worker.pid, rss / 1024 / 1024)
+            # the replacement starts first, so capacity does not drop while the old worker drains
+            self.workers.remove(worker)
+            self.spawn(sock)
+            os.kill(worker.pid, signal.SIGTERM)
+            self.draining.append(worker)
+
+    def stop_workers(self) -> None:
+        workers = [*self.workers, *self.draining]
+        for worker in workers:
+            if worker.is_alive():
+                os.kill(worker.pid, signal.SIGTERM)
+        # uvicorn enforces the graceful timeout itself, the margin covers its own shutdown
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        for worker in workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+            if worker.is_alive():
+                logger.warning("Killing worker %s which did not stop in time", worker.pid)
+                worker.kill()
+                worker.join()
+
+    def handle_exit(self, sig, frame) -> None:
+        self.should_exit = True
+
+
+def main(argv=None) -> None:
+    load_dotenv()
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    # read by the settings of every worker, which split the node-wide GPT stream limits between the processes
+    os.environ["SERVER_WORKERS"] = "1" if args.reload else str(args.workers)
+    if args.reload:
+        uvicorn.run(APP, host=args.host, port=args.port, log_level=args.log_level, reload=True)
+        return
+
+    Supervisor(args).run()
+
 
 if __name__ == "__main__":
-    uvicorn.run("backend.asgi:application", host="127.0.0.1", port=8000, log_level="info", reload=True)
+    main()
@@ -1,12 +1,25 @@
-import os
+from functools import cache
 
-import openai
-from dotenv import load_dotenv
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 
-__all__ = ["openai"]
-load_dotenv()
+__all__ = ["get_openai", "openai"]
 
-openai.api_type = os.getenv("OPENAI_API_TYPE")
-openai.api_base = os.getenv("OPENAI_API_BASE")
-openai.api_version = os.getenv("OPENAI_API_VERSION")
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+@cache
+def get_openai():
+    """
+    Imports the ``openai`` client and configures it from the settings on first use, the import alone takes a good part
+    of a second which the URLconf, tests and management commands not calling GPT should not pay.
+    """
+    import openai
+
+    openai.api_type = settings.OPENAI_API_TYPE
+    openai.api_base = settings.OPENAI_API_BASE
+    openai.api_version = settings.OPENAI_API_VERSION
+    openai.api_key = settings.OPENAI_API_KEY
+    return openai
+
+
+# the configured `openai` module, imported on first attribute access
+openai = SimpleLazyObject(get_openai)
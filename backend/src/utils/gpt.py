@@ -1,6 +1,9 @@
+import json
 from dataclasses import dataclass
+from typing import Optional
 
 from src.libs import openai
+from src.utils.response_cache import ResponseCache, make_cache_key
 
 GPT_40_PARAMS = dict(
     temperature=0.7,
@@ -26,14 +29,20 @@ GPT_VERSIONS = {
 }
 
 
-def get_simple_answer(prompt: str, stream: bool = True):
+def get_simple_answer(prompt: str, stream: bool = True, cache: Optional[ResponseCache] = None):
     kwargs = {**GPT_40_PARAMS, **dict(stream=stream)}
+    engine = GPT_VERSIONS["gpt35"].engine
+    messages = [{"role": "system", "content": "You are a helpful assistant."}, {"role": "user", "content": prompt}]
 
-    for resp in openai.ChatCompletion.create(
-        engine=GPT_VERSIONS["gpt35"].engine,
-        messages=[{"role": "system", "content": "You are a helpful assistant."}, {"role": "user", "content": prompt}],
-        **kwargs,
-    ):
+    if cache is None:
+        yield from _stream_answer(engine, messages, kwargs)
+    else:
+        key = make_cache_key(engine, kwargs, messages)
+        yield from cache.stream(key, lambda: _stream_answer(engine, messages, kwargs))
+
+
+def _stream_answer(engine: str, messages: list[dict[str, str]], kwargs: dict):
+    for resp in openai.ChatCompletion.create(engine=engine, messages=messages, **kwargs):
         choices = resp.get("choices", [])
         if not choices:
             continue
@@ -42,6 +51,15 @@ def get_simple_answer(prompt: str, stream: bool = True):
             yield chunk
 
 
+TITLES_SYSTEM_MESSAGE = (
+    "As an AI Assistant your goal is to make very short titles, few words max, for conversations between user and "
+    "chatbot. You will be given several numbered conversations, each as the user's question and chatbot's first "
+    "response. Return only a JSON array of strings with one raw title per conversation, in the given order."
+)
+# keeps batched title prompts small, the start of a conversation is enough for a title
+TITLE_INPUT_MAX_CHARS = 1000
+
+
 def get_gpt_title(prompt: str, response: str):
     sys_msg: str = (
         "As an AI Assistant your goal is to make very short title, few words max for a conversation between user and "
@@ -60,18 +78,48 @@ def get_gpt_title(prompt: str, response: str):
     return result
 
 
+def get_gpt_titles(conversations: list[tuple[str, str]]) -> list[str]:
+    """
+    Generates the titles of several conversations with a single request.
+
+    Parameters
+    ----------
+    conversations : list[tuple[str, str]]
+        The user's question and the chatbot's first response of every conversation.
+
+    Returns
+    -------
+    list[str]
+        One title per conversation, in order.
+
+    Raises
+    ------
+    ValueError
+        If the answer is not a JSON array holding one title per conversation.
+    """
+    usr_msg = "\n\n".join(
+        f"{idx}.\n"
+        f'user_question: "{prompt[:TITLE_INPUT_MAX_CHARS]}"\n'
+        f'chatbot_response: "{response[:TITLE_INPUT_MAX_CHARS]}"'
+        for idx, (prompt, response) in enumerate(conversations, start=1)
+    )
+
+    response = openai.ChatCompletion.create(
+        engine=GPT_VERSIONS["gpt35"].engine,
+        messages=[{"role": "system", "content": TITLES_SYSTEM_MESSAGE}, {"role": "user", "content": usr_msg}],
+        **GPT_40_PARAMS,
+    )
+
+    titles = json.loads(response["choices"][0]["message"]["content"])
+    if not isinstance(titles, list) or len(titles) != len(conversations):
+        raise ValueError(f"Expected {len(conversations)} titles, got {titles!r}")
+    return [str(title).replace('"', "").strip() for title in titles]
+
+
 def get_conversation_answer(conversation: list[dict[str, str]], model: str, stream: bool = True):
     kwargs = {**GPT_40_PARAMS, **dict(stream=stream)}
     engine = GPT_VERSIONS[model].engine
 
-    for resp in openai.ChatCompletion.create(
-        engine=engine,
-        messages=[{"role": "system", "content": "You are a helpful assistant."}, *conversation],
-        **kwargs,
-    ):
-        choices = resp.get("choices", [])
-        if not choices:
-            continue
-        chunk = choices.pop()["delta"].get("content")
-        if chunk:
-            yield chunk
+    yield from _stream_answer(
+        engine, [{"role": "system", "content": "You are a helpful assistant."}, *conversation], kwargs
+    )
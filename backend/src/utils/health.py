@@ -0,0 +1,64 @@
+import threading
+import time
+
+__all__ = ["is_draining", "is_ready", "mark_draining", "mark_ready", "mark_starting", "warm_up"]
+
+_ready = threading.Event()
+_ready.set()  # entry points without a warm-up phase (runserver, plain ASGI/WSGI) are ready once imported
+_draining = threading.Event()
+
+
+def mark_starting() -> None:
+    _ready.clear()
+
+
+def mark_ready() -> None:
+    _ready.set()
+
+
+def mark_draining() -> None:
+    _draining.set()
+
+
+def is_ready() -> bool:
+    return _ready.is_set() and not _draining.is_set()
+
+
+def is_draining() -> bool:
+    return _draining.is_set()
+
+
+def warm_up() -> dict[str, float]:
+    """
+    Pays the one-off startup costs of a worker before it accepts requests: importing and configuring the LLM client,
+    loading the URLconf (which imports every view module) and opening the database connections.
+
+    Returns
+    -------
+    dict[str, float]
+        Seconds spent per step.
+    """
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from src.libs import get_openai
+
+    timings = {}
+
+    started_at = time.perf_counter()
+    # imported lazily otherwise, by the first GPT request
+    get_openai()
+    timings["llm_client"] = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    get_resolver().reverse_dict  # populating the reverse lookup walks and imports all included URLconfs
+    timings["urls"] = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    for connection in connections.all(initialized_only=False):
+        connection.ensure_connection()
+        # connections are per thread, requests are served from other threads
+        connection.close()
+    timings["database"] = time.perf_counter() - started_at
+
+    return timings
@@ -0,0 +1,48 @@
+import threading
+import time
+
+__all__ = ["RateLimiter"]
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket allowing ``rate`` calls per ``period`` seconds, with bursts of up to ``burst`` calls.
+
+    Parameters
+    ----------
+    rate : float
+        Number of calls allowed per period.
+    period : float
+        Length of the period in seconds.
+    burst : int, optional
+        Number of calls which may be made at once after an idle time, defaults to 1.
+    """
+
+    def __init__(self, rate: float, period: float = 60.0, burst: int = 1):
+        self.interval = period / rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a call is allowed, returns the number of seconds waited.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) / self.interval)
+            self._updated_at = now
+            # the token is taken right away, concurrent callers queue up behind the debt
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens * self.interval
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, seconds: float) -> None:
+        """
+        Delays all further calls by the given number of seconds, e.g. after the upstream reported a rate limit.
+        """
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - seconds / self.interval
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+
+__all__ = ["ResponseCache", "make_cache_key"]
+
+REPLAY_CHUNK_SIZE = 8192
+
+
+def make_cache_key(engine: str, params: dict, messages: list[dict[str, str]]) -> str:
+    """
+    Builds an exact-match cache key for a chat completion request.
+
+    Messages are normalized (unicode NFC, unified line endings, stripped surrounding whitespace) so that prompts which
+    differ only in formatting noise share an entry. The ``stream`` flag is ignored since it does not affect the answer.
+
+    Parameters
+    ----------
+    engine : str
+        The engine (deployment) name the request is sent to.
+    params : dict
+        The generation parameters passed to the API.
+    messages : list[dict[str, str]]
+        The chat messages of the request.
+
+    Returns
+    -------
+    str
+        The hex digest identifying the request.
+    """
+    normalized_messages = [
+        {
+            "role": message["role"].strip().lower(),
+            "content": unicodedata.normalize("NFC", message["content"]).replace("\r\n", "\n").strip(),
+        }
+        for message in messages
+    ]
+    normalized_params = {k: v for k, v in params.items() if k != "stream"}
+    payload = json.dumps(
+        {"engine": engine, "params": normalized_params, "messages": normalized_messages},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class _CacheEntry:
+    text: str
+    size: int
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    Thread-safe in-process cache of complete GPT answers with LRU and TTL eviction bounded by total size in bytes.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Upper bound for the summed UTF-8 size of all cached answers.
+    ttl : float
+        Number of seconds an answer stays valid.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.text
+
+    def set(self, key: str, text: str) -> None:
+        size = len(text.encode())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(text=text, size=size, expires_at=time.monotonic() + self.ttl)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+    def stream(self, key: str, produce: Callable[[], Iterable[str]]) -> Iterator[str]:
+        """
+        Replays a cached answer or streams a fresh one while recording it.
+
+        A cached answer is yielded immediately in large slices. A fresh answer is only stored once the upstream stream
+        has been fully consumed, so aborted or failed generations never end up in the cache.
+
+        Parameters
+        ----------
+        key : str
+            The cache key, see ``make_cache_key``.
+        produce : Callable[[], Iterable[str]]
+            Called on a cache miss to start the upstream stream.
+        """
+        text = self.get(key)
+        if text is not None:
+            for start in range(0, len(text), REPLAY_CHUNK_SIZE):
+                end = start + REPLAY_CHUNK_SIZE
+                yield text[start:end]
+            return
+
+        chunks = []
+        for chunk in produce():
+            chunks.append(chunk)
+            yield chunk
+        self.set(key, "".join(chunks))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
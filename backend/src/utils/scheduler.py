@@ -0,0 +1,222 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Hashable, Iterable, Optional
+
+__all__ = ["AdmissionRejected", "ScheduledStream", "StreamScheduler", "StreamSlot"]
+
+DEFAULT_STREAM_DURATION = 5.0
+DURATION_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a stream cannot be admitted, either because the wait queue is full or the wait timed out.
+
+    Attributes
+    ----------
+    retry_after : int
+        Suggested number of seconds the client should wait before retrying.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class StreamSlot:
+    """
+    A granted concurrency slot. Must be released exactly once when the stream ends, further calls are no-ops.
+    """
+
+    def __init__(self, scheduler: "StreamScheduler", engine: str, user_id: Hashable):
+        self.scheduler = scheduler
+        self.engine = engine
+        self.user_id = user_id
+        self.granted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self.scheduler._release(self)
+
+
+class ScheduledStream:
+    """
+    Iterator wrapping a chunk stream which releases its slot once the stream is exhausted, fails or gets closed.
+
+    Implemented as a class rather than a generator so that closing a response which was never iterated still releases
+    the slot.
+    """
+
+    def __init__(self, chunks: Iterable[str], slot: StreamSlot):
+        self._chunks = iter(chunks)
+        self._slot = slot
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        self._slot.release()
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class _Ticket:
+    def __init__(self, user_id: Hashable):
+        self.user_id = user_id
+        self.granted = threading.Event()
+
+
+class _EngineState:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiting: OrderedDict[Hashable, deque[_Ticket]] = OrderedDict()
+        self.avg_duration = DEFAULT_STREAM_DURATION
+
+    @property
+    def waiting_count(self) -> int:
+        return sum(len(tickets) for tickets in self.waiting.values())
+
+
+class StreamScheduler:
+    """
+    Admission control for concurrent LLM streams of a single worker process.
+
+    Every engine has a global concurrency cap and every user may hold a limited number of streams at once. Requests
+    which cannot start immediately wait in a bounded per-engine queue, which is served round-robin between users so
+    that a user with many pending requests cannot starve the others.
+
+    Parameters
+    ----------
+    default_engine_limit : int
+        Concurrency cap for engines without an explicit limit.
+    engine_limits : dict[str, int], optional
+        Concurrency caps per engine name.
+    user_limit : int
+        Number of concurrent streams a single user may hold across all engines.
+    max_queue : int
+        Number of requests allowed to wait per engine, further requests are rejected immediately.
+    queue_timeout : float
+        Number of seconds a request may wait for a slot before being rejected.
+    """
+
+    def __init__(
+        self,
+        default_engine_limit: int,
+        user_limit: int,
+        max_queue: int,
+        queue_timeout: float,
+        engine_limits: Optional[dict[str, int]] = None,
+    ):
+        self.default_engine_limit = default_engine_limit
+        self.engine_limits = engine_limits or {}
+        self.user_limit = user_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._engines: dict[str, _EngineState] = {}
+        self._user_active: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, engine: str, user_id: Hashable, timeout: Optional[float] = None) -> StreamSlot:
+        """
+        Blocks until a slot for the given engine and user is granted.
+
+        Raises
+        ------
+        AdmissionRejected
+            If the wait queue is full or no slot was granted within the timeout.
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        ticket = _Ticket(user_id)
+
+        with self._lock:
+            state = self._get_engine_state(engine)
+            state.waiting.setdefault(user_id, deque()).append(ticket)
+            self._dispatch(state)
+            if not ticket.granted.is_set() and state.waiting_count > self.max_queue:
+                self._dequeue(state, ticket)
+                raise AdmissionRejected("Stream queue is full", self._retry_after(state))
+
+        if ticket.granted.wait(timeout):
+            return StreamSlot(self, engine, user_id)
+
+        with self._lock:
+            # the slot might have been granted between the timeout and taking the lock
+            if ticket.granted.is_set():
+                return StreamSlot(self, engine, user_id)
+            self._dequeue(state, ticket)
+            raise AdmissionRejected("Timed out waiting for a free stream slot", self._retry_after(state))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                engine: {"limit": state.limit, "active": state.active, "waiting": state.waiting_count}
+                for engine, state in self._engines.items()
+            }
+
+    def _get_engine_state(self, engine: str) -> _EngineState:
+        if engine not in self._engines:
+            self._engines[engine] = _EngineState(self.engine_limits.get(engine, self.default_engine_limit))
+        return self._engines[engine]
+
+    @staticmethod
+    def _dequeue(state: _EngineState, ticket: _Ticket) -> None:
+        tickets = state.waiting[ticket.user_id]
+        tickets.remove(ticket)
+        if not tickets:
+            del state.waiting[ticket.user_id]
+
+    def _dispatch(self, state: _EngineState) -> None:
+        """
+        Grants free slots to waiting tickets, taking at most one ticket per user per round and rotating served users to
+        the back of the queue.
+        """
+        while state.active < state.limit:
+            user_id = next(
+                (u for u in state.waiting if self._user_active.get(u, 0) < self.user_limit),
+                None,
+            )
+            if user_id is None:
+                return
+
+            tickets = state.waiting.pop(user_id)
+            ticket = tickets.popleft()
+            if tickets:
+                state.waiting[user_id] = tickets
+
+            state.active += 1
+            self._user_active[user_id] = self._user_active.get(user_id, 0) + 1
+            ticket.granted.set()
+
+    def _release(self, slot: StreamSlot) -> None:
+        with self._lock:
+            state = self._engines[slot.engine]
+            state.active -= 1
+            duration = time.monotonic() - slot.granted_at
+            state.avg_duration += DURATION_SMOOTHING * (duration - state.avg_duration)
+
+            self._user_active[slot.user_id] -= 1
+            if not self._user_active[slot.user_id]:
+                del self._user_active[slot.user_id]
+
+            # a user-capped ticket may be waiting on any engine, not only the released one
+            for engine_state in self._engines.values():
+                self._dispatch(engine_state)
+
+    @staticmethod
+    def _retry_after(state: _EngineState) -> int:
+        return max(1, math.ceil(state.avg_duration * (state.waiting_count + 1) / max(state.limit, 1)))
@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Hashable, Iterable, Iterator, Optional
+
+__all__ = ["ResumableStream", "StreamGone", "StreamRegistry", "format_event"]
+
+logger = logging.getLogger(__name__)
+
+KEEP_ALIVE = ": keep-alive\n\n"
+
+
+def format_event(data: str, event_id: Optional[int] = None, event: Optional[str] = None) -> str:
+    """
+    Formats one Server-Sent Event. Every line of ``data`` becomes its own ``data:`` field, so that clients join them
+    back with newlines.
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class StreamGone(Exception):
+    """
+    Raised when a stream cannot be resumed because the events after the given id were evicted from its buffer.
+    """
+
+
+@dataclass
+class _Event:
+    id: int
+    text: str
+
+
+class ResumableStream:
+    """
+    A chunk stream consumed by a background thread into a bounded ring buffer of numbered events.
+
+    The upstream call runs to completion independently of the clients, so a client which lost its connection can
+    reconnect and read the remaining events, without a second upstream call, for as long as they are buffered. Every
+    chunk becomes a ``message`` event, the stream ends with a ``done`` event, or an ``error`` event if the upstream
+    call failed.
+
+    Parameters
+    ----------
+    owner : Hashable
+        Identifies the user allowed to read the stream.
+    chunks : Iterable[str]
+        The upstream chunks, closed once the stream ends.
+    buffer_size : int
+        Number of events kept for resuming clients.
+    stream_id : uuid.UUID, optional
+        The id of the stream, a random one by default.
+    """
+
+    def __init__(self, owner: Hashable, chunks: Iterable[str], buffer_size: int, stream_id: Optional[uuid.UUID] = None):
+        self.id = stream_id or uuid.uuid4()
+        self.owner = owner
+        self.finished_at: Optional[float] = None
+        self._chunks = chunks
+        self._events: deque[_Event] = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._condition = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def start(self) -> "ResumableStream":
+        threading.Thread(target=self._produce, name=f"sse-{self.id}", daemon=True).start()
+        return self
+
+    def subscribe(self, last_event_id: int = 0, heartbeat: float = 15.0) -> Iterator[str]:
+        """
+        Returns the formatted events after ``last_event_id``, followed by the live ones until the stream ends.
+
+        Parameters
+        ----------
+        last_event_id : int
+            The id of the last event the client received, 0 to read the stream from the start.
+        heartbeat : float
+            Seconds without events after which a comment is sent to keep the connection open.
+
+        Raises
+        ------
+        StreamGone
+            If events after ``last_event_id`` were already evicted from the buffer.
+        """
+        with self._condition:
+            if self._first_buffered_id() > last_event_id + 1:
+                raise StreamGone(f"Events after {last_event_id} are no longer buffered")
+        return self._iter_events(last_event_id, heartbeat)
+
+    def _iter_events(self, position: int, heartbeat: float) -> Iterator[str]:
+        while True:
+            with self._condition:
+                if self._last_id <= position and not self.done:
+                    self._condition.wait(heartbeat)
+                overrun = self._first_buffered_id() > position + 1
+                pending = [event.text for event in self._events if event.id > position]
+                # a resuming client may be ahead of this process, which has to catch up first
+                position, done = max(position, self._last_id), self.done
+
+            if overrun:
+                # a slow client fell behind the buffer, it has to start over
+                yield format_event("Stream buffer overrun", event="error")
+                return
+            yield from pending
+            if done and not pending:
+                return
+            if not pending:
+                yield KEEP_ALIVE
+
+    def _first_buffered_id(self) -> int:
+        return self._events[0].id if self._events else self._last_id + 1
+
+    def _append(self, data: str, event: Optional[str] = None) -> None:
+        with self._condition:
+            self._last_id += 1
+            self._events.append(_Event(self._last_id, format_event(data, self._last_id, event)))
+            self._condition.notify_all()
+
+    def _produce(self) -> None:
+        try:
+            for chunk in self._chunks:
+                self._append(chunk)
+            self._append("[DONE]", event="done")
+        except Exception:
+            logger.exception("Stream %s failed", self.id)
+            self._append("Upstream stream failed", event="error")
+        finally:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+            with self._condition:
+                self.finished_at = time.monotonic()
+                self._condition.notify_all()
+
+
+class StreamRegistry:
+    """
+    Thread-safe registry of the resumable streams of a worker process. Finished streams are kept for a grace period.
+
+    Streams are only found in the process which started them, streams which must be resumable from other processes
+    have to be stored elsewhere as well.
+
+    Parameters
+    ----------
+    buffer_size : int
+        Number of events buffered per stream.
+    grace_period : float
+        Seconds a finished stream stays available for resuming clients.
+    """
+
+    def __init__(self, buffer_size: int, grace_period: float):
+        self.buffer_size = buffer_size
+        self.grace_period = grace_period
+        self._streams: dict[uuid.UUID, ResumableStream] = {}
+        self._lock = threading.Lock()
+
+    def start(self, owner: Hashable, chunks: Iterable[str], stream_id: Optional[uuid.UUID] = None) -> ResumableStream:
+        stream = ResumableStream(owner, chunks, self.buffer_size, stream_id)
+        with self._lock:
+            self._prune()
+            self._streams[stream.id] = stream
+        return stream.start()
+
+    def get(self, stream_id: uuid.UUID, owner: Hashable) -> Optional[ResumableStream]:
+        with self._lock:
+            self._prune()
+            stream = self._streams.get(stream_id)
+        if stream is None or stream.owner != owner:
+            return None
+        return stream
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._prune()
+            active = sum(not stream.done for stream in self._streams.values())
+            return {"active": active, "finished": len(self._streams) - active}
+
+    def _prune(self) -> None:
+        expired_before = time.monotonic() - self.grace_period
+        for stream_id in [
+            stream_id
+            for stream_id, stream in self._streams.items()
+            if stream.done and stream.finished_at < expired_before
+        ]:
+            del self._streams[stream_id]
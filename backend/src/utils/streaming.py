@@ -0,0 +1,104 @@
+import time
+from typing import Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+__all__ = ["AsyncChunkIterator", "adapt_streaming_content", "coalesce_chunks", "is_asgi_request"]
+
+_EXHAUSTED = object()
+SENTENCE_ENDINGS = (".", "!", "?", ":", "\n")
+
+
+def coalesce_chunks(
+    chunks: Iterable[str], max_bytes: int, max_delay: float, flush_on_sentence: bool = False
+) -> Iterator[str]:
+    """
+    Joins small chunks of a stream into larger ones, so that each write to the client carries more text.
+
+    A joined chunk is flushed as soon as one of the policies applies. The delay is checked whenever a chunk arrives,
+    so text is held back no longer than ``max_delay`` or the gap until the upstream sends its next chunk.
+
+    Parameters
+    ----------
+    chunks : Iterable[str]
+        The upstream chunks, closed once the stream ends.
+    max_bytes : int
+        Flush once this many UTF-8 bytes are buffered, 0 disables coalescing.
+    max_delay : float
+        Flush once the oldest buffered chunk waited this many seconds.
+    flush_on_sentence : bool
+        Flush after a chunk ending a sentence or a line, so that text appears in readable pieces.
+    """
+    if max_bytes <= 0:
+        yield from chunks
+        return
+
+    buffer = []
+    size = 0
+    first_at = 0.0
+    try:
+        for chunk in chunks:
+            if not buffer:
+                first_at = time.monotonic()
+            buffer.append(chunk)
+            size += len(chunk) if chunk.isascii() else len(chunk.encode())
+            if (
+                size >= max_bytes
+                or (flush_on_sentence and chunk.rstrip(" ").endswith(SENTENCE_ENDINGS))
+                or time.monotonic() - first_at >= max_delay
+            ):
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class AsyncChunkIterator:
+    """
+    Async view of a synchronous chunk iterator.
+
+    Django consumes synchronous streaming content under ASGI by collecting it into a list first, which buffers the
+    whole response in memory. This adapter pulls one chunk at a time in the thread of the request instead, so code
+    relying on thread-local state (e.g. database cursors) keeps working.
+    """
+
+    def __init__(self, chunks: Iterable, thread_sensitive: bool = True):
+        self._chunks = iter(chunks)
+        self._thread_sensitive = thread_sensitive
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await sync_to_async(next, thread_sensitive=self._thread_sensitive)(self._chunks, _EXHAUSTED)
+        if chunk is _EXHAUSTED:
+            raise StopAsyncIteration
+        return chunk
+
+    def close(self) -> None:
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def is_asgi_request(request) -> bool:
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def adapt_streaming_content(request, chunks: Iterable, thread_sensitive: bool = True):
+    """
+    Returns streaming content suitable for the server handling the request: the chunks as they are under WSGI, and an
+    ``AsyncChunkIterator`` under ASGI.
+
+    Chunk iterators which block without touching the database (e.g. waiting for events of another thread) should pass
+    ``thread_sensitive=False``, so that waiting does not hold up the thread shared by all synchronous code.
+    """
+    if is_asgi_request(request):
+        return AsyncChunkIterator(chunks, thread_sensitive=thread_sensitive)
+    return chunks